@@ -0,0 +1,148 @@
+"""
+Compares the name validators on STUDENT_NAME-style candidates.
+
+    python -m benchmarks.name_validator_benchmark [--repeat 20] [--json out.json]
+
+Candidates are the synthetic form names (as written and lower-cased), the
+majors and OCR debris the custom NER model mistakes for names. The
+configuration as shipped (NAME_VALIDATOR, VALIDATOR_FALLBACK,
+VALIDATOR_FALLBACK_PRELOAD) is measured first, in a fresh process: the
+resident memory after loading and after validating every candidate, and
+whether the spaCy fallback got loaded on the way. For each validator on
+its own the report has its load time, the resident memory it added and
+microseconds per candidate; the lexicon validator is timed both with an
+empty memo cache and warm. When the spaCy model (config.VALIDATOR_MODEL) is
+installed, the share of candidates the lexicon rules had to pass to it and
+the agreement between the two are reported as well.
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.synthetic import FIRST_NAMES, LAST_NAMES, MAJORS
+from src import config
+from src.name_validator import LexiconNameValidator, SpacyNameValidator, load_name_validator
+
+DEBRIS = ["Lopez |", "John 3.5", "Inverted Colors", "Skewed Image", "Arts & Design", "GPA 3.8", "Name:", "SEFEG K"]
+
+
+def candidates():
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    return names + [name.lower() for name in names[::7]] + MAJORS + DEBRIS
+
+
+def _rss_mb():
+    # Resident set size from /proc (Linux); None elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return None
+
+
+def _load(factory):
+    before = _rss_mb()
+    start = time.perf_counter()
+    validator = factory()
+    load_ms = (time.perf_counter() - start) * 1000.0
+    after = _rss_mb()
+    return validator, round(load_ms, 1), round(after - before, 1) if before is not None else None
+
+
+def _us_per_candidate(fn, names, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name in names:
+            fn(name)
+    return round((time.perf_counter() - start) * 1e6 / (repeat * len(names)), 2)
+
+
+def _shipped(names):
+    # Loaded the way the server loads it; must run before anything else imports a spaCy model
+    before = _rss_mb()
+    validator = load_name_validator()
+    if validator is not None and config.VALIDATOR_FALLBACK_PRELOAD:
+        validator.preload()
+    loaded = _rss_mb()
+    if validator is not None:
+        validator.is_valid_many(names)
+    used = _rss_mb()
+    if before is None:
+        return {"validator": config.NAME_VALIDATOR}
+    return {
+        "validator": config.NAME_VALIDATOR,
+        "fallback_loaded": getattr(validator, "_fallback_validator", None) is not None,
+        "rss_mb_loaded": round(loaded - before, 1),
+        "rss_mb_used": round(used - before, 1),
+    }
+
+
+def run(repeat):
+    names = candidates()
+    shipped = _shipped(names)
+    lexicon, load_ms, rss = _load(lambda: LexiconNameValidator(fallback=False))
+    report = {
+        "candidates": len(names),
+        "shipped": shipped,
+        "lexicon": {
+            "load_ms": load_ms,
+            "rss_mb": rss,
+            "us_uncached": _us_per_candidate(lexicon._classify, names, repeat),
+            "us_cached": _us_per_candidate(lexicon.classify, names, repeat),
+            "ambiguous": round(sum(lexicon.classify(name) is None for name in names) / len(names), 3),
+        },
+    }
+
+    try:
+        spacy_validator, load_ms, rss = _load(SpacyNameValidator)
+    except (OSError, ImportError) as e:
+        report["spacy"] = {"error": str(e)}
+        return report
+    report["spacy"] = {
+        "load_ms": load_ms,
+        "rss_mb": rss,
+        "us_uncached": _us_per_candidate(spacy_validator.is_valid, names, max(1, repeat // 10)),
+    }
+    verdicts = [(lexicon.classify(name), spacy_validator.is_valid(name)) for name in names]
+    decided = [(ours, theirs) for ours, theirs in verdicts if ours is not None]
+    report["agreement"] = round(sum(ours == theirs for ours, theirs in decided) / max(1, len(decided)), 3)
+    return report
+
+
+def print_report(report):
+    print(f"{report['candidates']} candidates")
+    shipped = report["shipped"]
+    if "rss_mb_used" in shipped:
+        print(
+            f"as configured ({shipped['validator']}): {shipped['rss_mb_loaded']} MB after loading, "
+            f"{shipped['rss_mb_used']} MB after validating, spaCy fallback "
+            f"{'loaded' if shipped['fallback_loaded'] else 'not loaded'}\n"
+        )
+    print(f"{'validator':<12}{'load ms':>10}{'RSS MB':>10}{'us/name':>10}{'us cached':>12}")
+    for name in ("lexicon", "spacy"):
+        row = report[name]
+        if "error" in row:
+            print(f"{name:<12}  not available: {row['error']}")
+            continue
+        print(f"{name:<12}{row['load_ms']:>10}{str(row['rss_mb']):>10}{row['us_uncached']:>10}{str(row.get('us_cached', '')):>12}")
+    print(f"\nleft to the spaCy fallback: {report['lexicon']['ambiguous']:.1%}")
+    if "agreement" in report:
+        print(f"agreement with spaCy where the lexicon decides: {report['agreement']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares whole-page OCR with line-band OCR on synthetic pages.
+
+    python -m benchmarks.ocr_bands_benchmark [--pages 10] [--workers 4] [--json out.json]
+
+Pages go through preprocess() like the pipeline's pages. Each is OCR'd as
+one image ("page" mode) and cut into line bands recognised on a thread pool
+("bands" mode). The report has milliseconds per page for both, the speedup
+and how similar the band text is to the whole-page text (difflib ratio).
+The speedup depends on free cores: Tesseract releases the GIL, so the
+bands only run side by side when there are cores to run them on.
+"""
+import argparse
+import difflib
+import json
+import os
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import FILLER_LINES, render_page
+from src.layout_analyzer import split_line_bands
+from src.ocr_handler import OCRExtractor
+from src.preprocessing import ImagePreprocessor
+
+
+def make_pages(count, seed=0):
+    rng = np.random.default_rng(seed)
+    preprocessor = ImagePreprocessor()
+    pages = []
+    for i in range(count):
+        lines = [f"Name: Student {i}", "Major: Computer Science", f"GPA: {rng.uniform(2, 4):.2f}"] + FILLER_LINES * 2
+        pages.append(preprocessor.preprocess(render_page(lines, width=620, height=877, font_scale=0.6, line_gap=40, margin=40)))
+    return pages
+
+
+def _ms_per_page(fn, pages):
+    texts = []
+    start = time.perf_counter()
+    for page in pages:
+        texts.append(fn(page))
+    return round((time.perf_counter() - start) * 1000.0 / len(pages), 1), texts
+
+
+def run(pages, workers):
+    samples = make_pages(pages)
+    whole = OCRExtractor(page_mode="page")
+    bands = OCRExtractor(page_mode="bands", band_workers=workers)
+    try:
+        # One untimed page each, so engine start-up is not counted
+        whole.extract_page_text(samples[0])
+        bands.extract_page_text(samples[0])
+        page_ms, page_texts = _ms_per_page(whole.extract_page_text, samples)
+        bands_ms, band_texts = _ms_per_page(bands.extract_page_text, samples)
+    finally:
+        bands.shutdown()
+
+    similarity = [difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(page_texts, band_texts)]
+    return {
+        "pages": pages,
+        "workers": workers,
+        "cpu_count": os.cpu_count(),
+        "backend": whole.backend.name,
+        "bands_per_page": round(float(np.mean([len(split_line_bands(page, workers)) for page in samples])), 1),
+        "page_ms_per_page": page_ms,
+        "bands_ms_per_page": bands_ms,
+        "speedup": round(page_ms / bands_ms, 2),
+        "text_similarity": round(float(np.mean(similarity)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4, help="Bands per page and OCR threads")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args.pages, args.workers)
+
+    print(f"{report['pages']} pages, {report['backend']} backend, {report['cpu_count']} cores, "
+          f"{report['bands_per_page']} bands/page")
+    print(f"{'mode':<8}{'ms/page':>10}")
+    print(f"{'page':<8}{report['page_ms_per_page']:>10}")
+    print(f"{'bands':<8}{report['bands_ms_per_page']:>10}")
+    print(f"\nspeedup: {report['speedup']}x, text similarity: {report['text_similarity']:.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Offline benchmark of the extraction pipeline on synthetic student forms.
+
+    python -m benchmarks.pipeline_benchmark [--forms 5] [--variants baseline skewed]
+                                            [--json results.json] [--compare previous.json]
+
+Forms are rendered locally (see benchmarks/synthetic.py) in every variant the
+extractor special-cases and run through each stage separately:
+
+    preprocess  ImagePreprocessor.preprocess
+    ocr         FormExtractor._ocr (layout-driven or full-page OCR)
+    ner         FormNERModel.extract_entities
+    extract     FormExtractor.extract, end to end (cascade included)
+
+For every stage the report has ms/page and the peak Python heap (tracemalloc,
+which includes numpy buffers). Field accuracy and the cascade tier that
+answered (config.CASCADE_TIERS) are reported per variant. The JSON
+report records the git commit so runs from different commits can be compared
+with --compare.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import VARIANTS, generate_forms
+from src import config
+from src import metrics
+from src.extractor import FormExtractor
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+FIELDS = ["STUDENT_FIRST_NAME", "STUDENT_LAST_NAME", "MAJOR", "GPA"]
+STAGES = ["preprocess", "ocr", "ner", "extract"]
+
+
+def _measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = (time.perf_counter() - start) * 1000.0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _field_matches(expected, actual, field):
+    if field == "GPA":
+        try:
+            return abs(float(actual.get(field) or "nan") - float(expected[field])) < 1e-6
+        except ValueError:
+            return False
+    return (actual.get(field) or "").strip().lower() == expected[field].lower()
+
+
+def run(forms_per_variant, variants, seed=0):
+    extractor = FormExtractor()
+    extractor.warm_up()
+
+    timings = {stage: [] for stage in STAGES}
+    peaks = {stage: 0 for stage in STAGES}
+    accuracy = {}
+    tiers = {}
+
+    for variant, image, expected in generate_forms(forms_per_variant, variants, seed):
+        binary, ms, peak = _measure(extractor.preprocessor.preprocess, image)
+        timings["preprocess"].append(ms)
+        peaks["preprocess"] = max(peaks["preprocess"], peak)
+
+        text, ms, peak = _measure(extractor._ocr, binary)
+        timings["ocr"].append(ms)
+        peaks["ocr"] = max(peaks["ocr"], peak)
+
+        _, ms, peak = _measure(extractor.ner_model.extract_entities, text)
+        timings["ner"].append(ms)
+        peaks["ner"] = max(peaks["ner"], peak)
+
+        (result, collected), ms, peak = _measure(metrics.collect_timings, extractor.extract, image)
+        timings["extract"].append(ms)
+        peaks["extract"] = max(peaks["extract"], peak)
+        for tier in metrics.counted(collected, metrics.TIERS):
+            tiers.setdefault(variant, {}).setdefault(tier, 0)
+            tiers[variant][tier] += 1
+
+        scores = accuracy.setdefault(variant, {field: 0 for field in FIELDS})
+        for field in FIELDS:
+            scores[field] += _field_matches(expected, result, field)
+
+    pages = forms_per_variant * len(variants)
+    return {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "ocr_backend": extractor.ocr_extractor.backend.name,
+        "config": {name: getattr(config, name, None) for name in config.RESULT_CACHE_FINGERPRINT_KEYS},
+        "pages": pages,
+        "stages": {
+            stage: {
+                "ms_per_page": round(float(np.mean(timings[stage])), 2),
+                "p95_ms": round(float(np.percentile(timings[stage], 95)), 2),
+                "peak_heap_mb": round(peaks[stage] / 1e6, 2),
+            }
+            for stage in STAGES
+        },
+        # ru_maxrss is KiB on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1) if resource else None,
+        "accuracy": {
+            variant: {field: round(hits / forms_per_variant, 3) for field, hits in scores.items()}
+            for variant, scores in accuracy.items()
+        },
+        "tiers": tiers,
+        "overall_accuracy": round(
+            sum(sum(scores.values()) for scores in accuracy.values()) / float(pages * len(FIELDS)), 3
+        ),
+    }
+
+
+def print_report(report, previous=None):
+    def delta(value, old):
+        if old is None:
+            return ""
+        return f" ({value - old:+.2f})"
+
+    print(f"commit {report['commit']}  ocr={report['ocr_backend']}  pages={report['pages']}  max_rss={report['max_rss_mb']}MB")
+    print(f"{'stage':<12}{'ms/page':>22}{'p95 ms':>12}{'peak heap MB':>16}")
+    for stage, row in report["stages"].items():
+        old = previous["stages"].get(stage, {}) if previous else {}
+        ms = f"{row['ms_per_page']}{delta(row['ms_per_page'], old.get('ms_per_page'))}"
+        print(f"{stage:<12}{ms:>22}{row['p95_ms']:>12}{row['peak_heap_mb']:>16}")
+
+    print(f"\n{'variant':<12}" + "".join(f"{field:>20}" for field in FIELDS))
+    for variant, scores in report["accuracy"].items():
+        tier_counts = " ".join(f"{tier}={n}" for tier, n in sorted(report.get("tiers", {}).get(variant, {}).items()))
+        print(f"{variant:<12}" + "".join(f"{scores[field]:>20}" for field in FIELDS) + f"   {tier_counts}")
+    old = previous.get("overall_accuracy") if previous else None
+    print(f"\noverall accuracy {report['overall_accuracy']}{delta(report['overall_accuracy'], old)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--forms", type=int, default=5, help="Forms per variant")
+    parser.add_argument("--variants", nargs="+", default=VARIANTS, choices=VARIANTS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to show deltas against")
+    args = parser.parse_args()
+
+    report = run(args.forms, args.variants, args.seed)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(report, previous)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
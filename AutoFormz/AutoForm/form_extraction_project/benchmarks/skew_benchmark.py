@@ -0,0 +1,76 @@
+"""
+Compares skew estimators on synthetic pages rotated by known angles.
+
+    python -m benchmarks.skew_benchmark [--pages 40] [--limit 5] [--json out.json]
+
+Pages are rendered like preprocess() sees them (grayscale, upscaled by
+config.PREPROCESS_SCALE). For every estimator the absolute angle error and
+wall-clock milliseconds per page are reported.
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import FILLER_LINES, render_page, rotate_page
+from src import config
+from src.skew import SKEW_ESTIMATORS
+
+
+def make_samples(count, limit, seed=0):
+    rng = np.random.default_rng(seed)
+    samples = []
+    for i in range(count):
+        angle = float(rng.uniform(-limit, limit))
+        lines = [f"Name: Student {i}", "Major: Computer Science", f"GPA: {rng.uniform(2, 4):.2f}"] + FILLER_LINES * 3
+        page = rotate_page(render_page(lines, width=620, height=877, font_scale=0.6, line_gap=40, margin=40), angle)
+        gray = cv2.cvtColor(page, cv2.COLOR_BGR2GRAY)
+        gray = cv2.resize(gray, None, fx=config.PREPROCESS_SCALE, fy=config.PREPROCESS_SCALE, interpolation=cv2.INTER_LINEAR)
+        # The estimator must undo the rotation, so the expected answer is -angle
+        samples.append((gray, -angle))
+    return samples
+
+
+def run(pages, limit):
+    samples = make_samples(pages, limit)
+    report = {"pages": pages, "angle_limit": limit, "scale": config.PREPROCESS_SCALE, "estimators": {}}
+
+    for name, estimator_cls in SKEW_ESTIMATORS.items():
+        estimator = estimator_cls()
+        errors, timings = [], []
+        for gray, expected in samples:
+            start = time.perf_counter()
+            angle = estimator.estimate(gray)
+            timings.append((time.perf_counter() - start) * 1000.0)
+            errors.append(abs(angle - expected))
+
+        report["estimators"][name] = {
+            "mean_abs_error_deg": round(float(np.mean(errors)), 3),
+            "max_abs_error_deg": round(float(np.max(errors)), 3),
+            "ms_per_page": round(float(np.mean(timings)), 2),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--limit", type=float, default=5.0, help="Rotate test pages uniformly within +/- limit degrees")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args.pages, args.limit)
+
+    print(f"{'estimator':<16}{'mean err':>10}{'max err':>10}{'ms/page':>10}")
+    for name, row in report["estimators"].items():
+        print(f"{name:<16}{row['mean_abs_error_deg']:>10}{row['max_abs_error_deg']:>10}{row['ms_per_page']:>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
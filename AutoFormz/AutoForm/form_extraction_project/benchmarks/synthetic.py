@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+FILLER_LINES = [
+    "University of Technology - Office of the Registrar",
+    "Please print clearly using block capitals",
+    "Signature of applicant and date of submission",
+    "For official use only. Do not write below this line",
+]
+
+
+def render_page(lines, width=1240, height=1754, font_scale=1.1, line_gap=70, margin=80):
+    """
+    Draws black text lines on a white page (A4 at 150 DPI by default).
+    """
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+    y = margin + 40
+    for line in lines:
+        cv2.putText(page, line, (margin, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), 2, cv2.LINE_AA)
+        y += line_gap
+    return page
+
+
+def rotate_page(page, angle):
+    """
+    Rotates the page by `angle` degrees (counter-clockwise) around its centre,
+    filling the uncovered corners with white like a scanner bed.
+    """
+    h, w = page.shape[:2]
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    return cv2.warpAffine(page, M, (w, h), flags=cv2.INTER_LINEAR, borderValue=(255, 255, 255))
+
+
+# --- Synthetic student forms -------------------------------------------------
+
+FIRST_NAMES = ["John", "Sarah", "Michael", "Alice", "Robert", "Jenny", "Bruce", "Clark", "Diana", "Maria", "David", "Emily"]
+LAST_NAMES = ["Smith", "Connor", "Jordan", "Lopez", "Wayne", "Kent", "Prince", "Garcia", "Miller", "Brown", "Taylor", "Wilson"]
+MAJORS = ["Computer Science", "Mechanical Engineering", "Biology", "Physics", "Criminal Justice", "Journalism", "Anthropology", "Economics"]
+
+# Variations the extractor already special-cases
+VARIANTS = ["baseline", "skewed", "inverted", "ruled", "no_labels", "noisy"]
+
+
+def random_record(rng):
+    return {
+        "STUDENT_FIRST_NAME": str(rng.choice(FIRST_NAMES)),
+        "STUDENT_LAST_NAME": str(rng.choice(LAST_NAMES)),
+        "MAJOR": str(rng.choice(MAJORS)),
+        "GPA": str(round(float(rng.uniform(2.0, 4.0)), 1)),
+    }
+
+
+def render_form(record, variant, rng):
+    """
+    Renders one student form for `record` in the given variant.
+    Returns a BGR image.
+    """
+    name = f"{record['STUDENT_FIRST_NAME']} {record['STUDENT_LAST_NAME']}"
+    if variant == "no_labels":
+        lines = [f"Transcript for {name}", record["MAJOR"], f"{record['GPA']} GPA"]
+    else:
+        lines = [f"Name: {name}", f"Major: {record['MAJOR']}", f"GPA: {record['GPA']}"]
+    lines = FILLER_LINES[:1] + lines + FILLER_LINES[1:]
+
+    page = render_page(lines, width=1000, height=700, font_scale=0.9, line_gap=60, margin=60)
+
+    if variant == "skewed":
+        page = rotate_page(page, float(rng.choice([-1, 1]) * rng.uniform(2.0, 8.0)))
+    elif variant == "inverted":
+        page = 255 - page
+        page = np.clip(page.astype(np.int16) + 20, 0, 255).astype(np.uint8)  # dark grey, not pure black
+    elif variant == "ruled":
+        for y in range(110, page.shape[0], 60):
+            cv2.line(page, (0, y), (page.shape[1], y), (0, 0, 255), 2)  # red rules under the text
+        for x in (40, page.shape[1] - 40):
+            cv2.line(page, (x, 0), (x, page.shape[0]), (255, 0, 0), 2)  # blue margins
+    elif variant == "noisy":
+        noise = rng.normal(0, 25, page.shape)
+        page = np.clip(page.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+        specks = rng.random(page.shape[:2]) < 0.002
+        page[specks] = 0
+        page = cv2.GaussianBlur(page, (3, 3), 0)
+
+    return page
+
+
+def generate_forms(count, variants=None, seed=0):
+    """
+    Yields (variant, image, expected) for `count` forms per variant.
+    """
+    rng = np.random.default_rng(seed)
+    for variant in variants or VARIANTS:
+        for _ in range(count):
+            record = random_record(rng)
+            yield variant, render_form(record, variant, rng), record
@@ -1,5 +1,130 @@
+import gc
+import logging
+import os
+import signal
+import socket
+from src import config
+
+# Tesseract reads its OpenMP thread limit when it is first loaded, which
+# happens when src.api imports the OCR handler
+os.environ.setdefault("OMP_THREAD_LIMIT", str(config.TESSERACT_THREADS))
+
+import cv2
 from src.api import app
 
-if __name__ == "__main__":
+logger = logging.getLogger("autoform.launcher")
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def worker_count():
+    if config.API_WORKERS:
+        return config.API_WORKERS
+    # Every server process already runs EXTRACT_MAX_WORKERS extractions at once
+    return max(1, available_cores() // max(1, config.EXTRACT_MAX_WORKERS))
+
+
+def _serve(sock=None):
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    cv2.setNumThreads(config.OPENCV_THREADS)
+    server = uvicorn.Server(uvicorn.Config(
+        app, host=config.API_HOST, port=config.API_PORT, log_level=config.LOG_LEVEL.lower()
+    ))
+    server.run(sockets=[sock] if sock is not None else None)
+
+
+def _spawn(sock):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            _serve(sock)
+        except BaseException as e:
+            logger.error(f"Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve_forked(workers):
+    """
+    Loads the models once, then forks `workers` server processes that accept
+    on one shared socket. The forked workers share the loaded models
+    copy-on-write instead of each holding its own copy, and the cores are
+    split between their batch pools. Workers that die are replaced;
+    SIGINT/SIGTERM stop them all.
+
+    Everything else is per worker: /metrics, /cache/stats and the memory
+    tier of the result cache only cover the process that answers the
+    request (the disk tier is shared). Scrape with API_WORKERS = 1 when the
+    numbers must cover the whole server.
+    """
+    from src import api
+    if not config.BATCH_MAX_WORKERS:
+        # Each batch pool process loads its own models; cores // workers keeps one model copy per core
+        api.pool.max_workers = max(1, available_cores() // workers)
+    if config.API_PRELOAD_MODELS and api.preload_models():
+        api.prepare_fork()
+        logger.info(f"Models preloaded in launcher {os.getpid()}")
+    # Keep the garbage collector from touching (and so copying) the preloaded objects
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.create_server((config.API_HOST, config.API_PORT), backlog=config.API_BACKLOG)
+    sock.set_inheritable(True)
+    children = {_spawn(sock) for _ in range(workers)}
+    logger.info(f"Serving on http://{config.API_HOST}:{config.API_PORT} with {workers} workers")
+
+    stopping = []
+
+    def stop(signum, _frame):
+        stopping.append(signum)
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, starting a new one")
+            children.add(_spawn(sock))
+    sock.close()
+
+
+def main():
+    logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+    # Before any model is preloaded or warmed up, so the launcher's OpenCV runs with the same limit
+    cv2.setNumThreads(config.OPENCV_THREADS)
+    if os.environ.get("AUTOFORM_RELOAD") == "1":
+        # Auto-reload restarts the server (and reloads every model) on each file save,
+        # so it is opt-in for development: set AUTOFORM_RELOAD=1
+        import uvicorn
+        uvicorn.run("main:app", host=config.API_HOST, port=config.API_PORT, reload=True)
+        return
+
+    workers = worker_count()
+    if workers == 1 or not hasattr(os, "fork"):
+        # Windows has no fork: a single process that loads its models on startup
+        _serve()
+    else:
+        serve_forked(workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,450 @@
-from fastapi import FastAPI, File, UploadFile
-from src.extractor import FormExtractor
-import shutil
-import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from urllib.parse import urlparse
+from fastapi import FastAPI, File, Form, HTTPException, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from src import config
+from src import metrics
+from src import ocr_handler  # noqa: F401 - OCR bindings must be imported on the main thread
+from src.job_store import JobStore
+from src.job_worker import JobWorker
+from src.preprocessing import ImageTooLarge
+from src.result_cache import ResultCache
+from src.upload_limits import UploadLimitMiddleware
+from src.workers import BoundedExecutor, ExecutorBusy, ExtractionPool, extract_in_worker
+import asyncio
 import json
+import logging
+import os
+import threading
+import time
+import zipfile
+
+logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# Models load in a background thread after the port is bound; see /ready
+extractor = None
+models_ready = threading.Event()
+startup_report = {}
+pool = ExtractionPool()
+executor = BoundedExecutor(config.EXTRACT_EXECUTOR, config.EXTRACT_MAX_WORKERS, config.EXTRACT_MAX_PENDING)
+result_cache = ResultCache(
+    config.RESULT_CACHE_MAX_ENTRIES, config.RESULT_CACHE_DIR, config.RESULT_CACHE_DISK_MAX_BYTES
+) if config.RESULT_CACHE_ENABLED else None
+job_store = JobStore()
+jobs_stopping = threading.Event()
+
+def _load_models(start_jobs=True):
+    global extractor
+    start = time.perf_counter()
+    try:
+        if executor.kind == "process":
+            # Workers hold their own extractors; the API process needs none
+            executor.warm_up()
+        else:
+            # Imported here so importing the API doesn't pull in spaCy
+            from src.extractor import FormExtractor
+            loaded = FormExtractor()
+            if config.WARMUP_ON_STARTUP:
+                loaded.warm_up()
+            startup_report["load_times"] = loaded.load_times
+            extractor = loaded
+        startup_report["total_seconds"] = round(time.perf_counter() - start, 3)
+        logger.info(f"✅ API: Models ready after {startup_report['total_seconds']:.2f}s")
+        models_ready.set()
+        if start_jobs:
+            _start_job_workers()
+    except Exception as e:
+        startup_report["error"] = str(e)
+        logger.error(f"API: Model loading failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    if models_ready.is_set():
+        # Preloaded by the launcher (main.py) before this worker was forked
+        _start_job_workers()
+    else:
+        threading.Thread(target=_load_models, name="model-loader", daemon=True).start()
+    yield
+    jobs_stopping.set()
+    executor.shutdown()
+    pool.shutdown()
 
-app = FastAPI()
-extractor = FormExtractor()
+def preload_models() -> bool:
+    """
+    Loads the models in the launcher process so forked workers share them.
+    Returns False when there is nothing to share: with the process executor
+    every extraction worker loads its own models.
+    """
+    if executor.kind == "process":
+        return False
+    _load_models(start_jobs=False)
+    if not models_ready.is_set():
+        raise RuntimeError(startup_report.get("error", "Model loading failed"))
+    # Also without a warm-up: with VALIDATOR_FALLBACK_PRELOAD the fallback is shared rather than loaded per worker
+    extractor.ner_model.preload_validator()
+    return True
+
+def prepare_fork():
+    """
+    Stops the threads and closes the SQLite connection the launcher made
+    while preloading; neither survives a fork.
+    """
+    if extractor is not None:
+        extractor.shutdown_pools()
+    job_store.close()
+
+def _start_job_workers():
+    # Jobs left queued or running by a previous run are picked up again from the store
+    extract_batch = extractor.extract_batch if extractor is not None else pool.extract_batch
+    for i in range(config.JOB_WORKERS):
+        worker = JobWorker(job_store, extract_batch, name=f"api-{os.getpid()}-{i}", result_cache=result_cache)
+        worker.start(jobs_stopping)
+
+app = FastAPI(lifespan=lifespan)
+# Single-form endpoints take one image plus a little multipart framing
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={"/extract-form/": config.MAX_FILE_SIZE + 64 * 1024},
+    default=config.MAX_REQUEST_SIZE,
+)
 
 @app.post("/extract-form/")
-async def extract_form_data(file: UploadFile = File(...)):
+async def extract_form_data(response: Response, file: UploadFile = File(...)):
     """
-    Accepts an image file, saves it temporarily, runs the extractor,
-    and returns the extracted data.
+    Accepts an image file, decodes it straight from the upload buffer,
+    runs the extractor, and returns the extracted data.
+    Per-stage timings come back in the Server-Timing header and the
+    cascade tier that produced the result in X-Extraction-Tier.
     """
-    # Create a temporary directory to store the uploaded file
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
-    file_path = os.path.join(temp_dir, file.filename)
-    
     try:
-        # Save the uploaded file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        print(f"🔄 API: Processing file: {file_path}")
+        image_bytes = await file.read()
+
+        if not models_ready.is_set():
+            _raise_busy("Models are still loading, please retry later.")
+
+        # Identical scans are answered from the cache without a worker
+        cache_key = result_cache.key_for(image_bytes) if result_cache else None
+        if cache_key:
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"✅ API: Cache hit for {file.filename}")
+                metrics.REQUESTS.inc("cache_hit")
+                return cached
+
+        # Reject straight away when the executor queue is full
+        if executor.is_full():
+            _raise_busy()
+
+        logger.debug(f"🔄 API: Processing file: {file.filename}")
         
-        # Use your actual AI extractor
-        extracted_data = extractor.extract(file_path)
+        # Use your actual AI extractor, off the event loop
+        extract_fn = extract_in_worker if executor.kind == "process" else extractor.extract
+        extracted_data, timings = await executor.run(
+            metrics.collect_timings, extract_fn, image_bytes, timeout=config.EXTRACT_TIMEOUT
+        )
+        metrics.observe(timings)
+        metrics.REQUESTS.inc("ok")
+        if config.SERVER_TIMING_HEADER:
+            response.headers["Server-Timing"] = metrics.server_timing(timings)
+        tiers = metrics.counted(timings, metrics.TIERS)
+        if tiers:
+            response.headers["X-Extraction-Tier"] = tiers[-1]
+        if cache_key:
+            result_cache.put(cache_key, extracted_data)
         
-        print(f"✅ API: Extraction completed. Data: {json.dumps(extracted_data, indent=2)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"✅ API: Extraction completed. Data: {json.dumps(extracted_data, indent=2)}")
         
+    except HTTPException:
+        raise
+
+    except ExecutorBusy:
+        _raise_busy()
+
+    except ImageTooLarge as e:
+        metrics.REQUESTS.inc("rejected")
+        raise HTTPException(status_code=413, detail=str(e))
+
+    except asyncio.TimeoutError:
+        logger.warning(f"API: Extraction timed out after {config.EXTRACT_TIMEOUT}s: {file.filename}")
+        metrics.REQUESTS.inc("timeout")
+        raise HTTPException(status_code=504, detail=f"Extraction timed out after {config.EXTRACT_TIMEOUT} seconds.")
+
     except Exception as e:
         # If extraction fails, return error
-        print(f"API: Extraction failed: {str(e)}")
+        logger.error(f"API: Extraction failed: {str(e)}")
+        metrics.REQUESTS.inc("error")
         return {"error": f"Extraction failed: {str(e)}"}
         
     finally:
-        # Clean up temporary file
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        await file.close()
     
-    return extracted_data
\ No newline at end of file
+    return extracted_data
+
+@app.post("/extract-form/stream")
+async def extract_form_stream(file: UploadFile = File(...)):
+    """
+    Streaming variant of /extract-form/ as Server-Sent Events: a "stage"
+    event as each pipeline stage finishes, "field" events as soon as a value
+    is known (provisional ones before NER has run), then a "result" event
+    with exactly what /extract-form/ returns. Failures after the stream has
+    started arrive as an "error" event.
+    """
+    try:
+        image_bytes = await file.read()
+    finally:
+        await file.close()
+
+    if not models_ready.is_set():
+        _raise_busy("Models are still loading, please retry later.")
+
+    cache_key = result_cache.key_for(image_bytes) if result_cache else None
+    cached = result_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        metrics.REQUESTS.inc("cache_hit")
+        events = iter([_sse("stage", {"stage": "cache"}), _sse("result", cached)])
+    else:
+        if executor.is_full():
+            _raise_busy()
+        logger.debug(f"🔄 API: Streaming extraction of {file.filename}")
+        events = _stream_extraction(file.filename, image_bytes, cache_key)
+    return StreamingResponse(
+        events, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _stream_extraction(filename, image_bytes, cache_key):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def push(event):
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    if executor.kind == "process":
+        # Progress can't be streamed back from a worker process; only the result is sent
+        job = executor.run(metrics.collect_timings, extract_in_worker, image_bytes, timeout=config.EXTRACT_TIMEOUT)
+    else:
+        job = executor.run(metrics.collect_timings, _push_events, image_bytes, push, timeout=config.EXTRACT_TIMEOUT)
+    task = asyncio.ensure_future(job)
+    # Queued behind every event the worker pushed, however the job ends
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+
+    while (event := await queue.get()) is not None:
+        yield _sse(*event)
+    try:
+        extracted_data, timings = await task
+    except ExecutorBusy:
+        metrics.REQUESTS.inc("rejected")
+        yield _sse("error", {"error": "Server is busy, please retry later."})
+    except ImageTooLarge as e:
+        metrics.REQUESTS.inc("rejected")
+        yield _sse("error", {"error": str(e)})
+    except asyncio.TimeoutError:
+        logger.warning(f"API: Extraction timed out after {config.EXTRACT_TIMEOUT}s: {filename}")
+        metrics.REQUESTS.inc("timeout")
+        yield _sse("error", {"error": f"Extraction timed out after {config.EXTRACT_TIMEOUT} seconds."})
+    except Exception as e:
+        logger.error(f"API: Extraction failed: {str(e)}")
+        metrics.REQUESTS.inc("error")
+        yield _sse("error", {"error": f"Extraction failed: {str(e)}"})
+    else:
+        metrics.observe(timings)
+        metrics.REQUESTS.inc("ok")
+        if cache_key:
+            result_cache.put(cache_key, extracted_data)
+        yield _sse("result", extracted_data)
+
+def _push_events(image_bytes, push):
+    # Runs on an executor thread; the result event is sent by the caller once the job is done
+    for event, payload in extractor.iter_extract(image_bytes):
+        if event == "result":
+            return payload
+        push((event, payload))
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.get("/ready")
+def readiness():
+    """
+    Returns 200 once the models are loaded (and warmed up), 503 before that.
+    Load balancers should only route traffic here after this succeeds.
+    """
+    body = {"ready": models_ready.is_set(), **startup_report}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Per-stage latency histograms and request counters in the Prometheus text
+    format, for the server process that answers (see main.serve_forked).
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def _raise_busy(detail="Server is busy, please retry later."):
+    logger.warning(f"API: Rejecting request, {executor.in_flight} extractions in flight")
+    metrics.REQUESTS.inc("rejected")
+    raise HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(config.EXTRACT_RETRY_AFTER)},
+    )
+
+@app.post("/extract-forms/")
+async def extract_forms_data(files: List[UploadFile] = File(...)):
+    """
+    Accepts many image files (or zip archives of images), runs them through
+    the worker pool in parallel, and returns one result per image in input order.
+    A busy server answers 503; chunks only go to idle worker processes, so a
+    large batch can't flood the pool or hold the single-form executor's threads.
+    """
+    if executor.is_full():
+        _raise_busy()
+    names, images = await run_in_threadpool(_read_batch, files)
+    if not images:
+        raise HTTPException(status_code=400, detail="No images found in upload.")
+
+    # Serve cached results and only send each distinct uncached image to the pool once
+    outcomes = [None] * len(images)
+    pending = {}
+    for i, image in enumerate(images):
+        key = result_cache.key_for(image) if result_cache else i
+        cached = result_cache.get(key) if result_cache else None
+        if cached is not None:
+            outcomes[i] = cached
+        else:
+            pending.setdefault(key, []).append(i)
+
+    logger.info(f"🔄 API: Processing batch of {len(images)} files ({len(pending)} uncached)")
+    fresh = await pool.extract_many([images[indexes[0]] for indexes in pending.values()], executor)
+    for (key, indexes), outcome in zip(pending.items(), fresh):
+        if result_cache and not isinstance(outcome, Exception):
+            result_cache.put(key, outcome)
+        for i in indexes:
+            outcomes[i] = outcome
+
+    results = []
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"API: Extraction failed for {name}: {outcome}")
+            results.append({"filename": name, "error": f"Extraction failed: {outcome}"})
+        else:
+            results.append({"filename": name, "data": outcome})
+
+    logger.info(f"✅ API: Batch completed. {len(results)} files processed.")
+    return {"results": results}
+
+@app.post("/jobs/", status_code=202)
+async def submit_job(
+    response: Response,
+    files: List[UploadFile] = File(...),
+    priority: Optional[int] = Form(None),
+    callback_url: Optional[str] = Form(None),
+):
+    """
+    Queues images (or zip archives of images) for extraction and returns a
+    job id straight away. Poll GET /jobs/{job_id} for progress and results.
+    Single-file jobs get interactive priority and run ahead of bulk jobs.
+    """
+    # Reading the uploads and writing them to SQLite both block; keep them off the event loop
+    names, images = await run_in_threadpool(_read_batch, files)
+    if not images:
+        raise HTTPException(status_code=400, detail="No images found in upload.")
+
+    callback_url = callback_url or config.JOB_CALLBACK_URL
+    if callback_url:
+        _check_callback_url(callback_url)
+    if priority is None:
+        priority = config.JOB_PRIORITY_INTERACTIVE if len(images) == 1 else config.JOB_PRIORITY_BULK
+
+    job_id = await run_in_threadpool(job_store.submit, names, images, priority, callback_url)
+    logger.info(f"🔄 API: Queued job {job_id} with {len(images)} files (priority {priority})")
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {"job_id": job_id, "status": "queued", "total": len(images), "priority": priority}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = 0):
+    """
+    Returns the job's progress, plus its results once it is done. With
+    ?wait=N the request is held open up to N seconds (at most JOB_MAX_WAIT)
+    until the job finishes.
+    """
+    deadline = time.monotonic() + min(max(wait, 0), config.JOB_MAX_WAIT)
+    while True:
+        body = await run_in_threadpool(job_store.status, job_id)
+        if body is None:
+            raise HTTPException(status_code=404, detail="Unknown job.")
+        if body["status"] == "done" or time.monotonic() >= deadline:
+            return body
+        await asyncio.sleep(config.JOB_POLL_INTERVAL)
+
+def _check_callback_url(url):
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or parsed.hostname not in config.JOB_CALLBACK_ALLOWED_HOSTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Callbacks are only sent over http(s) to: {', '.join(config.JOB_CALLBACK_ALLOWED_HOSTS)}.",
+        )
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Returns hit/miss counters and tier sizes of the result cache, for the
+    server process that answers (its "pid").
+    """
+    if not result_cache:
+        return {"enabled": False, "pid": os.getpid()}
+    return {"enabled": True, "pid": os.getpid(), **result_cache.stats()}
+
+def _read_batch(files):
+    """
+    Reads every uploaded image, and every image inside uploaded zips,
+    into memory. Returns display names and encoded image bytes in order.
+    Blocking: call it on the threadpool.
+    """
+    names, images = [], []
+    total = [0]
+
+    def check_total(size):
+        total[0] += size
+        if total[0] > config.BATCH_MAX_TOTAL_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch exceeds {config.BATCH_MAX_TOTAL_SIZE // (1024 * 1024)}MB of images once unzipped.",
+            )
+
+    def add(name, data):
+        if len(images) >= config.BATCH_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds {config.BATCH_MAX_FILES} files.")
+        _check_file_size(name, len(data))
+        names.append(name)
+        images.append(data)
+
+    for upload in files:
+        upload.file.seek(0)
+        if zipfile.is_zipfile(upload.file):
+            upload.file.seek(0)
+            with zipfile.ZipFile(upload.file) as archive:
+                for member in archive.infolist():
+                    if member.is_dir() or not member.filename.lower().endswith(config.BATCH_IMAGE_EXTENSIONS):
+                        continue
+                    # Checked before extracting, so a zip bomb is never inflated; reads
+                    # stop at the declared size, so a member can't inflate past it either
+                    _check_file_size(f"{upload.filename}/{member.filename}", member.file_size)
+                    check_total(member.file_size)
+                    add(f"{upload.filename}/{member.filename}", archive.read(member))
+        else:
+            upload.file.seek(0)
+            data = upload.file.read()
+            check_total(len(data))
+            add(upload.filename, data)
+
+    return names, images
+
+def _check_file_size(name, size):
+    if size > config.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=413, detail=f"{name} exceeds the {config.MAX_FILE_SIZE // (1024 * 1024)}MB file limit."
+        )
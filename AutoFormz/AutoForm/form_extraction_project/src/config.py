@@ -1,18 +1,100 @@
 # Configuration for Form Extraction System
+import os
 
 # Model Settings
 MODEL_PATH = "./models/form_ner_v1"
+CUSTOM_MODEL_DIR = "models/custom_form_model"
+VALIDATOR_MODEL = "en_core_web_sm"
+# Validator pipeline components we never use; excluding them speeds up loading and inference
+VALIDATOR_EXCLUDE = ["tagger", "parser", "attribute_ruler", "lemmatizer", "senter", "morphologizer"]
 CONFIDENCE_THRESHOLD = 0.7
+NAME_VALIDATOR = "lexicon"  # "lexicon" (name list + shape rules), "spacy" (VALIDATOR_MODEL on every name) or "none"
+# The bundled lexicon is a placeholder of ~480 common US names; build a full one from SSA/Census
+# lists with `python -m src.name_validator --given ... --surnames ...`
+NAME_LEXICON_PATH = "models/name_lexicon.tsv"
+NAME_VALIDATOR_CACHE_SIZE = 4096  # memoised lexicon verdicts per process
+VALIDATOR_FALLBACK = True  # lexicon mode: names the rules can't settle go to VALIDATOR_MODEL, loaded on the first such name
+VALIDATOR_FALLBACK_PRELOAD = False  # True loads the fallback at warm-up/before forking instead; every process then holds it
+
+# OCR Correction Settings
+MAJOR_CATALOG_PATH = "models/catalog/majors.txt"  # one valid major per line; given names come from NAME_LEXICON_PATH
+MAJOR_CATALOG_STRICT = False  # True drops majors that are not within reach of a catalog entry
+CORRECTION_MAX_DISTANCE = 2  # edit budget when snapping OCR text to the catalog; words under 5 letters get 1
+CORRECTION_PREFIX_LENGTH = 7  # leading characters indexed per entry; bounds the index size for long entries
+
+# Training Settings (python -m training.train_model)
+TRAINING_DATA_PATH = "training/data/training_data.json"  # extra examples on top of the built-in seed set
+TRAINING_CORPUS_DIR = "training/data/corpus"  # train.spacy / dev.spacy, rebuilt when the data changes
+TRAIN_DEV_SPLIT = 0.2  # share of examples held out for evaluation
+TRAIN_MIN_DEV_SIZE = 20  # smaller dev sets are too noisy to stop on: no split, all TRAIN_MAX_EPOCHS are trained
+TRAIN_OUTPUT_DIR = "models/trained_form_model"  # point CUSTOM_MODEL_DIR here once the new model checks out
+TRAIN_MAX_EPOCHS = 100  # also the epoch count when there is no dev set
+TRAIN_PATIENCE = 10  # epochs without a better dev F-score before stopping
+TRAIN_BATCH_START = 4  # minibatch size compounds from START to STOP by COMPOUND per batch
+TRAIN_BATCH_STOP = 32
+TRAIN_BATCH_COMPOUND = 1.001
+TRAIN_DROPOUT = 0.3
+TRAIN_SEED = 0
+
+# Annotation Settings (python -m training.annotate_data)
+ANNOTATE_OUTPUT_DIR = "training/data/annotated"
+ANNOTATE_WORKERS = None  # None = one worker process per CPU core
+ANNOTATE_CHUNK_SIZE = 8  # files handed to a worker at once
+ANNOTATE_MIN_OCR_CONFIDENCE = 80  # pages with a lower mean word confidence are flagged for review
+
+# Preprocessing Settings
+PREPROCESS_THUMBNAIL_SIZE = 1000  # longest side of the thumbnail all preprocessing decisions are made on
+PREPROCESS_SCALE_MODE = "adaptive"  # "adaptive" sizes text for Tesseract, "fixed" always uses PREPROCESS_SCALE
+PREPROCESS_SCALE = 3.0  # Fixed scale factor, also the fallback when text height can't be measured
+TEXT_HEIGHT_TARGET = 30  # Median glyph height in pixels that adaptive scaling aims for
+PREPROCESS_MIN_SCALE = 0.5
+PREPROCESS_MAX_SCALE = 4.0
+PREPROCESS_MAX_PAGE_PIXELS = 40_000_000  # ceiling on the scaled page (border included); larger scales are reduced to fit
+SKEW_METHOD = "coarse_to_fine"  # "coarse_to_fine" or "projection" (original 1-degree brute force)
+SKEW_ANGLE_LIMIT = 15  # degrees searched either side of horizontal
+SKEW_MIN_ANGLE = 0.2  # smaller corrections are not worth a rotation
 
 # OCR Settings
 OCR_LANGUAGE = "eng"
 OCR_PSM_MODE = 6  # Assume uniform block of text
+OCR_ENGINE_MODE = 3  # Default engine (LSTM where available)
+OCR_PAGE_MODE = "page"  # full-page OCR: "page" is one Tesseract call, "bands" OCRs line bands concurrently
+OCR_BAND_WORKERS = 4  # "bands" mode: bands per page, recognised on this many threads
+OCR_BAND_MIN_GAP = 4  # blank rows needed between two text lines for a band cut
+OCR_BACKEND = "auto"  # "tesserocr" (engine stays loaded), "pytesseract" (one process per page) or "auto"
+# Executable used by the pytesseract backend; None means look it up on PATH
+TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe" if os.name == "nt" else None
+TESSDATA_PATH = None  # Folder holding <lang>.traineddata for tesserocr; None uses its built-in default
 
 # Extraction Settings
 ENABLE_NATURAL_LANGUAGE = True
-ENABLE_LAYOUT_ANALYSIS = True
+# Layout analysis OCRs each labelled line on its own. "auto" turns it on only for the tesserocr
+# backend; with pytesseract every line is a tesseract process and one full-page call is faster
+ENABLE_LAYOUT_ANALYSIS = "auto"
 ENABLE_REGEX_FALLBACK = True
 
+# Layout Analysis Settings (used when ENABLE_LAYOUT_ANALYSIS is on)
+# Label words that start a line holding a field value.
+# None = the first word of every label of the SUPPORTED_FIELDS in src/fields.py
+LAYOUT_ANCHORS = None
+LAYOUT_MIN_ANCHORS = 2  # fewer anchors than this falls back to full-page OCR
+LAYOUT_OCR_WORKERS = 4  # crops OCR'd concurrently per page
+
+# Multi-page Document Settings (PDF and TIFF uploads)
+PDF_RENDER_DPI = 200  # PDFs need the optional pypdfium2 package
+DOCUMENT_MAX_PAGES = 50  # pages after this are ignored
+DOCUMENT_PAGE_WORKERS = 2  # pages preprocessed and OCR'd concurrently
+DOCUMENT_PAGE_LOOKAHEAD = 3  # pages rasterised ahead of the one being merged; bounds memory use
+
+# Extraction Cascade Settings
+# Result fields that must all have a validated value for a cheap tier's answer
+# to be accepted, and for a multi-page document to stop reading further pages
+REQUIRED_FIELDS = ["STUDENT_FIRST_NAME", "STUDENT_LAST_NAME", "MAJOR", "GPA"]
+# Cheap tiers tried, in order, before the full pipeline; [] always runs the full pipeline
+#   "fast" - grayscale + Otsu, OCR and regex fields only (no line removal, deskew or NER)
+CASCADE_TIERS = ["fast"]
+CASCADE_MIN_CONFIDENCE = 85  # mean Tesseract word confidence (0-100) a cheap tier needs
+
 # Supported Field Types
 SUPPORTED_FIELDS = [
     "FULL_NAME",
@@ -27,12 +109,114 @@ SUPPORTED_FIELDS = [
     "DATE_OF_BIRTH",
     "SSN",
     "GPA",
+    "MAJOR",
     "AGE",
     "COMPANY_NAME"
 ]
 
 # API Settings
+WARMUP_ON_STARTUP = True  # run one synthetic form through the pipeline before reporting ready
 API_HOST = "0.0.0.0"
 API_PORT = 8000
 UPLOAD_DIR = "./uploads"
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB per image; single-form uploads are cut off past this while streaming in
+MAX_REQUEST_SIZE = 200 * 1024 * 1024  # whole body of batch and job uploads
+MAX_IMAGE_PIXELS = 60_000_000  # hard ceiling: larger images are rejected (413) without being decoded
+DECODE_PIXEL_BUDGET = 12_000_000  # larger images are decoded at 1/2, 1/4 or 1/8 resolution
+
+# Server Settings (python main.py)
+API_WORKERS = None  # server processes; None = available cores // EXTRACT_MAX_WORKERS, 1 = no forking
+# With several workers, /metrics, /cache/stats and the memory cache tier are per process
+API_PRELOAD_MODELS = True  # load models once before forking so workers share them copy-on-write
+API_BACKLOG = 2048  # pending connections on the shared listening socket
+TESSERACT_THREADS = 1  # OpenMP threads per Tesseract call (OMP_THREAD_LIMIT) in every worker
+OPENCV_THREADS = 1  # cv2.setNumThreads in the launcher and every worker; 0 disables OpenCV's own pool
+
+# Logging & Metrics Settings
+LOG_LEVEL = "INFO"  # "DEBUG" adds per-request lines, OCR text and NER decisions
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+OCR_TEXT_LOG_SAMPLE_RATE = 0.1  # share of pages whose full OCR text is logged at DEBUG level
+SERVER_TIMING_HEADER = True  # return per-stage timings of each extraction in a Server-Timing header
+
+# Batch Settings
+BATCH_MAX_WORKERS = None  # None = one worker process per CPU core, shared out between forked API workers
+BATCH_CHUNK_SIZE = 8  # images handed to a worker at once so NER can run over them as one batch
+NER_BATCH_SIZE = 32  # texts per nlp.pipe batch
+NER_N_PROCESS = 1  # processes nlp.pipe may use inside one worker
+BATCH_MAX_FILES = 500
+BATCH_MAX_TOTAL_SIZE = 500 * 1024 * 1024  # summed size of a batch's images once zips are unpacked
+BATCH_BUSY_WAIT = 0.2  # seconds a batch chunk waits before trying a full executor again
+BATCH_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp", ".pdf")
+
+# Executor Settings (single-form endpoint)
+EXTRACT_EXECUTOR = "thread"  # "thread" shares the API's extractor, "process" gives each worker its own
+EXTRACT_MAX_WORKERS = 2
+EXTRACT_MAX_PENDING = 8  # jobs allowed to wait for a worker before new requests are rejected
+EXTRACT_TIMEOUT = 60  # seconds
+EXTRACT_RETRY_AFTER = 5  # seconds suggested to rejected clients
+
+# Job Queue Settings (/jobs endpoints)
+JOB_DB_PATH = "./jobs/jobs.sqlite3"  # SQLite queue shared by the API and standalone workers
+JOB_WORKERS = 1  # worker threads in the API process; more can run as `python -m src.job_worker`
+JOB_CHUNK_SIZE = 8  # items a worker claims at once so NER can run over them as one batch
+JOB_POLL_INTERVAL = 0.5  # seconds between queue checks when idle, and between long-poll checks
+JOB_MAX_WAIT = 60  # longest long-poll a client may ask for, in seconds
+JOB_LEASE_SECONDS = 300  # a claimed item goes back on the queue if not finished within this time
+JOB_MAX_ATTEMPTS = 3  # claims before an item that keeps timing out is marked failed
+JOB_PRIORITY_INTERACTIVE = 10  # single-file jobs
+JOB_PRIORITY_BULK = 0  # multi-file jobs
+JOB_CALLBACK_URL = None  # default callback for finished jobs, e.g. "http://127.0.0.1:9000/autoform-done"
+JOB_CALLBACK_ALLOWED_HOSTS = ["127.0.0.1", "localhost", "::1"]  # callbacks only ever go to these hosts
+JOB_CALLBACK_TIMEOUT = 10  # seconds
+JOB_CALLBACK_RETRIES = 3  # delivery attempts before a callback is given up
+JOB_CALLBACK_BACKOFF = 5  # seconds before the first retry, doubling after each failed attempt
+JOB_RETENTION_SECONDS = 7 * 24 * 3600  # finished jobs and their results are deleted after this long
+JOB_PRUNE_INTERVAL = 3600  # seconds between retention sweeps of each job worker
+
+# Result Cache Settings
+# Bump PIPELINE_VERSION whenever extraction code changes, so stale results are not served
+PIPELINE_VERSION = 7
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_ENTRIES = 2048
+RESULT_CACHE_DIR = None  # e.g. "./cache/results" to keep results across restarts
+RESULT_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+# Settings that change extraction output and therefore belong in the cache key
+RESULT_CACHE_FINGERPRINT_KEYS = [
+    "PIPELINE_VERSION",
+    "SUPPORTED_FIELDS",
+    "PREPROCESS_THUMBNAIL_SIZE",
+    "DECODE_PIXEL_BUDGET",
+    "PREPROCESS_SCALE_MODE",
+    "PREPROCESS_SCALE",
+    "TEXT_HEIGHT_TARGET",
+    "PREPROCESS_MIN_SCALE",
+    "PREPROCESS_MAX_SCALE",
+    "PREPROCESS_MAX_PAGE_PIXELS",
+    "SKEW_METHOD",
+    "SKEW_ANGLE_LIMIT",
+    "SKEW_MIN_ANGLE",
+    "OCR_LANGUAGE",
+    "OCR_PSM_MODE",
+    "OCR_ENGINE_MODE",
+    "OCR_PAGE_MODE",
+    "ENABLE_LAYOUT_ANALYSIS",
+    "LAYOUT_ANCHORS",
+    "LAYOUT_MIN_ANCHORS",
+    "CUSTOM_MODEL_DIR",
+    "VALIDATOR_MODEL",
+    "NAME_VALIDATOR",
+    "NAME_LEXICON_PATH",
+    "MAJOR_CATALOG_PATH",
+    "MAJOR_CATALOG_STRICT",
+    "CORRECTION_MAX_DISTANCE",
+    "PDF_RENDER_DPI",
+    "DOCUMENT_MAX_PAGES",
+    "REQUIRED_FIELDS",
+    "CASCADE_TIERS",
+    "CASCADE_MIN_CONFIDENCE",
+]
+# Settings naming data files whose contents belong in the cache key, so editing a file invalidates old results
+RESULT_CACHE_FINGERPRINT_FILES = [
+    "NAME_LEXICON_PATH",
+    "MAJOR_CATALOG_PATH",
+]
@@ -0,0 +1,123 @@
+import io
+import logging
+import math
+import os
+import warnings
+import cv2
+import numpy as np
+from PIL import Image, ImageSequence
+from src import config
+from src.preprocessing import ImageTooLarge, decode_reduction
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Optional: only needed for PDF uploads
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+PDF_MAGIC = b"%PDF"
+TIFF_MAGICS = (b"II*\x00", b"MM\x00*")
+
+
+def document_kind(source):
+    """
+    Returns "pdf" or "tiff" for multi-page capable documents, None for
+    anything the preprocessor decodes directly (single images, arrays).
+    """
+    if isinstance(source, np.ndarray):
+        return None
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            header = f.read(4)
+    else:
+        header = bytes(source[:4])
+    if header == PDF_MAGIC:
+        return "pdf"
+    if header in TIFF_MAGICS:
+        return "tiff"
+    return None
+
+
+def iter_pages(source, max_pages=None):
+    """
+    Yields the pages of a PDF or TIFF as BGR arrays, rasterising one page
+    per step so a long document never sits in memory decoded all at once.
+    Pages are held to the same limits as single images: over
+    MAX_IMAGE_PIXELS raises ImageTooLarge before the page is decoded, over
+    DECODE_PIXEL_BUDGET it is rasterised at reduced resolution. Sources that
+    are not documents are yielded unchanged as the only page.
+    """
+    max_pages = max_pages or config.DOCUMENT_MAX_PAGES
+    kind = document_kind(source)
+    if kind is None:
+        yield source
+        return
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    pages = _pdf_pages(source) if kind == "pdf" else _tiff_pages(source)
+    try:
+        for number, page in enumerate(pages):
+            if number >= max_pages:
+                break
+            yield page
+    finally:
+        pages.close()
+
+
+def _tiff_pages(source):
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            tiff = Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    with tiff:
+        # Pillow decodes a frame only when it is seeked to, and reads its size from the header first
+        for frame in ImageSequence.Iterator(tiff):
+            factor = decode_reduction(frame.size)
+            if factor > 1:
+                # TIFF has no reduced decode; shrinking before the RGB conversion keeps one full-size copy
+                logger.debug(f"Decoding {frame.size[0]}x{frame.size[1]} TIFF page at 1/{factor} resolution")
+                frame = frame.reduce(factor)
+            yield cv2.cvtColor(np.asarray(frame.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+def _pdf_pages(source):
+    if pdfium is None:
+        raise ValueError("PDF uploads need the optional 'pypdfium2' package.")
+    pdf = pdfium.PdfDocument(source)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                bitmap = page.render(scale=_render_scale(page.get_size()))
+                image = bitmap.to_numpy()  # pdfium renders in BGR(A) order
+                if image.ndim == 2:
+                    image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+                elif image.shape[2] == 4:
+                    image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+                else:
+                    image = image.copy()  # detach from the bitmap buffer before it's closed
+                bitmap.close()
+            finally:
+                page.close()
+            yield image
+    finally:
+        pdf.close()
+
+
+def _render_scale(size):
+    """
+    Render scale for a PDF page of the given size in points: PDF_RENDER_DPI,
+    lowered to fit DECODE_PIXEL_BUDGET. Pages over MAX_IMAGE_PIXELS at
+    PDF_RENDER_DPI raise ImageTooLarge.
+    """
+    scale = config.PDF_RENDER_DPI / 72.0
+    width, height = (int(math.ceil(side * scale)) for side in size)
+    if decode_reduction((width, height)) > 1:
+        scale *= math.sqrt(config.DECODE_PIXEL_BUDGET / float(width * height))
+        logger.debug(f"Rendering {width}x{height} PDF page at {scale * 72.0:.0f} DPI")
+    return scale
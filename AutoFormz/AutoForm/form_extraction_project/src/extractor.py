@@ -1,38 +1,337 @@
+import contextvars
+import logging
+import random
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from src.document_loader import document_kind, iter_pages
 from src.preprocessing import ImagePreprocessor
 from src.ocr_handler import OCRExtractor
 from src.ner_model import FormNERModel
+from src.layout_analyzer import LayoutAnalyzer, uses_layout
+from src.fields import FieldMatcher
+from src.ocr_correction import OCRCorrector
+from src.metrics import TIERS, collect_timings, count, timed
+from src import config
+
+logger = logging.getLogger(__name__)
 
 class FormExtractor:
+    # Fields already folded into the four keys every client expects
+    NAME_AND_CORE_FIELDS = {"FULL_NAME", "FIRST_NAME", "LAST_NAME", "MAJOR", "GPA"}
+    RESULT_KEYS = ["STUDENT_FIRST_NAME", "STUDENT_LAST_NAME", "MAJOR", "GPA"]
+    NAME_KEYS = ("STUDENT_FIRST_NAME", "STUDENT_LAST_NAME")
+
     def __init__(self):
-        self.preprocessor = ImagePreprocessor()
-        self.ocr_extractor = OCRExtractor()
-        self.ner_model = FormNERModel() 
+        # Seconds spent building each component, reported by the API's /ready
+        self.load_times = {}
+        self.preprocessor = self._load("preprocessor", ImagePreprocessor)
+        self.ocr_extractor = self._load("ocr", OCRExtractor)
+        self.ner_model = self._load("ner", FormNERModel)
+        self.layout_analyzer = self._load("layout", LayoutAnalyzer)
+        self.field_matcher = self._load("fields", FieldMatcher)
+        self.corrector = self._load("corrections", OCRCorrector)
+        self.use_layout = uses_layout(self.ocr_extractor.backend.name)
+        self._page_pool = None
+        self._page_pool_lock = threading.Lock()
+        # Cheap tiers tried in order before the full pipeline
+        tiers = {"fast": self._fast_tier}
+        for name in config.CASCADE_TIERS:
+            if name not in tiers:
+                raise ValueError(f"Unknown extraction tier '{name}'. Choose from {sorted(tiers)}.")
+        self.cheap_tiers = [(name, tiers[name]) for name in config.CASCADE_TIERS]
+
+    def _load(self, name, factory):
+        start = time.perf_counter()
+        component = factory()
+        self.load_times[name] = round(time.perf_counter() - start, 3)
+        logger.info(f"Startup: {name} ready in {self.load_times[name]:.2f}s")
+        return component
+
+    def warm_up(self):
+        """
+        Pushes one small synthetic form through the whole pipeline so lazy
+        initialisation (OCR engine, spaCy pipes) happens before real traffic.
+        """
+        start = time.perf_counter()
+        # The warm-up form's names are all in the lexicon, so a preloaded validator fallback is loaded explicitly
+        self.ner_model.preload_validator()
+        page = np.full((160, 640, 3), 255, dtype=np.uint8)
+        for i, line in enumerate(["Name: John Smith", "Major: Biology", "GPA: 3.5"]):
+            cv2.putText(page, line, (20, 40 + i * 45), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+        # Collected and dropped so the warm-up doesn't show up in the stage histograms
+        collect_timings(self.extract, page)
+        self.load_times["warm_up"] = round(time.perf_counter() - start, 3)
+        logger.info(f"Startup: warm-up inference took {self.load_times['warm_up']:.2f}s")
+
+    def extract(self, image) -> dict:
+        """
+        Runs the pipeline on a path, encoded image bytes or a decoded array.
+        The cheap tiers in config.CASCADE_TIERS get the first try; the full
+        pipeline only runs when none of them gives a validated result.
+        Multi-page PDFs and TIFFs go through extract_document.
+        """
+        for event, payload in self.iter_extract(image, provisional=False):
+            if event == "result":
+                return payload
+
+    def iter_extract(self, image, provisional=True):
+        """
+        The pipeline behind extract(), as a generator of (event, payload)
+        pairs for callers that show progress:
+
+            ("stage", {"stage": name})                       a stage finished
+            ("field", {"field": f, "value": v, "final": b})  a field value is known
+            ("result", result)                               always last, same as extract()
+
+        Values from the regex pass over the OCR text come out as provisional
+        (final False) before NER runs; the final values follow with the result.
+        provisional=False skips that extra pass, for callers that only want
+        the result.
+        """
+        if hasattr(image, "read"):
+            image = image.read()
+        if document_kind(image):
+            result = self.extract_document(image)
+            yield "stage", {"stage": "document"}
+            yield from self._field_events(result, final=True)
+            yield "result", result
+            return
+
+        tier = None
+        with timed("extract"):
+            img = self.preprocessor.load_image(image)
+            yield "stage", {"stage": "decode"}
+            if img is None:
+                result = self._build_result("", {})
+            else:
+                result, tier = self._try_cheap_tiers(img)
+                if result is None:
+                    yield "stage", {"stage": "escalate"}
+                    with timed("tier_full"):
+                        extracted_text = self._read_text(img)
+                        yield "stage", {"stage": "ocr"}
+                        if provisional:
+                            # Regex and GPA validation need no NER; show their values straight away
+                            yield from self._field_events(self._build_result(extracted_text, {}), final=False)
+                        ai_data = self.ner_model.extract_entities(extracted_text)
+                        yield "stage", {"stage": "ner"}
+                        result, tier = self._build_result(extracted_text, ai_data), "full"
+                yield "stage", {"stage": f"tier_{tier}"}
+        if tier:
+            count(TIERS, tier)
+        yield from self._field_events(result, final=True)
+        yield "result", result
+
+    def _field_events(self, result, final):
+        for field, value in result.items():
+            if value:
+                yield "field", {"field": field, "value": value, "final": final}
+
+    def extract_batch(self, images) -> list:
+        """
+        Like extract() for every image, but the NER models run once over the
+        OCR text of all images that reach the full pipeline instead of once
+        per image. An image that fails (too large, unreadable, a document
+        format that isn't installed) gets its exception in its slot instead of
+        a result; the other images are unaffected.
+        """
+        images = [image.read() if hasattr(image, "read") else image for image in images]
+        results = [None] * len(images)
+        escalated = []
+        for i, image in enumerate(images):
+            try:
+                if document_kind(image):
+                    results[i] = self.extract_document(image)
+                    continue
+                img = self.preprocessor.load_image(image)
+                if img is None:
+                    results[i] = self._build_result("", {})
+                    continue
+                results[i], tier = self._try_cheap_tiers(img)
+            except Exception as e:
+                logger.warning(f"Batch: image {i} failed: {e}")
+                results[i] = e
+                continue
+            if results[i] is None:
+                escalated.append((i, img))
+            else:
+                count(TIERS, tier)
+
+        read = []
+        for i, img in escalated:
+            try:
+                read.append((i, self._read_text(img)))
+            except Exception as e:
+                logger.warning(f"Batch: image {i} failed: {e}")
+                results[i] = e
+        ai_batch = self.ner_model.extract_entities_batch([text for _, text in read])
+        for (i, text), ai_data in zip(read, ai_batch):
+            results[i] = self._build_result(text, ai_data)
+            count(TIERS, "full")
+        return results
+
+    def _try_cheap_tiers(self, img):
+        """
+        Returns (result, tier name) from the first cheap tier that accepts
+        the image, or (None, None) when it needs the full pipeline.
+        """
+        for name, tier in self.cheap_tiers:
+            with timed(f"tier_{name}"):
+                result = tier(img)
+            if result is not None:
+                return result, name
+        return None, None
+
+    def _fast_tier(self, img):
+        """
+        Grayscale + Otsu, OCR and regex fields only: no line removal, skew
+        search or NER. The result counts when the mean OCR word confidence
+        reaches CASCADE_MIN_CONFIDENCE and every REQUIRED_FIELDS value passes
+        validation; otherwise returns None.
+        """
+        # Ruled forms go straight to the full pipeline, which removes the lines
+        if self.preprocessor.has_colored_lines(img):
+            return None
+        binary = self.preprocessor.preprocess_fast(img)
+        if binary is None:
+            return None
+        with timed("ocr"):
+            if self.use_layout:
+                lines = self.layout_analyzer.extract_field_lines(binary, self.ocr_extractor)
+            else:
+                lines = [self.ocr_extractor.extract_page_text_with_confidence(binary)]
+        # Unlabelled forms need NER, which only the full pipeline runs
+        if not lines:
+            return None
 
-    def extract(self, image_path: str) -> dict:
-        preprocessed_image = self.preprocessor.preprocess(image_path)
-        extracted_text = self.ocr_extractor.extract_text(preprocessed_image)
-        print(f"OCR RESULT:\n{extracted_text}\n{'-'*30}")
+        confidence = sum(line_confidence for _, line_confidence in lines) / len(lines)
+        if confidence < config.CASCADE_MIN_CONFIDENCE:
+            return None
+        result = self._build_result("\n".join(text for text, _ in lines), {})
+        if not all(result.get(field) for field in config.REQUIRED_FIELDS):
+            return None
+        return result
 
-        ai_data = self.ner_model.extract_entities(extracted_text)
+    def extract_document(self, document) -> dict:
+        """
+        Runs the pipeline over the pages of a PDF or TIFF and merges the
+        per-page results, earlier pages winning. Pages are rasterised one at a
+        time, at most DOCUMENT_PAGE_LOOKAHEAD ahead of the page being merged,
+        and preprocessed/OCR'd in parallel by the full pipeline. Reading stops
+        as soon as every REQUIRED_FIELDS value has been found and passed
+        validation.
+        """
+        pool = self._get_page_pool()
+        pages = iter_pages(document)
+        pending = deque()
+        exhausted = False
+        merged = dict.fromkeys(self.RESULT_KEYS, "")
+        merged_pages = 0
+
+        with timed("extract_document"):
+            try:
+                while True:
+                    while not exhausted and len(pending) < config.DOCUMENT_PAGE_LOOKAHEAD:
+                        with timed("rasterize"):
+                            page = next(pages, None)
+                        if page is None:
+                            exhausted = True
+                        else:
+                            # A context copy per page keeps its stage timings with this request
+                            pending.append(pool.submit(contextvars.copy_context().run, self._read_text, page))
+                    if not pending:
+                        break
+
+                    text = pending.popleft().result()
+                    self._merge_page(merged, self.extract_from_text(text))
+                    merged_pages += 1
+                    if all(merged.get(field) for field in config.REQUIRED_FIELDS):
+                        break
+            finally:
+                for future in pending:
+                    future.cancel()
+                pages.close()
+
+        logger.debug(f"Document: merged {merged_pages} page(s), {len(pending)} read ahead and dropped")
+        count(TIERS, "full")
+        return merged
+
+    def _merge_page(self, merged, page_result):
+        # First and last name are taken together so they come from the same page
+        def names_found(result):
+            return sum(1 for key in self.NAME_KEYS if result.get(key))
+        if names_found(page_result) > names_found(merged):
+            for key in self.NAME_KEYS:
+                merged[key] = page_result.get(key, "")
+
+        for field, value in page_result.items():
+            if field not in self.NAME_KEYS and not merged.get(field):
+                merged[field] = value
+
+    def _get_page_pool(self):
+        with self._page_pool_lock:
+            if self._page_pool is None:
+                self._page_pool = ThreadPoolExecutor(max_workers=config.DOCUMENT_PAGE_WORKERS, thread_name_prefix="page")
+            return self._page_pool
+
+    def shutdown_pools(self):
+        """
+        Stops the page, layout and band OCR threads. They are started again on
+        next use, so this is safe to call before forking.
+        """
+        with self._page_pool_lock:
+            pool, self._page_pool = self._page_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        self.layout_analyzer.shutdown()
+        self.ocr_extractor.shutdown()
+
+    def _read_text(self, image) -> str:
+        preprocessed_image = self.preprocessor.preprocess(image)
+        with timed("ocr"):
+            extracted_text = self._ocr(preprocessed_image)
+        # Full OCR text is only worth its I/O when debugging, and then only for a sample
+        if logger.isEnabledFor(logging.DEBUG) and random.random() < config.OCR_TEXT_LOG_SAMPLE_RATE:
+            logger.debug(f"OCR RESULT:\n{extracted_text}\n{'-'*30}")
+        return extracted_text
+
+    def extract_from_text(self, text, ai_data=None) -> dict:
+        """
+        Field extraction on OCR text that was already read: NER (unless its
+        output is passed as ai_data; {} for regex only), the regex fallback
+        and validation. Same result shape as extract().
+        """
+        if ai_data is None:
+            ai_data = self.ner_model.extract_entities(text)
+        return self._build_result(text, ai_data)
+
+    def _build_result(self, extracted_text, ai_data) -> dict:
         regex_data = self._extract_regex_fallback(extracted_text)
 
         # --- NAME ---
         raw_name = ai_data.get("STUDENT_NAME", "")
         if not raw_name or len(raw_name) < 3: 
-            raw_name = regex_data.get("student_name", "")
+            raw_name = regex_data.get("FULL_NAME", "")
+        if not raw_name and regex_data.get("FIRST_NAME"):
+            raw_name = f"{regex_data['FIRST_NAME']} {regex_data.get('LAST_NAME', '')}".strip()
         final_name = self._clean_name(raw_name)
 
         # --- MAJOR ---
         raw_major = ai_data.get("MAJOR", "")
         if self._is_garbage_major(raw_major): 
-            raw_major = regex_data.get("major", "")
+            raw_major = regex_data.get("MAJOR", "")
         if self._is_garbage_major(raw_major):
             raw_major = ""
+        raw_major = self.corrector.correct_major(raw_major)
 
         # --- GPA ---
         # 1. Try Regex first (most reliable for x.xx)
-        raw_gpa = regex_data.get("gpa", "")
+        raw_gpa = regex_data.get("GPA", "")
         
         # 2. If Regex failed, try AI, but be careful
         if not raw_gpa:
@@ -52,30 +351,40 @@ class FormExtractor:
             if len(parts) >= 1: first_name = parts[0]
             if len(parts) >= 2: last_name = " ".join(parts[1:])
         
-        return {
+        result = {
             "STUDENT_FIRST_NAME": first_name,
             "STUDENT_LAST_NAME": last_name,
             "MAJOR": raw_major,
             "GPA": final_gpa
         }
 
+        # Any other configured field that was found (EMAIL, PHONE, ...)
+        for field, value in regex_data.items():
+            if field not in self.NAME_AND_CORE_FIELDS:
+                result[field] = value
+        return result
+
+    def _ocr(self, binary):
+        # Labelled forms: OCR only the lines next to field labels
+        if self.use_layout:
+            text = self.layout_analyzer.extract_field_text(binary, self.ocr_extractor)
+            if text is not None:
+                return text
+        # No labels found (or layout analysis off): OCR the whole page
+        return self.ocr_extractor.extract_page_text(binary)
+
     def _clean_name(self, name):
         if not name: return ""
         name = re.sub(r'^(Name|Student|Candidate)\W*', '', name, flags=re.IGNORECASE).strip()
-        parts = name.split()
+        # Drop OCR debris such as a stray "|" from a box edge
+        parts = [part for part in name.split() if re.search(r'[A-Za-z]', part)]
         if not parts: return ""
-        first = parts[0].lower()
-        bad_johns = ["joha", "jyonn", "jonn", "jon", "jhn", "joan", "johnn", "jiohn"]
-        if first in bad_johns: parts[0] = "John"
+        # OCR misreads of the first name ("Jonn", "J0hn") are repaired; real names are kept as written
+        parts[0] = self.corrector.correct_given_name(parts[0])
         return " ".join(parts)
 
     def _is_garbage_major(self, text):
-        if not text: return True
-        text = text.lower().strip()
-        garbage = ["skewed", "image", "test", "case", "simple", "mode", "label", "clean", "baseline", "siraple", "no labels", "inverted", "colors", "& simple"]
-        if any(bad in text for bad in garbage): return True
-        if len(text) < 3: return True
-        return False
+        return self.corrector.is_garbage_major(text)
 
     def _validate_gpa(self, gpa):
         if not gpa: return ""
@@ -102,21 +411,6 @@ class FormExtractor:
         return ""
 
     def _extract_regex_fallback(self, text: str) -> dict:
-        data = {}
-        # Line-based Name
-        match = re.search(r'^\s*(?:Name|Student|Candidate)\s*[:\.\-]?\s*(.*)$', text, re.MULTILINE | re.IGNORECASE)
-        if match: data['student_name'] = match.group(1).strip()
-        
-        # Line-based Major
-        match = re.search(r'^\s*(?:Major|Program|Degree)\s*[:\.\-]?\s*(.*)$', text, re.MULTILINE | re.IGNORECASE)
-        if match: data['major'] = match.group(1).strip()
-
-        # GPA
-        match = re.search(r'(?:GPA|Grade|Average).*?(\d+(?:\.\d+)?)', text, re.IGNORECASE)
-        if match: data['gpa'] = match.group(1)
-        else:
-            # Strict X.XX fallback
-            match = re.search(r'\b([0-4]\.\d{1,2})\b', text)
-            if match: data['gpa'] = match.group(1)
-
-        return data
\ No newline at end of file
+        # One pass over the text for every field in config.SUPPORTED_FIELDS
+        with timed("regex"):
+            return self.field_matcher.extract(text)
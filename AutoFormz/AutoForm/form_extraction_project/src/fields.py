@@ -0,0 +1,142 @@
+import re
+from src import config
+
+# Value patterns applied right after a label
+REST_OF_LINE = r'\s*[:\.\-]?\s*([^\n]*)'
+# For labels that are also ordinary words ("City University", "State of ..."): a ":" or "-" must follow
+REST_OF_LINE_AFTER_SEPARATOR = r'[^\S\n]*[:\-][^\S\n]*([^\n]*)'
+NUMBER_ON_LINE = r'[^\n]*?(\d+(?:\.\d+)?)'
+DATE = r'\d{1,2}[/\.\-]\d{1,2}[/\.\-]\d{2,4}|\d{4}-\d{2}-\d{2}|[A-Za-z]{3,9}\.? \d{1,2},? \d{4}'
+PHONE = r'\+?\(?\d{3}\)?[\s\.\-]?\d{3}[\s\.\-]\d{4}'
+
+# Every field the regex engine knows about.
+#   labels      - words that introduce the value (case-insensitive)
+#   value       - regex matched right after a label, group 1 is the value
+#   line_start  - the label only counts as the first thing on its line
+#   pattern     - optional regex that finds the value anywhere without a label;
+#                 only used when no labelled value was found. Never set for
+#                 identifiers such as SSN or phone numbers: those are only
+#                 returned next to their label
+FIELD_REGISTRY = {
+    "FULL_NAME": {
+        "labels": ["Full Name", "Student Name", "Name", "Student", "Candidate"],
+        "value": REST_OF_LINE, "line_start": True,
+    },
+    "FIRST_NAME": {
+        "labels": ["First Name", "Given Name", "Forename"],
+        "value": REST_OF_LINE, "line_start": True,
+    },
+    "LAST_NAME": {
+        "labels": ["Last Name", "Surname", "Family Name"],
+        "value": REST_OF_LINE, "line_start": True,
+    },
+    "MAJOR": {
+        "labels": ["Major", "Program", "Degree"],
+        "value": REST_OF_LINE, "line_start": True,
+    },
+    "GPA": {
+        "labels": ["GPA", "Grade Point Average", "Grade", "Average"],
+        "value": NUMBER_ON_LINE, "line_start": False,
+        "pattern": r'\b([0-4]\.\d{1,2})\b',
+    },
+    "EMAIL": {
+        "labels": ["Email", "E-mail"],
+        "value": r'[^\n]*?([\w\.\+\-]+@[\w\-]+(?:\.[\w\-]+)+)', "line_start": False,
+        "pattern": r'\b([\w\.\+\-]+@[\w\-]+(?:\.[\w\-]+)+)',
+    },
+    "PHONE": {
+        "labels": ["Phone", "Telephone", "Tel", "Mobile", "Cell"],
+        "value": rf'[^\n]*?({PHONE})', "line_start": False,
+    },
+    "ADDRESS": {
+        "labels": ["Address", "Street"],
+        "value": REST_OF_LINE_AFTER_SEPARATOR, "line_start": True,
+    },
+    "CITY": {
+        "labels": ["City", "Town"],
+        "value": REST_OF_LINE_AFTER_SEPARATOR, "line_start": True,
+    },
+    "STATE": {
+        "labels": ["State", "Province"],
+        "value": REST_OF_LINE_AFTER_SEPARATOR, "line_start": True,
+    },
+    "ZIP_CODE": {
+        "labels": ["Zip Code", "Zip", "Postal Code", "Postcode"],
+        "value": r'[^\n]*?(\d{5}(?:-\d{4})?)', "line_start": False,
+    },
+    "DATE_OF_BIRTH": {
+        "labels": ["Date of Birth", "Birth Date", "Birthdate", "DOB"],
+        "value": rf'[^\n]*?({DATE})', "line_start": False,
+    },
+    "SSN": {
+        "labels": ["SSN", "Social Security Number", "Social Security"],
+        "value": r'[^\n]*?(\d{3}-\d{2}-\d{4})', "line_start": False,
+    },
+    "AGE": {
+        "labels": ["Age"],
+        "value": r'[^\S\n]*[:\.\-]?[^\S\n]*(\d{1,3})\b', "line_start": False,
+    },
+    "COMPANY_NAME": {
+        "labels": ["Company Name", "Company", "Employer", "Organization", "Organisation"],
+        "value": REST_OF_LINE_AFTER_SEPARATOR, "line_start": True,
+    },
+}
+
+
+class FieldMatcher:
+    """
+    Extracts every configured field in one pass over the text.
+
+    All labels and label-free patterns are compiled into a single regex.
+    Each label hit then runs its field's short value regex at the hit
+    position, so the cost is one scan of the text no matter how many fields
+    are registered.
+    """
+
+    def __init__(self, fields=None, registry=None):
+        registry = registry or FIELD_REGISTRY
+        fields = fields or config.SUPPORTED_FIELDS
+        self.fields = [name for name in fields if name in registry]
+
+        self._label_fields = {}
+        self._values = {}
+        self._line_start = {}
+        pattern_groups = []
+        for name in self.fields:
+            spec = registry[name]
+            for label in spec["labels"]:
+                self._label_fields[self._normalize(label)] = name
+            self._values[name] = re.compile(spec["value"], re.IGNORECASE)
+            self._line_start[name] = spec.get("line_start", False)
+            if spec.get("pattern"):
+                pattern_groups.append(f'(?P<{name}>{spec["pattern"]})')
+
+        # Longest labels first so "Student Name" wins over "Student"
+        labels = sorted(self._label_fields, key=len, reverse=True)
+        label_regex = "|".join(r"[^\S\n]+".join(map(re.escape, label.split())) for label in labels)
+        # A label may run straight into a number ("GPA3.5"), just not into another letter
+        alternatives = [rf'(?P<label>\b(?:{label_regex})(?![^\W\d_]))'] + pattern_groups
+        self._scanner = re.compile("|".join(alternatives), re.IGNORECASE)
+
+    def extract(self, text: str) -> dict:
+        labelled = {}
+        unlabelled = {}
+
+        for match in self._scanner.finditer(text):
+            if match.lastgroup == "label":
+                name = self._label_fields[self._normalize(match.group("label"))]
+                if name in labelled:
+                    continue
+                if self._line_start[name] and text[text.rfind("\n", 0, match.start()) + 1:match.start()].strip():
+                    continue
+                value = self._values[name].match(text, match.end())
+                if value and value.group(1).strip():
+                    labelled[name] = value.group(1).strip()
+            elif match.lastgroup not in unlabelled:
+                # The pattern's own capture group follows its named group
+                unlabelled[match.lastgroup] = match.group(match.re.groupindex[match.lastgroup] + 1)
+
+        return {**unlabelled, **labelled}
+
+    def _normalize(self, label):
+        return " ".join(label.lower().split())
@@ -0,0 +1,307 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from src import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    priority INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    callback_url TEXT,
+    callback_sent INTEGER NOT NULL DEFAULT 0,
+    callback_attempts INTEGER NOT NULL DEFAULT 0,
+    callback_next REAL,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    position INTEGER NOT NULL,
+    filename TEXT,
+    data BLOB,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    claimed REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS items_queue ON items (status, priority DESC, id);
+CREATE INDEX IF NOT EXISTS items_job ON items (job_id, position);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished);
+"""
+# Columns added since the first schema; databases made before them get them on open
+ADDED_COLUMNS = [
+    ("jobs", "callback_attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("jobs", "callback_next", "REAL"),
+]
+# jobs.callback_sent
+CALLBACK_PENDING, CALLBACK_SENT, CALLBACK_GAVE_UP = 0, 1, -1
+
+
+class JobStore:
+    """
+    SQLite-backed job queue shared by the API and any number of worker
+    processes on the same machine.
+
+    A job is one submission; each of its files is an item that workers claim
+    on their own, highest priority first, so a large bulk job can be spread
+    over several workers and an interactive job jumps ahead of it. Claimed
+    items hold a lease: if a worker dies (or the server restarts) the item
+    goes back on the queue once the lease runs out. Finished jobs are
+    deleted by prune() once they are older than JOB_RETENTION_SECONDS.
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None):
+        self.path = path or config.JOB_DB_PATH
+        self.lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or config.JOB_MAX_ATTEMPTS
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        db = self._db()
+        for table, column, definition in ADDED_COLUMNS:
+            exists = db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+            if exists and column not in [row[1] for row in db.execute(f"PRAGMA table_info({table})")]:
+                db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        db.executescript(SCHEMA)
+
+    def _db(self):
+        # sqlite3 connections can't be shared between threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def close(self):
+        """
+        Closes this thread's connection; the next call opens a new one.
+        """
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    def _connect(self, mode="IMMEDIATE"):
+        return _Transaction(self._db(), mode)
+
+    def submit(self, names, images, priority=0, callback_url=None) -> str:
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, priority, total, callback_url, created) VALUES (?, ?, ?, ?, ?)",
+                (job_id, priority, len(images), callback_url, time.time()),
+            )
+            db.executemany(
+                "INSERT INTO items (job_id, position, filename, data, priority) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, i, name, sqlite3.Binary(data), priority) for i, (name, data) in enumerate(zip(names, images))],
+            )
+        return job_id
+
+    def claim(self, worker, limit=1):
+        """
+        Marks up to `limit` items of the highest-priority waiting job as
+        running for `worker` and returns them as (item_id, job_id, filename, data).
+        Items whose lease expired are claimed again; after max_attempts they fail.
+        """
+        now = time.time()
+        expired = now - self.lease_seconds
+        with self._connect() as db:
+            abandoned = db.execute(
+                "SELECT DISTINCT job_id FROM items WHERE status = 'running' AND claimed < ? AND attempts >= ?",
+                (expired, self.max_attempts),
+            ).fetchall()
+            if abandoned:
+                db.execute(
+                    "UPDATE items SET status = 'failed', error = 'Worker stopped responding', data = NULL "
+                    "WHERE status = 'running' AND claimed < ? AND attempts >= ?",
+                    (expired, self.max_attempts),
+                )
+                for (job_id,) in abandoned:
+                    self._finish_if_complete(db, job_id)
+            first = db.execute(
+                "SELECT job_id FROM items "
+                "WHERE status = 'queued' OR (status = 'running' AND claimed < ?) "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (expired,),
+            ).fetchone()
+            if first is None:
+                return []
+            # Items of one job go together so the worker can batch its NER calls
+            rows = db.execute(
+                "SELECT id, job_id, filename, data FROM items "
+                "WHERE job_id = ? AND (status = 'queued' OR (status = 'running' AND claimed < ?)) "
+                "ORDER BY id LIMIT ?",
+                (first[0], expired, limit),
+            ).fetchall()
+            db.executemany(
+                "UPDATE items SET status = 'running', worker = ?, claimed = ?, attempts = attempts + 1 WHERE id = ?",
+                [(worker, now, row[0]) for row in rows],
+            )
+        return rows
+
+    def complete(self, item_id, result=None, error=None) -> bool:
+        """
+        Stores an item's result (or error) and drops its image. Returns True
+        when this was the job's last open item.
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT job_id FROM items WHERE id = ?", (item_id,)).fetchone()
+            if row is None:
+                return False
+            db.execute(
+                "UPDATE items SET status = ?, result = ?, error = ?, data = NULL WHERE id = ?",
+                ("failed" if error else "done", None if error else json.dumps(result), error, item_id),
+            )
+            return self._finish_if_complete(db, row[0])
+
+    def _finish_if_complete(self, db, job_id):
+        still_open = db.execute(
+            "SELECT 1 FROM items WHERE job_id = ? AND status IN ('queued', 'running') LIMIT 1", (job_id,)
+        ).fetchone()
+        if still_open:
+            return False
+        updated = db.execute(
+            "UPDATE jobs SET finished = ? WHERE id = ? AND finished IS NULL", (time.time(), job_id)
+        )
+        return updated.rowcount == 1
+
+    def status(self, job_id):
+        """
+        Returns the job's progress, and its results in submission order once
+        every item is finished. None for unknown jobs.
+        """
+        with self._connect("DEFERRED") as db:
+            job = db.execute(
+                "SELECT priority, total, created, finished FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            counts = dict(db.execute(
+                "SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+            priority, total, created, finished = job
+            body = {
+                "job_id": job_id,
+                "status": _job_status(counts, finished),
+                "priority": priority,
+                "total": total,
+                "completed": counts.get("done", 0),
+                "failed": counts.get("failed", 0),
+                "created": created,
+                "finished": finished,
+            }
+            if finished is not None:
+                body["results"] = [
+                    {"filename": filename, "data": json.loads(result)} if status == "done"
+                    else {"filename": filename, "error": error}
+                    for filename, status, result, error in db.execute(
+                        "SELECT filename, status, result, error FROM items WHERE job_id = ? ORDER BY position",
+                        (job_id,),
+                    )
+                ]
+        return body
+
+    def pending_callbacks(self):
+        """
+        Finished jobs whose callback is due (not delivered yet, not being
+        sent by another worker, past its retry delay), as (job_id, url).
+        """
+        with self._connect("DEFERRED") as db:
+            return db.execute(
+                "SELECT id, callback_url FROM jobs "
+                "WHERE finished IS NOT NULL AND callback_url IS NOT NULL AND callback_sent = ? "
+                "AND (callback_next IS NULL OR callback_next <= ?)",
+                (CALLBACK_PENDING, time.time()),
+            ).fetchall()
+
+    def claim_callback(self, job_id) -> bool:
+        """
+        Takes the job's callback for one delivery attempt. Returns False if
+        another worker got there first. An attempt that never reports back
+        through callback_result is retried once the lease runs out.
+        """
+        now = time.time()
+        with self._connect() as db:
+            updated = db.execute(
+                "UPDATE jobs SET callback_next = ?, callback_attempts = callback_attempts + 1 "
+                "WHERE id = ? AND callback_sent = ? AND (callback_next IS NULL OR callback_next <= ?)",
+                (now + self.lease_seconds, job_id, CALLBACK_PENDING, now),
+            )
+            return updated.rowcount == 1
+
+    def callback_result(self, job_id, delivered):
+        """
+        Records a delivery attempt. A failed one is retried after an
+        exponential delay until JOB_CALLBACK_RETRIES attempts were made.
+        """
+        with self._connect() as db:
+            if delivered:
+                db.execute("UPDATE jobs SET callback_sent = ? WHERE id = ?", (CALLBACK_SENT, job_id))
+                return
+            attempts = db.execute("SELECT callback_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if attempts is None:
+                return
+            if attempts[0] >= config.JOB_CALLBACK_RETRIES:
+                db.execute("UPDATE jobs SET callback_sent = ? WHERE id = ?", (CALLBACK_GAVE_UP, job_id))
+            else:
+                db.execute(
+                    "UPDATE jobs SET callback_next = ? WHERE id = ?",
+                    (time.time() + config.JOB_CALLBACK_BACKOFF * 2 ** (attempts[0] - 1), job_id),
+                )
+
+    def prune(self, max_age=None) -> int:
+        """
+        Deletes jobs that finished more than max_age seconds ago (default
+        JOB_RETENTION_SECONDS), with their items. Returns how many went.
+        """
+        max_age = config.JOB_RETENTION_SECONDS if max_age is None else max_age
+        cutoff = time.time() - max_age
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM items WHERE job_id IN (SELECT id FROM jobs WHERE finished IS NOT NULL AND finished < ?)",
+                (cutoff,),
+            )
+            return db.execute("DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (cutoff,)).rowcount
+
+    def queue_depth(self):
+        with self._connect("DEFERRED") as db:
+            return db.execute("SELECT COUNT(*) FROM items WHERE status = 'queued'").fetchone()[0]
+
+
+def _job_status(counts, finished):
+    if finished is not None:
+        return "done"
+    if counts.get("running") or counts.get("done") or counts.get("failed"):
+        return "running"
+    return "queued"
+
+
+class _Transaction:
+    """
+    BEGIN ... COMMIT around a block. Writes use IMMEDIATE so claims by
+    concurrent workers never hand out the same item twice.
+    """
+
+    def __init__(self, db, mode):
+        self.db = db
+        self.mode = mode
+
+    def __enter__(self):
+        self.db.execute(f"BEGIN {self.mode}")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import urllib.request
+
+from src import config
+from src.job_store import JobStore
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """
+    Pulls queued items from the JobStore, extracts them in batches and
+    stores the results. Runs as threads inside the API (config.JOB_WORKERS)
+    or as extra processes on the same machine:
+
+        python -m src.job_worker
+    """
+
+    def __init__(self, store, extract_batch, name=None, chunk_size=None, poll_interval=None, result_cache=None):
+        self.store = store
+        self.extract_batch = extract_batch
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.chunk_size = chunk_size or config.JOB_CHUNK_SIZE
+        self.poll_interval = poll_interval or config.JOB_POLL_INTERVAL
+        self.result_cache = result_cache
+        self._last_prune = 0.0
+
+    def run_once(self) -> int:
+        """
+        Claims and processes one chunk of items. Returns how many were processed.
+        """
+        items = self.store.claim(self.name, self.chunk_size)
+        if not items:
+            return 0
+
+        results = {}
+        keys = {}
+        to_extract = []
+        for item_id, _, _, data in items:
+            key = self.result_cache.key_for(data) if self.result_cache else None
+            cached = self.result_cache.get(key) if key else None
+            if cached is not None:
+                results[item_id] = cached
+            else:
+                keys[item_id] = key
+                to_extract.append((item_id, data))
+
+        if to_extract:
+            try:
+                extracted = self.extract_batch([data for _, data in to_extract])
+            except Exception as e:
+                logger.error(f"Job worker: extraction failed: {e}")
+                extracted = [e] * len(to_extract)
+            for (item_id, _), outcome in zip(to_extract, extracted):
+                results[item_id] = outcome
+                if keys[item_id] and not isinstance(outcome, Exception):
+                    self.result_cache.put(keys[item_id], outcome)
+
+        finished_jobs = set()
+        for item_id, job_id, filename, _ in items:
+            outcome = results[item_id]
+            if isinstance(outcome, Exception):
+                finished = self.store.complete(item_id, error=f"Extraction failed: {outcome}")
+            else:
+                finished = self.store.complete(item_id, result=outcome)
+            if finished:
+                finished_jobs.add(job_id)
+        for job_id in finished_jobs:
+            logger.info(f"Job {job_id} finished")
+        return len(items)
+
+    def deliver_callbacks(self):
+        """
+        POSTs the final status of every finished job whose callback is due.
+        Each attempt is claimed first, so with several workers only one
+        sends it; the callback counts as delivered only on a 2xx answer and
+        is otherwise retried on a later pass.
+        """
+        for job_id, url in self.store.pending_callbacks():
+            if not self.store.claim_callback(job_id):
+                continue
+            body = json.dumps(self.store.status(job_id)).encode("utf-8")
+            request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+            delivered = False
+            try:
+                with urllib.request.urlopen(request, timeout=config.JOB_CALLBACK_TIMEOUT) as response:
+                    delivered = 200 <= response.status < 300
+                if not delivered:
+                    logger.warning(f"Job {job_id}: callback to {url} answered {response.status}")
+            except OSError as e:
+                logger.warning(f"Job {job_id}: callback to {url} failed ({e})")
+            self.store.callback_result(job_id, delivered)
+
+    def prune(self):
+        # Old finished jobs are dropped at most every JOB_PRUNE_INTERVAL seconds
+        now = time.monotonic()
+        if now - self._last_prune < config.JOB_PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        removed = self.store.prune()
+        if removed:
+            logger.info(f"Job worker {self.name}: pruned {removed} finished jobs")
+
+    def run(self, stop_event):
+        logger.info(f"Job worker {self.name} started")
+        while not stop_event.is_set():
+            try:
+                processed = self.run_once()
+                self.deliver_callbacks()
+                self.prune()
+            except Exception as e:
+                logger.error(f"Job worker {self.name}: {e}")
+                processed = 0
+            if not processed:
+                stop_event.wait(self.poll_interval)
+
+    def start(self, stop_event):
+        thread = threading.Thread(target=self.run, args=(stop_event,), name="job-worker", daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    logging.basicConfig(level=config.LOG_LEVEL, format=config.LOG_FORMAT)
+    from src.extractor import FormExtractor
+    extractor = FormExtractor()
+    if config.WARMUP_ON_STARTUP:
+        extractor.warm_up()
+    worker = JobWorker(JobStore(), extractor.extract_batch)
+    try:
+        worker.run(threading.Event())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
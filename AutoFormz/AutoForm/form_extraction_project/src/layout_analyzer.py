@@ -1,8 +1,184 @@
+import difflib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from src import config
+from src.fields import FIELD_REGISTRY
+from src.skew import row_profile
+
+# Tesseract page segmentation modes used for the small crops
+PSM_SINGLE_LINE = 7
+PSM_SINGLE_WORD = 8
+
+
 class LayoutAnalyzer:
-    def analyze(self, ocr_data):
+    """
+    Splits a binarised page (black text on white) into text lines and words
+    using projection profiles, finds the lines that start with a field label
+    ("Name", "Major", "GPA", ...) and OCRs only those lines.
+
+    That is one small OCR call per line, which only pays off with an
+    in-process engine; see uses_layout().
+    """
+
+    def __init__(self, anchors=None, max_workers=None):
+        self.anchors = sorted({a.lower() for a in (anchors or config.LAYOUT_ANCHORS or _registry_anchors())})
+        self.max_workers = max_workers or config.LAYOUT_OCR_WORKERS
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def analyze(self, binary):
         """
-        Analyzes the layout of the OCR data to structure it.
-        (This is a placeholder for more advanced layout analysis)
+        Returns the text lines of the page, top to bottom. Each line is a dict
+        with its row span and the column spans of its words, left to right.
         """
-        # For now, just return the raw data
-        return ocr_data
\ No newline at end of file
+        ink = binary < 128
+        row_ink = np.count_nonzero(ink, axis=1)
+        lines = []
+        for top, bottom in _runs(row_ink > 0, min_gap=2):
+            height = bottom - top
+            if height < 4:
+                continue  # specks and thin rules
+            col_ink = np.count_nonzero(ink[top:bottom], axis=0)
+            # Gaps between words are wider than gaps between letters
+            words = _runs(col_ink > 0, min_gap=max(3, height // 4))
+            if words:
+                lines.append({"top": top, "bottom": bottom, "words": words})
+        return lines
+
+    def extract_field_text(self, binary, ocr_extractor):
+        """
+        OCRs the first word of every line to find label anchors, then OCRs the
+        anchored lines. Returns the recognised lines joined with newlines, or
+        None when no anchor was found and the caller should OCR the full page.
+        """
+        lines = self.extract_field_lines(binary, ocr_extractor)
+        if lines is None:
+            return None
+        return "\n".join(text for text, _ in lines)
+
+    def extract_field_lines(self, binary, ocr_extractor):
+        """
+        Same as extract_field_text, but returns the anchored lines as
+        (text, OCR confidence) pairs.
+        """
+        lines = self.analyze(binary)
+        if not lines:
+            return None
+
+        pool = self._get_pool()
+        first_words = [self._crop(binary, line, *line["words"][0]) for line in lines]
+        labels = list(pool.map(
+            lambda crop: ocr_extractor.extract_text_with_confidence(crop, psm=PSM_SINGLE_WORD), first_words
+        ))
+
+        anchored = [(line, label) for line, label in zip(lines, labels) if self._is_anchor(label[0])]
+        if len(anchored) < config.LAYOUT_MIN_ANCHORS:
+            return None
+
+        def read_line(item):
+            line, label = item
+            if len(line["words"]) == 1:
+                return label  # the "word" crop already was the whole line
+            crop = self._crop(binary, line, line["words"][0][0], line["words"][-1][1])
+            return ocr_extractor.extract_text_with_confidence(crop, psm=PSM_SINGLE_LINE)
+
+        return [(text.strip(), confidence) for text, confidence in pool.map(read_line, anchored)]
+
+    def _is_anchor(self, label):
+        tokens = label.split()
+        if not tokens:
+            return False
+        word = re.sub(r"[^a-z]", "", tokens[0].lower())
+        if len(word) < 3:
+            return False
+        # OCR often garbles a letter of the label ("Maj0r") or reads "m" as "rn" ("Narne")
+        words = {word, word.replace("rn", "m")}
+        return any(
+            candidate == anchor or difflib.SequenceMatcher(None, candidate, anchor).ratio() >= 0.8
+            for candidate in words for anchor in self.anchors
+        )
+
+    def _crop(self, binary, line, left, right, pad=10):
+        crop = binary[line["top"]:line["bottom"], left:right]
+        return cv2.copyMakeBorder(crop, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=255)
+
+    def _get_pool(self):
+        # Pages are read on several threads at once; only one of them may create the pool
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="layout-ocr")
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+def uses_layout(ocr_backend_name):
+    """
+    Whether layout analysis is on for the given OCR backend. With
+    ENABLE_LAYOUT_ANALYSIS = "auto" it is only on for tesserocr: with
+    pytesseract every per-line call starts a tesseract process and loads
+    the model again, which is slower than one full-page call.
+    """
+    if config.ENABLE_LAYOUT_ANALYSIS == "auto":
+        return ocr_backend_name == "tesserocr"
+    return bool(config.ENABLE_LAYOUT_ANALYSIS)
+
+
+def _registry_anchors():
+    return [
+        label.split()[0]
+        for name in config.SUPPORTED_FIELDS if name in FIELD_REGISTRY
+        for label in FIELD_REGISTRY[name]["labels"]
+    ]
+
+
+def split_line_bands(binary, bands, min_gap=None):
+    """
+    Cuts a binarised page (black text on white) into at most `bands`
+    horizontal bands of whole text lines, for OCR in parallel. Lines come
+    from the row projection profile and every cut goes through the middle
+    of the whitespace valley between two lines. Returns (top, bottom) row
+    spans covering the page, top to bottom.
+    """
+    height, width = binary.shape[:2]
+    # A few stray pixels in a row (noise, scan dust) don't make it a text row
+    text_rows = row_profile(binary < 128) > max(1.0, width * 0.002)
+    lines = _runs(text_rows, min_gap=min_gap or config.OCR_BAND_MIN_GAP)
+    bands = min(bands, len(lines))
+    if bands < 2:
+        return [(0, height)]
+
+    # Greedy: close a band once it holds its share of the text rows
+    target = sum(bottom - top for top, bottom in lines) / float(bands)
+    spans, start, filled = [], 0, 0
+    for (top, bottom), (next_top, _) in zip(lines, lines[1:]):
+        filled += bottom - top
+        if filled >= target and len(spans) < bands - 1:
+            cut = (bottom + next_top) // 2
+            spans.append((start, cut))
+            start, filled = cut, 0
+    spans.append((start, height))
+    return spans
+
+
+def _runs(mask, min_gap):
+    """
+    Returns (start, end) spans of True values, merging spans separated by
+    fewer than min_gap False values.
+    """
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    spans = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if spans and start - spans[-1][1] < min_gap:
+            spans[-1] = (spans[-1][0], int(end))
+        else:
+            spans.append((int(start), int(end)))
+    return spans
@@ -0,0 +1,163 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds in seconds: regex runs in microseconds, full-page OCR in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with a single label.
+    """
+
+    def __init__(self, name, documentation, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label value -> [count per bucket..., +Inf count], sum
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(label_value, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._series[label_value] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for label_value, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {total}')
+            lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {cumulative}')
+        return lines
+
+
+class Counter:
+    """
+    Prometheus-style counter with a single label.
+    """
+
+    def __init__(self, name, documentation, label):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_value, value in values:
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "autoform_stage_seconds", "Time spent in each extraction pipeline stage.", label="stage"
+)
+REQUESTS = Counter(
+    "autoform_requests_total", "Single-form extraction requests by outcome.", label="outcome"
+)
+TIERS = Counter(
+    "autoform_extraction_tier_total", "Extractions by the cascade tier that produced the result.", label="tier"
+)
+REGISTRY = [STAGE_SECONDS, REQUESTS, TIERS]
+_COUNTERS = {metric.name: metric for metric in REGISTRY if isinstance(metric, Counter)}
+
+# Set while collect_timings runs; stage timings and counts go here instead of
+# straight into the metrics so they can travel back from worker processes.
+_collected = contextvars.ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Times the enclosed block as one observation of the given pipeline stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def record(stage, seconds):
+    collected = _collected.get()
+    if collected is None:
+        STAGE_SECONDS.observe(stage, seconds)
+    else:
+        collected["stages"].append((stage, seconds))
+
+
+def count(counter, label_value):
+    collected = _collected.get()
+    if collected is None:
+        counter.inc(label_value)
+    else:
+        collected["counts"].append((counter.name, label_value))
+
+
+def collect_timings(fn, *args):
+    """
+    Runs fn(*args) and returns (result, timings). timings holds the
+    (stage, seconds) observations and (counter, label) counts made inside it.
+    Module-level so the process executors can pickle it; the caller hands
+    the timings to observe().
+    """
+    token = _collected.set({"stages": [], "counts": []})
+    try:
+        result = fn(*args)
+        return result, _collected.get()
+    finally:
+        _collected.reset(token)
+
+
+def observe(timings):
+    for stage, seconds in timings["stages"]:
+        STAGE_SECONDS.observe(stage, seconds)
+    for name, label_value in timings["counts"]:
+        _COUNTERS[name].inc(label_value)
+
+
+def counted(timings, counter):
+    """
+    Returns the label values counted on counter inside collect_timings.
+    """
+    return [label_value for name, label_value in timings["counts"] if name == counter.name]
+
+
+def server_timing(timings):
+    """
+    Formats timings as a Server-Timing header value, summing repeated stages.
+    Durations are in milliseconds as the header expects.
+    """
+    totals = {}
+    for stage, seconds in timings["stages"]:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000.0:.1f}" for stage, seconds in totals.items())
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
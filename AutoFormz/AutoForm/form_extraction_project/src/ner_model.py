@@ -1,64 +1,101 @@
 import spacy
+import logging
 import os
+import time
+from src import config
+from src.metrics import timed
+from src.name_validator import load_name_validator
+
+logger = logging.getLogger(__name__)
 
 class FormNERModel:
-    def __init__(self, model_dir="models/custom_form_model"):
+    def __init__(self, model_dir=config.CUSTOM_MODEL_DIR, validator_model=config.VALIDATOR_MODEL):
         self.model_path = model_dir
         
         # 1. Load Custom Model (The Specialist)
         if os.path.exists(self.model_path):
-            print(f"Loading CUSTOM model from {self.model_path}...")
+            logger.info(f"Loading CUSTOM model from {self.model_path}...")
+            start = time.perf_counter()
             self.custom_nlp = spacy.load(self.model_path)
+            logger.info(f"Custom model loaded in {time.perf_counter() - start:.2f}s")
         else:
-            print("Custom model not found. Initialization failed.")
+            logger.error("Custom model not found. Initialization failed.")
             self.custom_nlp = None
 
-        # 2. Load Standard English Model (The Validator)
+        # 2. Load the Name Validator
         # We use this to double-check if a name is actually a person
-        try:
-            print("Loading Standard English model for validation...")
-            self.validator_nlp = spacy.load("en_core_web_sm")
-        except:
-            print("Warning: Standard model not found. Run 'python -m spacy download en_core_web_sm'")
-            self.validator_nlp = None
+        # (config.NAME_VALIDATOR: name lexicon first, or the standard English model)
+        start = time.perf_counter()
+        self.name_validator = load_name_validator(model=validator_model)
+        if self.name_validator is None:
+            logger.warning(f"Names are not validated. For the spaCy validator run 'python -m spacy download {validator_model}'")
+        else:
+            logger.info(f"Name validator ({config.NAME_VALIDATOR}) loaded in {time.perf_counter() - start:.2f}s")
+
+    def preload_validator(self):
+        """
+        Loads whatever the name validator would otherwise load on first use
+        (the spaCy fallback of the lexicon validator), if
+        VALIDATOR_FALLBACK_PRELOAD is set. By default it stays unloaded until
+        a name the lexicon rules can't settle comes along.
+        """
+        if config.VALIDATOR_FALLBACK_PRELOAD and self.name_validator is not None:
+            self.name_validator.preload()
 
     def extract_entities(self, text: str) -> dict:
         if not self.custom_nlp:
             return {}
 
-        doc = self.custom_nlp(text)
-        entities = {}
+        with timed("ner"):
+            doc = self.custom_nlp(text)
+        logger.debug("AI Scanning text...")
+        return self._select_entities(doc, self.name_validator.is_valid if self.name_validator else None)
+
+    def extract_entities_batch(self, texts, batch_size=None, n_process=None) -> list:
+        """
+        Same result as calling extract_entities on every text, but streams the
+        texts through nlp.pipe and validates all name candidates of the whole
+        batch in one validator pass.
+        """
+        if not self.custom_nlp:
+            return [{} for _ in texts]
+
+        batch_size = batch_size or config.NER_BATCH_SIZE
+        n_process = n_process or config.NER_N_PROCESS
+        with timed("ner_batch"):
+            docs = list(self.custom_nlp.pipe(texts, batch_size=batch_size, n_process=n_process))
+        logger.debug(f"AI Scanning {len(docs)} texts...")
+
+        valid_names = {}
+        if self.name_validator:
+            candidates = list(dict.fromkeys(
+                self._clean_entity_text(ent)
+                for doc in docs for ent in doc.ents if ent.label_ == "STUDENT_NAME"
+            ))
+            valid_names = self.name_validator.is_valid_many(candidates, batch_size=batch_size, n_process=n_process)
 
-        print("AI Scanning text...")
+        return [self._select_entities(doc, valid_names.get if self.name_validator else None) for doc in docs]
+
+    def _select_entities(self, doc, is_valid_person) -> dict:
+        entities = {}
 
         for ent in doc.ents:
-            clean_text = ent.text.strip().replace("\n", " ")
+            clean_text = self._clean_entity_text(ent)
             label = ent.label_
 
             # --- LOGIC 2: THE COUNCIL OF MODELS (Validation) ---
-            # If the Custom Model finds a NAME, check with the Standard Model
-            if label == "STUDENT_NAME" and self.validator_nlp:
-                if not self._is_valid_person(clean_text):
-                    print(f"⚠️ REJECTED Name '{clean_text}': Standard Model says it's not a person.")
+            # If the Custom Model finds a NAME, check with the Name Validator
+            if label == "STUDENT_NAME" and is_valid_person:
+                if not is_valid_person(clean_text):
+                    logger.debug(f"⚠️ REJECTED Name '{clean_text}': Name Validator says it's not a person.")
                     continue  # Skip this entity
             # ---------------------------------------------------
 
             if label not in entities:
                 entities[label] = clean_text
-                print(f"Accepted {label}: {clean_text}")
+                logger.debug(f"Accepted {label}: {clean_text}")
 
         return entities
 
-    def _is_valid_person(self, text: str) -> bool:
-        """
-        Asks the standard English model: 'Is this text a Person?'
-        """
-        doc = self.validator_nlp(text)
-        # If the standard model finds a PERSON entity in this text, it's valid.
-        for ent in doc.ents:
-            if ent.label_ == "PERSON":
-                return True
-        
-        # Fallback: If text is two capitalized words (e.g. SEFEG K), allow it slightly more often
-        # But 'Inverted Colors' usually isn't tagged as PERSON by standard spacy.
-        return False
\ No newline at end of file
+    def _clean_entity_text(self, ent):
+        return ent.text.strip().replace("\n", " ")
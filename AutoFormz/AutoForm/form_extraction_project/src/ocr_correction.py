@@ -0,0 +1,216 @@
+import logging
+import re
+
+from src import config
+from src.name_validator import CAPTION_WORDS, NAME_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# Words from our test-case captions that the NER model likes to tag as a MAJOR
+GARBAGE_MAJOR_WORDS = CAPTION_WORDS
+# First names Tesseract is known to make of "John" on our forms
+FIRST_NAME_MISREADS = dict.fromkeys(["joha", "jyonn", "jonn", "jon", "jhn", "joan", "johnn", "jiohn"], "John")
+# Characters Tesseract confuses inside words, as (read, meant)
+OCR_CONFUSIONS = [("0", "o"), ("1", "l"), ("|", "l"), ("5", "s"), ("rn", "m"), ("vv", "w"), ("cl", "d")]
+
+
+class SymSpellIndex:
+    """
+    Nearest-entry lookup by edit distance (SymSpell). Every entry is stored
+    under each string obtained by deleting up to max_distance characters
+    from its first prefix_length characters; a query generates the same
+    deletes of its own prefix, so candidates are a handful of dict lookups
+    however large the catalog is. Candidates are then checked with the full
+    Damerau-Levenshtein distance.
+    """
+
+    def __init__(self, terms=(), max_distance=None, prefix_length=None):
+        self.max_distance = max_distance or config.CORRECTION_MAX_DISTANCE
+        self.prefix_length = prefix_length or config.CORRECTION_PREFIX_LENGTH
+        self.terms = []  # entries as written in the catalog
+        self._exact = {}  # normalised entry -> index in terms
+        self._deletes = {}  # delete of a prefix -> indexes in terms
+        for term in terms:
+            self.add(term)
+
+    def add(self, term):
+        key = _normalise(term)
+        if not key or key in self._exact:
+            return
+        index = len(self.terms)
+        self.terms.append(term)
+        self._exact[key] = index
+        for delete in _deletes(key[:self.prefix_length], self.max_distance):
+            self._deletes.setdefault(delete, []).append(index)
+
+    def lookup(self, text, max_distance=None):
+        """
+        Returns (entry, distance) for the closest entry within max_distance
+        edits, or (None, None) when there is none or two entries tie.
+        """
+        key = _normalise(text)
+        if key in self._exact:
+            return self.terms[self._exact[key]], 0
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        if not key or max_distance <= 0:
+            return None, None
+
+        candidates = set()
+        for delete in _deletes(key[:self.prefix_length], max_distance):
+            candidates.update(self._deletes.get(delete, ()))
+
+        best, best_distance, tied = None, max_distance + 1, False
+        for index in candidates:
+            candidate = _normalise(self.terms[index])
+            if abs(len(candidate) - len(key)) > max_distance:
+                continue
+            distance = _edit_distance(key, candidate, max_distance + 1)
+            if distance > max_distance:
+                continue
+            if distance < best_distance:
+                best, best_distance, tied = index, distance, False
+            elif distance == best_distance and index != best:
+                tied = True
+        if best is None or tied:
+            return None, None
+        return self.terms[best], best_distance
+
+    def __contains__(self, text):
+        return _normalise(text) in self._exact
+
+    def __len__(self):
+        return len(self.terms)
+
+
+class OCRCorrector:
+    """
+    Snaps OCR'd majors to the nearest entry of config.MAJOR_CATALOG_PATH
+    and repairs first names misread by OCR, using the given names of the
+    name lexicon. Short words get a smaller edit budget, since one edit
+    already turns most short words into another valid one.
+    """
+
+    def __init__(self, majors_path=None, names_path=None):
+        self.majors = SymSpellIndex(_read_catalog(majors_path or config.MAJOR_CATALOG_PATH))
+        self.given_names = SymSpellIndex(_read_given_names(names_path or config.NAME_LEXICON_PATH))
+        logger.debug(f"OCR correction: {len(self.majors)} majors, {len(self.given_names)} given names")
+
+    def correct_major(self, major) -> str:
+        """
+        Returns the catalog spelling of major, the major unchanged when no
+        entry is close enough, or "" for unknown majors with
+        MAJOR_CATALOG_STRICT set. As with given names, a major written in
+        plain words may be a real one missing from the catalog ("Virology"),
+        so it is only corrected when undoing OCR character confusions gives
+        an entry ("Chernistry") or one letter was dropped or doubled
+        ("Biolgy"). Words with digits or symbols in them get the full edit budget.
+        """
+        if not major:
+            return ""
+        entry = self._lookup_major(major)
+        if entry is not None:
+            return entry
+        return "" if config.MAJOR_CATALOG_STRICT else major
+
+    def _lookup_major(self, major):
+        if major in self.majors:
+            return self.majors.lookup(major, 0)[0]
+        for variant in _confusion_variants(_normalise(major)):
+            if variant in self.majors:
+                return self.majors.lookup(variant, 0)[0]
+        if not all(NAME_TOKEN.fullmatch(word) for word in major.split()):
+            return self.majors.lookup(major, _budget(major))[0]
+        entry, _ = self.majors.lookup(major, 1)
+        # A substituted letter turns one real word into another ("Virology", "Biology")
+        if entry is not None and len(_normalise(entry)) == len(_normalise(major)):
+            return None
+        return entry
+
+    def correct_given_name(self, name) -> str:
+        """
+        Returns the given name OCR misread as name, or name unchanged. Only
+        names that can't be right are corrected: listed misreads ("Jonn"),
+        words that become a known given name once OCR character confusions
+        are undone ("J0hn", "Jarnes") and words with digits or symbols in
+        them. A real name missing from the lexicon ("Jana") stays as it is.
+        """
+        misread = FIRST_NAME_MISREADS.get(name.lower())
+        if misread:
+            return _match_case(misread, name)
+        if len(name) < 3 or name in self.given_names:
+            return name
+        for variant in _confusion_variants(name.lower()):
+            if variant in self.given_names or variant in FIRST_NAME_MISREADS:
+                return _match_case(FIRST_NAME_MISREADS.get(variant, variant), name)
+        if NAME_TOKEN.fullmatch(name):
+            return name
+        entry, _ = self.given_names.lookup(name, _budget(name))
+        return _match_case(entry, name) if entry else name
+
+    def is_garbage_major(self, text) -> bool:
+        if not text:
+            return True
+        text = text.lower().strip()
+        if len(text) < 3:
+            return True
+        return any(word in GARBAGE_MAJOR_WORDS for word in re.findall(r"[a-z]+", text))
+
+
+def _budget(text):
+    return 1 if len(text) < 5 else config.CORRECTION_MAX_DISTANCE
+
+
+def _match_case(entry, name):
+    return entry.upper() if name.isupper() else entry.capitalize()
+
+
+def _confusion_variants(word):
+    # Every way of undoing some of the OCR_CONFUSIONS in word, word itself excluded
+    variants = {word}
+    for read, meant in OCR_CONFUSIONS:
+        variants |= {variant.replace(read, meant) for variant in variants if read in variant}
+    variants.discard(word)
+    return sorted(variants)
+
+
+def _normalise(text):
+    return " ".join(text.lower().split())
+
+
+def _deletes(word, max_distance):
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+def _edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (adjacent transpositions count as one
+    edit). Stops early and returns limit once the distance can't be below it.
+    """
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) >= limit:
+            return limit
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _read_catalog(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _read_given_names(path):
+    with open(path, encoding="utf-8") as f:
+        return [name for name, _, flags in (line.rstrip("\n").partition("\t") for line in f) if "G" in flags]
@@ -1,31 +1,244 @@
-import pytesseract
-import numpy as np
+import logging
 import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytesseract
+from src import config
+from src.layout_analyzer import split_line_bands
+
+try:
+    # Optional in-process engine. Must be imported on the main thread
+    # (cysignals installs signal handlers on import).
+    import tesserocr
+except Exception as e:
+    tesserocr = None
+    _tesserocr_error = e
+
+logger = logging.getLogger(__name__)
+
+
+class PytesseractBackend:
+    """
+    Runs the tesseract executable once per call through pytesseract.
+    Slow (process spawn + model load every page) but works everywhere.
+    """
+    name = "pytesseract"
+
+    def __init__(self, language, psm, oem, tesseract_cmd=None):
+        self.language = language
+        self.psm = psm
+        self.oem = oem
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+        # Resolve the executable once instead of checking the disk on every page
+        cmd = pytesseract.pytesseract.tesseract_cmd
+        self.available = os.path.exists(cmd) or shutil.which(cmd) is not None
+        if not self.available:
+            logger.critical(f"Tesseract executable '{cmd}' not found. Please install it.")
+
+    def image_to_string(self, image: np.ndarray, psm=None) -> str:
+        if not self.available:
+            return ""
+        ocr_config = f"--oem {self.oem} --psm {psm or self.psm}"
+        return pytesseract.image_to_string(image, lang=self.language, config=ocr_config)
+
+    def image_to_string_with_confidence(self, image: np.ndarray, psm=None):
+        """
+        Returns the text and the mean word confidence (0-100). The text is
+        rebuilt from the word boxes so it still takes a single tesseract run.
+        """
+        if not self.available:
+            return "", 0.0
+        ocr_config = f"--oem {self.oem} --psm {psm or self.psm}"
+        data = pytesseract.image_to_data(
+            image, lang=self.language, config=ocr_config, output_type=pytesseract.Output.DICT
+        )
+        lines = {}
+        confidences = []
+        for i, word in enumerate(data["text"]):
+            confidence = float(data["conf"][i])
+            if confidence < 0 or not word.strip():
+                continue
+            line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(line, []).append(word)
+            confidences.append(confidence)
+        text = "\n".join(" ".join(words) for words in lines.values())
+        return text, sum(confidences) / len(confidences) if confidences else 0.0
+
+
+class TesserocrBackend:
+    """
+    Keeps a Tesseract engine loaded in-process through tesserocr.
+    The traineddata is read once per thread; each call only sets a new image.
+    """
+    name = "tesserocr"
+
+    def __init__(self, language, psm, oem, tessdata_path=None):
+        if tesserocr is None:
+            raise ImportError(f"tesserocr is not available: {_tesserocr_error}")
+        self.language = language
+        self.psm = psm
+        self.oem = oem
+        self.tessdata_path = tessdata_path
+        # PyTessBaseAPI is not thread-safe, so every thread gets its own engine
+        self._local = threading.local()
+        self._engine()  # fail now (missing traineddata etc.) rather than on the first request
+
+    def _engine(self):
+        api = getattr(self._local, "api", None)
+        if api is None:
+            kwargs = {"lang": self.language, "oem": self.oem}
+            if self.tessdata_path:
+                kwargs["path"] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+        return api
+
+    def image_to_string(self, image: np.ndarray, psm=None) -> str:
+        api = self._engine()
+        self._set_image(api, image, psm)
+        return api.GetUTF8Text()
+
+    def image_to_string_with_confidence(self, image: np.ndarray, psm=None):
+        """
+        Returns the text and Tesseract's mean word confidence (0-100).
+        """
+        api = self._engine()
+        self._set_image(api, image, psm)
+        text = api.GetUTF8Text()
+        return text, float(api.MeanTextConf())
+
+    def _set_image(self, api, image, psm):
+        api.SetPageSegMode(psm or self.psm)
+        image = np.ascontiguousarray(image)
+        if image.ndim == 2:
+            h, w = image.shape
+            api.SetImageBytes(image.tobytes(), w, h, 1, w)
+        else:
+            h, w, channels = image.shape
+            api.SetImageBytes(image[:, :, ::-1].tobytes(), w, h, channels, w * channels)
+
+
+def create_ocr_backend(name=None):
+    """
+    Builds the backend named in config.OCR_BACKEND. "auto" prefers the
+    in-process tesserocr engine and falls back to pytesseract.
+    """
+    name = name or config.OCR_BACKEND
+    language, psm, oem = config.OCR_LANGUAGE, config.OCR_PSM_MODE, config.OCR_ENGINE_MODE
+
+    if name in ("auto", "tesserocr"):
+        try:
+            return TesserocrBackend(language, psm, oem, config.TESSDATA_PATH)
+        except Exception as e:
+            if name == "tesserocr":
+                raise
+            logger.warning(f"tesserocr unavailable ({e}), falling back to pytesseract.")
+
+    if name in ("auto", "pytesseract"):
+        return PytesseractBackend(language, psm, oem, config.TESSERACT_CMD)
+
+    raise ValueError(f"Unknown OCR backend '{name}'. Choose 'auto', 'tesserocr' or 'pytesseract'.")
+
+
+def backend_signature(name=None):
+    """
+    The backend create_ocr_backend(name) picks and its Tesseract version,
+    e.g. "tesserocr 5.5.1", without loading an engine. Used in cache keys:
+    the backend decides whether layout analysis runs, and engine versions
+    read differently.
+    """
+    name = name or config.OCR_BACKEND
+    if name in ("auto", "tesserocr") and tesserocr is not None:
+        return f"tesserocr {tesserocr.tesseract_version().split()[1]}"
+    if name in ("auto", "pytesseract"):
+        try:
+            version = pytesseract.get_tesseract_version()
+        except Exception:
+            version = "missing"
+        return f"pytesseract {version}"
+    return name
+
 
 class OCRExtractor:
-    def extract_text(self, image: np.ndarray) -> str:
-        # 1. Verify Tesseract Path
-        tesseract_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        if not os.path.exists(tesseract_path):
-            print("CRITICAL ERROR: Tesseract.exe not found. Please install it.")
+    def __init__(self, backend=None, page_mode=None, band_workers=None):
+        self.backend = create_ocr_backend(backend)
+        self.page_mode = page_mode or config.OCR_PAGE_MODE
+        if self.page_mode not in ("page", "bands"):
+            raise ValueError(f"Unknown OCR page mode '{self.page_mode}'. Choose 'page' or 'bands'.")
+        self.band_workers = band_workers or config.OCR_BAND_WORKERS
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        logger.info(f"OCR backend: {self.backend.name}")
+
+    def extract_text(self, image: np.ndarray, psm=None) -> str:
+        try:
+            return self.backend.image_to_string(image, psm=psm)
+
+        except Exception as e:
+            # This logs the actual error if something else breaks
+            logger.error(f"OCR Error: {e}")
             return ""
-            
-        pytesseract.pytesseract.tesseract_cmd = tesseract_path
-        
+
+    def extract_text_with_confidence(self, image: np.ndarray, psm=None):
+        """
+        Like extract_text, but returns (text, mean word confidence 0-100).
+        """
         try:
-            # --- THE FIX ---
-            # I removed the 'tessedit_char_whitelist' section.
-            # It contained nested quotes that caused the "No closing quotation" error.
-            # --psm 6: Assume a single uniform block of text.
-            # --oem 3: Use default OCR engine.
-            config = r'--oem 3 --psm 6'
-            
-            # Run OCR
-            text = pytesseract.image_to_string(image, config=config)
-            
-            return text
-            
+            return self.backend.image_to_string_with_confidence(image, psm=psm)
+
         except Exception as e:
-            # This prints the actual error if something else breaks
-            print(f"OCR Error: {e}")
-            return ""
\ No newline at end of file
+            logger.error(f"OCR Error: {e}")
+            return "", 0.0
+
+    def extract_page_text(self, binary: np.ndarray) -> str:
+        """
+        OCR of a whole binarised page. In "bands" page mode the page is cut
+        into line bands that are recognised concurrently and joined top to
+        bottom; in "page" mode it is one Tesseract call.
+        """
+        bands = self._bands(binary)
+        if len(bands) == 1:
+            return self.extract_text(binary)
+        texts = self._get_pool().map(lambda band: self.extract_text(binary[band[0]:band[1]]), bands)
+        return "\n".join(text.strip("\n") for text in texts if text.strip())
+
+    def extract_page_text_with_confidence(self, binary: np.ndarray):
+        """
+        Like extract_page_text, but returns (text, mean word confidence 0-100).
+        Band confidences are weighted by the length of their text.
+        """
+        bands = self._bands(binary)
+        if len(bands) == 1:
+            return self.extract_text_with_confidence(binary)
+        results = [
+            (text.strip("\n"), confidence)
+            for text, confidence in self._get_pool().map(
+                lambda band: self.extract_text_with_confidence(binary[band[0]:band[1]]), bands
+            )
+            if text.strip()
+        ]
+        if not results:
+            return "", 0.0
+        total = sum(len(text) for text, _ in results)
+        return "\n".join(text for text, _ in results), sum(len(text) * conf for text, conf in results) / total
+
+    def _bands(self, binary):
+        if self.page_mode != "bands" or binary.ndim != 2:
+            return [(0, binary.shape[0])]
+        return split_line_bands(binary, self.band_workers)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.band_workers, thread_name_prefix="ocr-band")
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
@@ -1,87 +1,341 @@
 import cv2
+import io
+import logging
 import numpy as np
-from scipy.ndimage import interpolation as inter
+import os
+import warnings
+from PIL import Image
+from src import config
+from src.metrics import timed
+from src.skew import get_skew_estimator
+
+logger = logging.getLogger(__name__)
+
+# Decode at 1/1, 1/2, 1/4 or 1/8 of the stored resolution; JPEGs are scaled
+# while decoding, so a reduced decode never holds the full-size pixels
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class ImageTooLarge(ValueError):
+    """Raised for images over config.MAX_IMAGE_PIXELS; they are never decoded."""
+
+
+def probe_size(source):
+    """
+    Returns (width, height) from the image header without decoding any
+    pixels, or None for formats Pillow can't read.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(source if isinstance(source, (str, os.PathLike)) else io.BytesIO(source)) as image:
+                return image.size
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    except Exception:
+        return None
+
+
+def decode_reduction(size):
+    """
+    Smallest reduction (1, 2, 4 or 8) that brings an image of the given
+    size within config.DECODE_PIXEL_BUDGET.
+    """
+    width, height = size
+    pixels = width * height
+    if pixels > config.MAX_IMAGE_PIXELS:
+        raise ImageTooLarge(
+            f"Image is {width}x{height} ({pixels / 1e6:.0f} MP); the limit is {config.MAX_IMAGE_PIXELS / 1e6:.0f} MP."
+        )
+    for factor in (1, 2, 4):
+        if pixels <= config.DECODE_PIXEL_BUDGET * factor * factor:
+            return factor
+    return 8
+
+
+def max_page_scale(size, border, budget=None):
+    """
+    Largest scale at which an image of the given (width, height), plus
+    `border` pixels on every side, stays within budget pixels (default
+    config.PREPROCESS_MAX_PAGE_PIXELS). Allows for the output size being
+    rounded up by half a pixel.
+    """
+    budget = budget or config.PREPROCESS_MAX_PAGE_PIXELS
+    width, height = size
+    pad = 2 * border + 0.5
+    # (width * s + pad) * (height * s + pad) <= budget, solved for s
+    a, b, c = width * height, pad * (width + height), pad * pad - budget
+    if c >= 0:
+        return 0.0
+    return (-b + np.sqrt(b * b - 4 * a * c)) / (2 * a)
+
+def estimate_text_height(gray, is_dark_mode=False, thumbnail_size=1000, min_components=15):
+    """
+    Estimates the typical glyph height in pixels of the full-size image from the
+    connected components of a thumbnail. Returns None if too few glyph-like
+    components are found (blank pages, photos).
+    """
+    h, w = gray.shape[:2]
+    factor = min(1.0, thumbnail_size / float(max(h, w)))
+    thumb = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA) if factor < 1.0 else gray
+
+    flags = cv2.THRESH_BINARY if is_dark_mode else cv2.THRESH_BINARY_INV
+    ink = cv2.threshold(thumb, 0, 255, flags + cv2.THRESH_OTSU)[1]
+    count, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    # Keep glyph-sized blobs: not specks, not ruling lines, not boxes or pictures
+    glyphs = (
+        (heights >= 3) & (heights <= thumb.shape[0] / 8)
+        & (widths <= thumb.shape[1] / 8)
+        & (widths <= heights * 3) & (areas >= 4)
+    )
+    if np.count_nonzero(glyphs) < min_components:
+        return None
+    return float(np.median(heights[glyphs])) / factor
+
+def _thumbnail(img, size):
+    """
+    Returns the image shrunk so its longest side is at most `size`, and the factor used.
+    """
+    factor = min(1.0, size / float(max(img.shape[:2])))
+    if factor < 1.0:
+        img = cv2.resize(img, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+    return img, factor
 
 class ImagePreprocessor:
-    def preprocess(self, image_path: str) -> np.ndarray:
+    """
+    Turns a scan into a binary page for Tesseract. Every decision (ruling,
+    dark mode, scale, skew angle) is made on a thumbnail; the full-size
+    pixels are only touched by the grayscale conversion, one warpAffine that
+    scales, rotates and adds the border at once, and in-place binarisation.
+    """
+    BORDER = 50
+
+    def __init__(self, skew_method=None):
+        self.skew_estimator = get_skew_estimator(skew_method)
+
+    def preprocess(self, image) -> np.ndarray:
+        """
+        Accepts a file path, raw encoded bytes, a file-like object or an
+        already decoded BGR/grayscale array.
+        """
         try:
-            img = cv2.imread(image_path)
+            img = self.load_image(image)
             if img is None: return np.zeros((100,100), dtype=np.uint8)
 
-            img = self._remove_colored_lines(img)
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Check Dark Mode
-            is_dark_mode = np.mean(gray) < 127
-
-            # Scale 3x (Best balance)
-            h, w = gray.shape
-            scale = 3.0
-            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
-
-            if is_dark_mode:
-                gray = cv2.bitwise_not(gray)
-
-            gray = self._correct_skew(gray)
-
-            # --- BINARIZATION STRATEGY ---
-            if is_dark_mode:
-                # DIGITAL THICKENING MODE
-                # We inverted. Text is 0 (Black). BG is 255 (White).
-                # Edges are ~150 (Gray).
-                # Threshold 190: Anything darker than 190 becomes Black (0).
-                # This turns the gray edges into black, THICKENING the text.
-                _, binary = cv2.threshold(gray, 190, 255, cv2.THRESH_BINARY)
-            else:
-                # PAPER MODE (Otsu)
-                blur = cv2.GaussianBlur(gray, (3,3), 0)
-                _, binary = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-            binary = cv2.copyMakeBorder(binary, 50, 50, 50, 50, cv2.BORDER_CONSTANT, value=[255, 255, 255])
-            return binary
+            with timed("preprocess_line_removal"):
+                thumb, factor = _thumbnail(img, config.PREPROCESS_THUMBNAIL_SIZE)
+                bounds = self._colored_line_bounds(thumb)
+                if bounds is not None:
+                    img = self._remove_colored_lines(img, bounds, factor)
+                    thumb, factor = _thumbnail(img, config.PREPROCESS_THUMBNAIL_SIZE)
+
+            with timed("preprocess_analysis"):
+                thumb_gray, is_dark_mode, scale = self._analyze(thumb, factor)
+
+            with timed("preprocess_skew"):
+                angle = self._skew_angle(thumb_gray, is_dark_mode)
+
+            with timed("preprocess_warp"):
+                page = self._warp(img, scale, angle, self.BORDER, is_dark_mode)
+
+            # --- BINARIZATION STRATEGY (in place) ---
+            with timed("preprocess_binarize"):
+                if is_dark_mode:
+                    # DIGITAL THICKENING MODE
+                    # We inverted. Text is 0 (Black). BG is 255 (White).
+                    # Edges are ~150 (Gray).
+                    # Threshold 190: Anything darker than 190 becomes Black (0).
+                    # This turns the gray edges into black, THICKENING the text.
+                    cv2.threshold(page, 190, 255, cv2.THRESH_BINARY, dst=page)
+                else:
+                    # PAPER MODE (Otsu)
+                    cv2.GaussianBlur(page, (3,3), 0, dst=page)
+                    # Threshold chosen on the page itself; the white border would skew the histogram
+                    inner = page[self.BORDER:-self.BORDER, self.BORDER:-self.BORDER]
+                    threshold, _ = cv2.threshold(inner, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=inner)
+                    cv2.threshold(page, threshold, 255, cv2.THRESH_BINARY, dst=page)
+            return page
 
         except Exception as e:
-            print(f"Preprocessing error: {e}")
+            logger.error(f"Preprocessing error: {e}")
             return np.zeros((100, 100), dtype=np.uint8)
 
-    def _remove_colored_lines(self, img):
+    def preprocess_fast(self, image) -> np.ndarray:
+        """
+        Cheap variant for clean digital forms: grayscale, scaled and Otsu
+        thresholded, without line removal, deskewing or blurring.
+        Returns None if the image can't be decoded.
+        """
+        img = self.load_image(image)
+        if img is None: return None
+
+        with timed("preprocess_analysis"):
+            thumb, factor = _thumbnail(img, config.PREPROCESS_THUMBNAIL_SIZE)
+            _, is_dark_mode, scale = self._analyze(thumb, factor)
+        with timed("preprocess_warp"):
+            page = self._warp(img, scale, 0.0, 0, is_dark_mode)
+        with timed("preprocess_binarize"):
+            cv2.threshold(page, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=page)
+        return page
+
+    def load_image(self, image):
+        """
+        Decodes the input into a BGR array. Paths go through cv2.imread,
+        everything else is decoded in memory with cv2.imdecode. The size is
+        read from the header first: images over DECODE_PIXEL_BUDGET are
+        decoded at reduced resolution and images over MAX_IMAGE_PIXELS raise
+        ImageTooLarge.
+        """
+        if isinstance(image, np.ndarray):
+            if image.ndim == 2:
+                return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+            return image
+        with timed("preprocess_decode"):
+            if hasattr(image, "read"):
+                image = image.read()
+            is_path = isinstance(image, (str, os.PathLike))
+            if not is_path and len(image) == 0: return None
+            size = probe_size(image)
+            factor = decode_reduction(size) if size else 1
+            if factor > 1:
+                logger.debug(f"Decoding {size[0]}x{size[1]} image at 1/{factor} resolution")
+            if is_path:
+                return cv2.imread(os.fspath(image), DECODE_FLAGS[factor])
+            return cv2.imdecode(np.frombuffer(image, dtype=np.uint8), DECODE_FLAGS[factor])
+
+    def _analyze(self, thumb, factor):
+        """
+        Decides dark mode and the scale factor from the thumbnail.
+        Returns (grayscale thumbnail, is_dark_mode, scale).
+        """
+        thumb_gray = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        is_dark_mode = np.mean(thumb_gray) < 127
+        # Scale so the text lands at the size Tesseract reads best
+        scale = self._choose_scale(thumb_gray, is_dark_mode, factor)
+        return thumb_gray, is_dark_mode, scale
+
+    def _choose_scale(self, thumb_gray, is_dark_mode, factor=1.0):
+        if config.PREPROCESS_SCALE_MODE != "adaptive":
+            return config.PREPROCESS_SCALE
+
+        text_height = estimate_text_height(thumb_gray, is_dark_mode)
+        if text_height is None:
+            logger.debug(f"Preprocessing: no text height estimate, using fixed scale {config.PREPROCESS_SCALE}")
+            return config.PREPROCESS_SCALE
+        text_height /= factor  # thumbnail pixels -> full-size pixels
+
+        scale = config.TEXT_HEIGHT_TARGET / text_height
+        scale = min(max(scale, config.PREPROCESS_MIN_SCALE), config.PREPROCESS_MAX_SCALE)
+        scale = round(scale, 2)
+        logger.debug(f"Preprocessing: text height {text_height:.1f}px -> scale {scale}")
+        return scale
+
+    def _skew_angle(self, thumb_gray, is_dark_mode):
+        # The estimators expect dark text on a light page; the angle doesn't depend on size
+        try:
+            angle = self.skew_estimator.estimate(cv2.bitwise_not(thumb_gray) if is_dark_mode else thumb_gray)
+        except Exception:
+            return 0.0
+        return angle if abs(angle) >= config.SKEW_MIN_ANGLE else 0.0
+
+    def _warp(self, img, scale, angle, border, is_dark_mode):
+        """
+        Grayscale, scale, rotation about the centre and the border in one
+        warpAffine into a preallocated page. Dark pages are inverted in place
+        afterwards so the result is always dark text on white. The scale is
+        reduced if needed so the page stays within PREPROCESS_MAX_PAGE_PIXELS.
+        """
+        limit = max_page_scale((img.shape[1], img.shape[0]), border)
+        if scale > limit:
+            logger.debug(f"Preprocessing: scale {scale} -> {limit:.3f} to stay within the page pixel budget")
+            scale = limit
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            # warpAffine has no area filter; shrink first so downscaling doesn't alias
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            scale = 1.0
+
+        h, w = gray.shape
+        out_w, out_h = int(round(w * scale)) + 2 * border, int(round(h * scale)) + 2 * border
+        M = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, scale)
+        # Move the centre of the source onto the centre of the bordered page
+        M[0, 2] += out_w / 2.0 - w / 2.0
+        M[1, 2] += out_h / 2.0 - h / 2.0
+
+        page = np.empty((out_h, out_w), dtype=np.uint8)
+        background = 0 if is_dark_mode else 255
+        flags = cv2.INTER_CUBIC if angle else cv2.INTER_LINEAR
+        cv2.warpAffine(
+            gray, M, (out_w, out_h), dst=page, flags=flags,
+            borderMode=cv2.BORDER_CONSTANT, borderValue=background,
+        )
+        if is_dark_mode:
+            cv2.bitwise_not(page, dst=page)
+        return page
+
+    def has_colored_lines(self, img, thumbnail_size=500):
+        """
+        Cheap check on a thumbnail for red/blue ruling that needs
+        _remove_colored_lines.
+        """
+        thumb, _ = _thumbnail(img, thumbnail_size)
+        return self._colored_line_bounds(thumb) is not None
+
+    def _colored_line_bounds(self, thumb, min_length=0.02):
+        """
+        Bounding box (x, y, w, h) of the red/blue ruling on a thumbnail, or
+        None when there is none. Any coloured stroke at least min_length of
+        the thumbnail's longer side long counts, so a single underline or box
+        is found while scanner speckle is not.
+        """
+        mask = self._colored_line_mask(thumb)
+        if not np.any(mask):
+            return None
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        stats = stats[1:]  # label 0 is the background
+        left, top = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        width, height = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+        strokes = np.maximum(width, height) >= min_length * max(mask.shape)
+        if not np.any(strokes):
+            return None
+        x0, y0 = left[strokes].min(), top[strokes].min()
+        x1, y1 = (left + width)[strokes].max(), (top + height)[strokes].max()
+        return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+    def _colored_line_mask(self, img):
         hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
         lower_red1, upper_red1 = np.array([0, 50, 50]), np.array([10, 255, 255])
         lower_red2, upper_red2 = np.array([170, 50, 50]), np.array([180, 255, 255])
         mask_red = cv2.inRange(hsv, lower_red1, upper_red1) + cv2.inRange(hsv, lower_red2, upper_red2)
         lower_blue, upper_blue = np.array([90, 50, 50]), np.array([140, 255, 255])
         mask_blue = cv2.inRange(hsv, lower_blue, upper_blue)
-        mask = mask_red + mask_blue
+        return mask_red + mask_blue
+
+    def _remove_colored_lines(self, img, bounds, factor, pad=8):
+        """
+        Inpaints the ruling inside `bounds` (thumbnail coordinates) only.
+        Works on a copy so a caller's array is never modified.
+        """
+        x, y, w, h = bounds
+        height, width = img.shape[:2]
+        x0, y0 = max(0, int(x / factor) - pad), max(0, int(y / factor) - pad)
+        x1, y1 = min(width, int((x + w) / factor) + pad), min(height, int((y + h) / factor) + pad)
+
+        region = img[y0:y1, x0:x1]
+        mask = self._colored_line_mask(region)
+        if not np.any(mask):
+            return img
         kernel = np.ones((2,2), np.uint8)
         mask = cv2.dilate(mask, kernel, iterations=2)
-        result = cv2.inpaint(img, mask, 3, cv2.INPAINT_TELEA)
+        result = img.copy()
+        result[y0:y1, x0:x1] = cv2.inpaint(region, mask, 3, cv2.INPAINT_TELEA)
         return result
-
-    def _correct_skew(self, image, delta=1, limit=5):
-        try:
-            def determine_score(arr, angle):
-                data = inter.rotate(arr, angle, reshape=False, order=0)
-                histogram = np.sum(data, axis=1, dtype=float)
-                score = np.sum((histogram[1:] - histogram[:-1]) ** 2, dtype=float)
-                return histogram, score
-
-            h, w = image.shape
-            small = cv2.resize(image, (0, 0), fx=0.5, fy=0.5)
-            thresh = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
-
-            scores = []
-            angles = np.arange(-limit, limit + delta, delta)
-            for angle in angles:
-                _, score = determine_score(thresh, angle)
-                scores.append(score)
-
-            best_angle = angles[scores.index(max(scores))]
-            if abs(best_angle) < 0.5: return image
-
-            (h, w) = image.shape[:2]
-            center = (w // 2, h // 2)
-            M = cv2.getRotationMatrix2D(center, best_angle, 1.0)
-            rotated = cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-            return rotated
-        except:
-            return image
\ No newline at end of file
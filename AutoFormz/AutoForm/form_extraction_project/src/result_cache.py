@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from src import config
+from src.ocr_handler import backend_signature
+
+logger = logging.getLogger(__name__)
+
+
+def pipeline_fingerprint():
+    """
+    Hashes every setting that changes extraction output, the contents of
+    the data files they name (catalogs, lexicon), the size and mtime of
+    every file of the custom model, and the OCR backend and Tesseract
+    version in use, so a config, data, model or engine change invalidates
+    old results.
+    """
+    digest = hashlib.sha256()
+    for name in config.RESULT_CACHE_FINGERPRINT_KEYS:
+        digest.update(f"{name}={getattr(config, name, None)!r};".encode("utf-8"))
+
+    for name in config.RESULT_CACHE_FINGERPRINT_FILES:
+        path = getattr(config, name, None)
+        if path and os.path.exists(path):
+            with open(path, "rb") as data_file:
+                digest.update(data_file.read())
+
+    # Retraining can leave meta.json unchanged, so the weight files are what count
+    for directory, dirnames, filenames in os.walk(config.CUSTOM_MODEL_DIR):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            relative = os.path.relpath(path, config.CUSTOM_MODEL_DIR)
+            digest.update(f"{relative}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+
+    digest.update(backend_signature().encode("utf-8"))
+
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Content-addressed cache of extraction results.
+    Keys are a SHA-256 of the image bytes plus the pipeline fingerprint.
+    Results live in an in-memory LRU and, if disk_dir is set, in a size-capped
+    directory of JSON files that survives restarts. The lock only guards the
+    in-memory state; files are read, written and deleted outside it.
+    """
+
+    def __init__(self, max_entries=1024, disk_dir=None, disk_max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.fingerprint = pipeline_fingerprint()
+
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()  # key -> file size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def key_for(self, image_bytes) -> str:
+        digest = hashlib.sha256(self.fingerprint.encode("ascii"))
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return dict(self._memory[key])
+            if key not in self._disk:
+                self.misses += 1
+                return None
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                dropped = self._forget_disk(key)
+            else:
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self._remember(key, result)
+                self.disk_hits += 1
+                return dict(result)
+        self._remove_files(dropped)
+        return None
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, dict(result))
+        if not self.disk_dir:
+            return
+
+        size = self._write_disk(key, result)
+        if size is None:
+            return
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._disk_bytes += size
+            evicted = self._evict_disk()
+        self._remove_files(evicted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "fingerprint": self.fingerprint,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_max_entries": self.max_entries,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+            }
+
+    # --- memory tier ---
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # --- disk tier ---
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _load_disk_index(self):
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._remove_files(self._evict_disk())
+
+    def _read_disk(self, key):
+        # None when the file is gone (evicted meanwhile) or unreadable
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)  # mtime doubles as last-access time for eviction after restart
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, result):
+        # Returns the size written, or None when the file could not be written
+        path = self._disk_path(key)
+        data = json.dumps(result).encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Result cache: could not write {path}: {e}")
+            return None
+        return len(data)
+
+    def _evict_disk(self):
+        # Drops the least recently used entries from the index; returns their keys for _remove_files
+        evicted = []
+        while self._disk and self._disk_bytes > self.disk_max_bytes:
+            evicted.extend(self._forget_disk(next(iter(self._disk))))
+        return evicted
+
+    def _forget_disk(self, key):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        return [key]
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
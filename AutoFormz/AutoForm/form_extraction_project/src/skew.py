@@ -0,0 +1,116 @@
+import cv2
+import numpy as np
+from scipy.ndimage import interpolation as inter
+from src import config
+
+# Angles returned by the estimators are the correction to apply with
+# cv2.getRotationMatrix2D (degrees, positive = counter-clockwise).
+
+
+def row_profile(ink):
+    """
+    Horizontal projection: the amount of ink in every row of an image
+    whose ink pixels are non-zero.
+    """
+    return np.sum(ink, axis=1, dtype=float)
+
+
+def row_profile_score(histogram):
+    """
+    Sharpness of a row projection profile: text lines that are perfectly
+    horizontal give tall peaks and deep valleys, so big jumps between rows.
+    """
+    return float(np.sum((histogram[1:] - histogram[:-1]) ** 2, dtype=float))
+
+
+def _binarize_inverted(gray):
+    # Text becomes 255 on a 0 background so row sums count ink
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+
+class ProjectionSkewEstimator:
+    """
+    The original brute-force search: rotates a half-size copy of the page
+    for every whole degree in [-limit, limit] and keeps the sharpest profile.
+    """
+
+    def __init__(self, limit=5, delta=1):
+        self.limit = limit
+        self.delta = delta
+
+    def estimate(self, gray) -> float:
+        small = cv2.resize(gray, (0, 0), fx=0.5, fy=0.5)
+        thresh = _binarize_inverted(small)
+
+        scores = []
+        angles = np.arange(-self.limit, self.limit + self.delta, self.delta)
+        for angle in angles:
+            data = inter.rotate(thresh, angle, reshape=False, order=0)
+            scores.append(row_profile_score(row_profile(data)))
+
+        return float(angles[scores.index(max(scores))])
+
+
+class CoarseToFineSkewEstimator:
+    """
+    Projection-profile search on a small thumbnail without rotating any image.
+    Ink pixel coordinates are projected onto the rotated y axis for each
+    candidate angle and histogrammed; the search runs at whole degrees over
+    a wide range, then refines around the best angle in finer steps.
+    """
+
+    def __init__(self, limit=15, thumbnail_size=800, max_points=40000, steps=(1.0, 0.2, 0.05)):
+        self.limit = limit
+        self.thumbnail_size = thumbnail_size
+        self.max_points = max_points
+        self.steps = steps
+
+    def estimate(self, gray) -> float:
+        h, w = gray.shape[:2]
+        factor = min(1.0, self.thumbnail_size / float(max(h, w)))
+        if factor < 1.0:
+            gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+        ys, xs = np.nonzero(_binarize_inverted(gray))
+        if len(xs) < 10:
+            return 0.0
+        if len(xs) > self.max_points:
+            stride = len(xs) // self.max_points + 1
+            ys, xs = ys[::stride], xs[::stride]
+
+        # Centre the coordinates so projections stay small and non-negative after the offset
+        xs = xs.astype(np.float32) - gray.shape[1] / 2.0
+        ys = ys.astype(np.float32) - gray.shape[0] / 2.0
+        offset = int(np.hypot(*gray.shape[:2])) + 1
+
+        best_angle, span = 0.0, float(self.limit)
+        for step in self.steps:
+            angles = np.arange(best_angle - span, best_angle + span + step / 2, step)
+            scores = [self._score(xs, ys, angle, offset) for angle in angles]
+            best_angle = float(angles[int(np.argmax(scores))])
+            span = step
+        return round(best_angle, 2)
+
+    def _score(self, xs, ys, angle, offset):
+        theta = np.deg2rad(angle)
+        rows = (ys * np.cos(theta) - xs * np.sin(theta) + offset).astype(np.int32)
+        histogram = np.bincount(rows, minlength=2 * offset).astype(float)
+        return row_profile_score(histogram)
+
+
+SKEW_ESTIMATORS = {
+    "projection": ProjectionSkewEstimator,
+    "coarse_to_fine": CoarseToFineSkewEstimator,
+}
+
+
+def get_skew_estimator(method=None, **kwargs):
+    """
+    Builds the estimator named in config.SKEW_METHOD (or `method`).
+    """
+    method = method or config.SKEW_METHOD
+    if method not in SKEW_ESTIMATORS:
+        raise ValueError(f"Unknown skew method '{method}'. Choose from {sorted(SKEW_ESTIMATORS)}")
+    if method == "coarse_to_fine":
+        kwargs.setdefault("limit", config.SKEW_ANGLE_LIMIT)
+    return SKEW_ESTIMATORS[method](**kwargs)
@@ -0,0 +1,77 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that caps request bodies. A Content-Length over the
+    limit is answered with 413 before any of the body is read; otherwise the
+    body is counted as it streams in and the request is cut off with 413 as
+    soon as it passes the limit, so an oversized upload is never buffered
+    whole. limits maps path prefixes to byte limits; other paths get default.
+    """
+
+    def __init__(self, app, limits=None, default=None):
+        self.app = app
+        self.limits = sorted((limits or {}).items(), key=lambda item: -len(item[0]))
+        self.default = default
+
+    def limit_for(self, path):
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return self.default
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await _reject(send, limit)
+            return
+
+        state = {"received": 0, "too_large": False, "started": False}
+
+        async def limited_receive():
+            if state["too_large"]:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > limit:
+                    state["too_large"] = True
+                    # Looks like the client went away, so the app stops reading
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if state["too_large"]:
+                return  # whatever the app makes of the cut-off body, the client gets the 413
+            if message["type"] == "http.response.start":
+                state["started"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not state["too_large"]:
+                raise
+        if state["too_large"] and not state["started"]:
+            logger.warning(f"Rejected upload to {scope['path']}: body over {limit} bytes")
+            await _reject(send, limit)
+
+
+async def _reject(send, limit):
+    body = json.dumps({"detail": f"Upload exceeds the {limit // (1024 * 1024)}MB limit."}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
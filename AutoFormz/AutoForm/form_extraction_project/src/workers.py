@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+
+from src import config
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+# Each worker process builds its own FormExtractor once (models are not
+# shared between processes) and keeps it for every file it is handed.
+_worker_extractor = None
+
+
+def init_worker():
+    """
+    Process pool initializer, also used by training.annotate_data: limits
+    Tesseract's and OpenCV's threads so N workers don't oversubscribe the
+    cores, then builds this process's FormExtractor (see worker_extractor()).
+    """
+    global _worker_extractor
+    # Read by OpenMP when tesserocr is loaded, which is below unless the parent already did (main.py sets it there)
+    os.environ.setdefault("OMP_THREAD_LIMIT", str(config.TESSERACT_THREADS))
+    cv2.setNumThreads(config.OPENCV_THREADS)
+    from src.extractor import FormExtractor
+    _worker_extractor = FormExtractor()
+
+
+def worker_extractor():
+    return _worker_extractor
+
+
+def extract_in_worker(image):
+    return _worker_extractor.extract(image)
+
+
+def extract_batch_in_worker(images):
+    return _worker_extractor.extract_batch(images)
+
+
+def warm_up_worker():
+    if config.WARMUP_ON_STARTUP:
+        _worker_extractor.warm_up()
+    return os.getpid()
+
+
+class ExtractionPool:
+    """
+    Fans extraction jobs out over a pool of worker processes.
+    The pool is created on first use so importing the API stays cheap.
+    A batch is only handed to the pool when one of its processes is idle,
+    so batches never queue inside the pool and a timeout covers the run.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or config.BATCH_MAX_WORKERS or os.cpu_count() or 1
+        self._executor = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"Starting extraction pool with {self.max_workers} worker processes...")
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker)
+            return self._executor
+
+    def _try_submit(self, images):
+        """
+        Hands a batch to an idle worker process and returns its future
+        (resolving to (results, timings)), or None when every worker is busy.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers:
+                return None
+            self._in_flight += 1
+        try:
+            future = self._get_executor().submit(metrics.collect_timings, extract_batch_in_worker, images)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def extract_many(self, images, executor, chunk_size=None):
+        """
+        Runs the extractor on every image and returns the results in input order.
+        Images go to the workers in chunks so each worker batches its NER calls.
+        A chunk is only submitted once a worker is idle (with the process
+        executor, one of `executor`'s own workers) and waits on the event loop
+        meanwhile, so no executor thread is held and the per-chunk timeout
+        starts when the chunk does.
+        A failed chunk yields its exception for each of its files instead of a result.
+        Stage timings measured in the workers are added to the metrics here.
+        """
+        chunk_size = chunk_size or config.BATCH_CHUNK_SIZE
+        # Use smaller chunks for small batches so every worker gets a share
+        chunk_size = max(1, min(chunk_size, -(-len(images) // self.max_workers)))
+        chunks = [images[i:i + chunk_size] for i in range(0, len(images), chunk_size)]
+
+        async def run_chunk(chunk):
+            timeout = config.EXTRACT_TIMEOUT * len(chunk)
+            if executor.kind == "process":
+                # The executor's own processes hold extractors; no second pool is needed
+                return await executor.run(
+                    metrics.collect_timings, extract_batch_in_worker, chunk, timeout=timeout, queue=False
+                )
+            future = self._try_submit(chunk)
+            if future is None:
+                raise ExecutorBusy()
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+        outcomes = [None] * len(chunks)
+        waiting = iter(range(len(chunks)))
+
+        async def lane():
+            for i in waiting:
+                while True:
+                    try:
+                        outcomes[i] = await run_chunk(chunks[i])
+                    except ExecutorBusy:
+                        await asyncio.sleep(config.BATCH_BUSY_WAIT)
+                        continue
+                    except Exception as e:
+                        outcomes[i] = e
+                    break
+
+        lanes = executor.max_workers if executor.kind == "process" else self.max_workers
+        await asyncio.gather(*(lane() for _ in range(min(lanes, len(chunks)))))
+
+        results = []
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, Exception):
+                results.extend([outcome] * len(chunk))
+            else:
+                chunk_results, timings = outcome
+                metrics.observe(timings)
+                results.extend(chunk_results)
+        return results
+
+    def extract_batch(self, images):
+        """
+        Blocking variant for callers outside the event loop (job workers):
+        waits for an idle worker process, runs one batch on it and returns its results.
+        """
+        future = self._try_submit(images)
+        while future is None:
+            time.sleep(config.BATCH_BUSY_WAIT)
+            future = self._try_submit(images)
+        results, timings = future.result()
+        metrics.observe(timings)
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ExecutorBusy(Exception):
+    """Raised when the bounded executor has no free slot for another job."""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking extraction work off the event loop on a thread or process pool.
+    At most max_workers + max_pending jobs are in flight; further jobs are
+    rejected immediately with ExecutorBusy instead of piling up.
+    """
+
+    def __init__(self, kind="thread", max_workers=2, max_pending=8):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_pending
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._pool_lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="extract")
+            return self._executor
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def is_full(self):
+        return self._in_flight >= self.capacity
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn, *args, timeout=None, queue=True):
+        """
+        Submits fn(*args) and waits up to timeout seconds for the result.
+        The slot is held until the job really finishes, so a timed-out job
+        that is still running keeps counting against the capacity.
+        With queue=False the job is only taken when a worker is idle, so the
+        timeout covers the run rather than time spent waiting for a worker.
+        """
+        with self._lock:
+            if self._in_flight >= (self.capacity if queue else self.max_workers):
+                raise ExecutorBusy()
+            self._in_flight += 1
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    def warm_up(self):
+        """
+        Starts the worker processes and lets each load its models.
+        Only meaningful for the process executor; blocks until done.
+        """
+        if self.kind != "process":
+            return
+        futures = [self._get_executor().submit(warm_up_worker) for _ in range(self.max_workers)]
+        pids = {future.result() for future in futures}
+        logger.info(f"Startup: {len(pids)} extraction worker processes warmed up")
+
+    def shutdown(self):
+        with self._pool_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,128 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.synthetic import generate_forms, render_page
+from src import config
+from src.extractor import FormExtractor
+from src.preprocessing import ImageTooLarge
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return FormExtractor()
+
+
+@pytest.fixture(scope="module")
+def forms():
+    return [
+        (cv2.imencode(".png", page)[1].tobytes(), record)
+        for _, page, record in generate_forms(1, ["baseline", "noisy"], seed=0)
+    ]
+
+
+def large_png(width=3000, height=2000):
+    return cv2.imencode(".png", np.full((height, width), 255, dtype=np.uint8))[1].tobytes()
+
+
+def test_batch_error_stays_with_its_image(extractor, forms, monkeypatch):
+    monkeypatch.setattr(config, "MAX_IMAGE_PIXELS", 5_000_000)
+    (first, first_record), (second, second_record) = forms
+    results = extractor.extract_batch([first, large_png(), b"%PDF-1.4 truncated", second])
+    assert isinstance(results[1], ImageTooLarge)
+    assert isinstance(results[2], Exception)
+    assert results[0]["GPA"] == first_record["GPA"]
+    assert results[3]["GPA"] == second_record["GPA"]
+
+
+def test_batch_matches_single_extraction(extractor, forms):
+    images = [image for image, _ in forms]
+    assert extractor.extract_batch(images) == [extractor.extract(image) for image in images]
+
+
+def stages(extractor, image):
+    return [payload["stage"] for event, payload in extractor.iter_extract(image) if event == "stage"]
+
+
+def test_clean_form_is_settled_by_the_fast_tier(extractor, forms):
+    image, record = forms[0]
+    assert "tier_fast" in stages(extractor, image)
+    result = extractor.extract(image)
+    assert all(result[field] == record[field] for field in config.REQUIRED_FIELDS)
+
+
+def test_low_confidence_escalates_to_the_full_pipeline(extractor, forms, monkeypatch):
+    monkeypatch.setattr(config, "CASCADE_MIN_CONFIDENCE", 101)
+    image, record = forms[0]
+    assert stages(extractor, image)[-3:] == ["ocr", "ner", "tier_full"]
+    result = extractor.extract(image)
+    assert all(result[field] == record[field] for field in config.REQUIRED_FIELDS)
+
+
+def test_ruled_form_skips_the_fast_tier(extractor):
+    (_, page, _), = generate_forms(1, ["ruled"], seed=0)
+    assert extractor.preprocessor.has_colored_lines(page)
+    assert extractor._fast_tier(page) is None
+
+
+def test_fast_tier_needs_every_required_field(extractor):
+    page = render_page(["Name: John Smith", "Major: Biology"], width=900, height=400)
+    assert extractor._fast_tier(page) is None
+
+
+def tiff(pages):
+    buffer = io.BytesIO()
+    frames = [Image.fromarray(cv2.cvtColor(page, cv2.COLOR_BGR2RGB)) for page in pages]
+    frames[0].save(buffer, format="TIFF", save_all=True, append_images=frames[1:])
+    return buffer.getvalue()
+
+
+def test_document_pages_are_merged(extractor):
+    (_, page, record), = generate_forms(1, ["baseline"], seed=1)
+    blank = np.full_like(page, 255)
+    result = extractor.extract(tiff([blank, page]))
+    assert all(result[field] == record[field] for field in config.REQUIRED_FIELDS)
+
+
+def test_document_stops_at_the_first_complete_page(extractor, monkeypatch):
+    (_, page, record), = generate_forms(1, ["baseline"], seed=2)
+    calls = {"ner": 0, "read": 0}
+    extract_entities, read_text = extractor.ner_model.extract_entities, extractor._read_text
+
+    def counted(name, fn):
+        def wrapper(*args):
+            calls[name] += 1
+            return fn(*args)
+        return wrapper
+
+    monkeypatch.setattr(extractor.ner_model, "extract_entities", counted("ner", extract_entities))
+    monkeypatch.setattr(extractor, "_read_text", counted("read", read_text))
+    result = extractor.extract_document(tiff([page] * 8))
+    assert all(result[field] == record[field] for field in config.REQUIRED_FIELDS)
+    assert calls["ner"] == 1
+    assert calls["read"] <= config.DOCUMENT_PAGE_LOOKAHEAD
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("John Smith", "John Smith"),
+    ("Name: Jonn Smith", "John Smith"),
+    ("J0hn Smith", "John Smith"),
+    # Letterless OCR debris from box edges and noise
+    ("John | Smith", "John Smith"),
+    ("Student Jenny Lopez |", "Jenny Lopez"),
+    ("| -", ""),
+    ("", ""),
+])
+def test_clean_name(extractor, raw, expected):
+    assert extractor._clean_name(raw) == expected
+
+
+def test_extract_from_text(extractor):
+    text = "Name: John Smith\nMajor: Biolgy\nGPA: 3.5"
+    expected = {"STUDENT_FIRST_NAME": "John", "STUDENT_LAST_NAME": "Smith", "MAJOR": "Biology", "GPA": "3.5"}
+    for ai_data in ({}, None):
+        result = extractor.extract_from_text(text, ai_data)
+        assert {field: result[field] for field in expected} == expected
@@ -0,0 +1,54 @@
+import pytest
+
+from src.fields import FieldMatcher
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return FieldMatcher()
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Labels of the core fields
+    ("Name: John Smith\nMajor: Biology\nGPA: 3.8", {"FULL_NAME": "John Smith", "MAJOR": "Biology", "GPA": "3.8"}),
+    ("Student Name: Jenny Lopez", {"FULL_NAME": "Jenny Lopez"}),
+    ("First Name: Jenny\nLast Name: Lopez", {"FIRST_NAME": "Jenny", "LAST_NAME": "Lopez"}),
+    ("Program - Computer Science", {"MAJOR": "Computer Science"}),
+    ("Grade Point Average: 3.75", {"GPA": "3.75"}),
+    ("name: john smith", {"FULL_NAME": "john smith"}),
+    # A label running straight into the value
+    ("GPA3.5", {"GPA": "3.5"}),
+    ("GPA:3.5", {"GPA": "3.5"}),
+    # GPA without a label
+    ("Diana Prince. Anthropology. 4.0", {"GPA": "4.0"}),
+    # Line-start labels only count at the start of a line
+    ("The Name: of the game", {}),
+    # Other fields
+    ("Email: jenny@example.com", {"EMAIL": "jenny@example.com"}),
+    ("Phone: (555) 123-4567", {"PHONE": "(555) 123-4567"}),
+    ("SSN: 123-45-6789", {"SSN": "123-45-6789"}),
+    ("Date of Birth: 01/02/2003", {"DATE_OF_BIRTH": "01/02/2003"}),
+    ("Zip Code: 12345-6789", {"ZIP_CODE": "12345-6789"}),
+    ("Age 21", {"AGE": "21"}),
+    ("City: Boston\nState: MA", {"CITY": "Boston", "STATE": "MA"}),
+    ("Company Name: Acme Corp", {"COMPANY_NAME": "Acme Corp"}),
+])
+def test_labels(matcher, text, expected):
+    assert matcher.extract(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Label words used as ordinary words are not labels
+    ("City University", {}),
+    ("State University of New York", {}),
+    ("Gpan 3.5", {"GPA": "3.5"}),
+    # Identifiers are only returned next to their label
+    ("Call 555-123-4567 or 123-45-6789", {}),
+    ("Reach me at jenny@example.com", {"EMAIL": "jenny@example.com"}),
+])
+def test_regressions(matcher, text, expected):
+    assert matcher.extract(text) == expected
+
+
+def test_only_configured_fields():
+    assert FieldMatcher(fields=["GPA"]).extract("Name: John Smith\nGPA: 3.8") == {"GPA": "3.8"}
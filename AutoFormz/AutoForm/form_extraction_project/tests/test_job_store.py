@@ -0,0 +1,175 @@
+import sqlite3
+
+import pytest
+
+from src import config
+from src.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(path=str(tmp_path / "jobs.db"), lease_seconds=60, max_attempts=2)
+    yield store
+    store.close()
+
+
+def test_submit_and_status(store):
+    job_id = store.submit(["a.png", "b.png"], [b"a", b"b"], priority=3)
+    status = store.status(job_id)
+    assert status["status"] == "queued"
+    assert status["priority"] == 3
+    assert (status["total"], status["completed"], status["failed"]) == (2, 0, 0)
+    assert "results" not in status
+    assert store.queue_depth() == 2
+
+
+def test_status_of_unknown_job(store):
+    assert store.status("missing") is None
+
+
+def test_claim_takes_items_of_one_job_in_order(store):
+    first = store.submit(["a.png", "b.png", "c.png"], [b"a", b"b", b"c"])
+    store.submit(["d.png"], [b"d"])
+    rows = store.claim("worker-1", limit=2)
+    assert [(job_id, filename, bytes(data)) for _, job_id, filename, data in rows] == [
+        (first, "a.png", b"a"), (first, "b.png", b"b"),
+    ]
+    assert store.status(first)["status"] == "running"
+    assert store.queue_depth() == 2
+
+
+def test_claim_prefers_higher_priority(store):
+    store.submit(["bulk.png"], [b"bulk"], priority=0)
+    urgent = store.submit(["urgent.png"], [b"urgent"], priority=10)
+    (_, job_id, filename, _), = store.claim("worker-1")
+    assert (job_id, filename) == (urgent, "urgent.png")
+
+
+def test_claim_on_empty_queue(store):
+    assert store.claim("worker-1") == []
+
+
+def test_complete_finishes_job_with_results_in_order(store):
+    job_id = store.submit(["a.png", "b.png"], [b"a", b"b"])
+    (a, *_), (b, *_) = store.claim("worker-1", limit=2)
+    assert store.complete(b, error="unreadable") is False
+    assert store.complete(a, result={"FULL_NAME": "John Smith"}) is True
+    status = store.status(job_id)
+    assert status["status"] == "done"
+    assert (status["completed"], status["failed"]) == (1, 1)
+    assert status["results"] == [
+        {"filename": "a.png", "data": {"FULL_NAME": "John Smith"}},
+        {"filename": "b.png", "error": "unreadable"},
+    ]
+
+
+def test_expired_lease_is_claimed_again_then_fails(store, monkeypatch):
+    job_id = store.submit(["a.png"], [b"a"])
+    (item_id, *_), = store.claim("worker-1")
+    assert store.claim("worker-2") == []
+
+    clock = [1e10]
+    monkeypatch.setattr("src.job_store.time.time", lambda: clock[0])
+    (again, *_), = store.claim("worker-2")
+    assert again == item_id
+
+    # max_attempts reached: the next expired lease fails the item
+    clock[0] += 120
+    assert store.claim("worker-3") == []
+    status = store.status(job_id)
+    assert status["status"] == "done"
+    assert status["results"] == [{"filename": "a.png", "error": "Worker stopped responding"}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("src.job_store.time.time", lambda: now[0])
+    return now
+
+
+def finished_job(store, callback_url=None):
+    job_id = store.submit(["a.png"], [b"a"], callback_url=callback_url)
+    (item_id, *_), = store.claim("worker-1")
+    store.complete(item_id, result={"GPA": "3.5"})
+    return job_id
+
+
+def test_callback_is_pending_once_the_job_finishes(store, clock):
+    job_id = store.submit(["a.png"], [b"a"], callback_url="http://example.test/hook")
+    store.submit(["b.png"], [b"b"])
+    assert store.pending_callbacks() == []
+    (item_id, *_), = store.claim("worker-1")
+    store.complete(item_id, result={})
+    assert store.pending_callbacks() == [(job_id, "http://example.test/hook")]
+
+
+def test_callback_claimed_by_one_worker_only(store, clock):
+    job_id = finished_job(store, "http://example.test/hook")
+    assert store.claim_callback(job_id) is True
+    assert store.claim_callback(job_id) is False
+    assert store.pending_callbacks() == []
+    # An attempt that never reports back is retried once the lease runs out
+    clock[0] += store.lease_seconds + 1
+    assert store.claim_callback(job_id) is True
+
+
+def test_delivered_callback_is_done(store, clock):
+    job_id = finished_job(store, "http://example.test/hook")
+    store.claim_callback(job_id)
+    store.callback_result(job_id, delivered=True)
+    clock[0] += 10 ** 6
+    assert store.pending_callbacks() == []
+
+
+def test_failed_callback_backs_off_then_gives_up(store, clock, monkeypatch):
+    monkeypatch.setattr(config, "JOB_CALLBACK_RETRIES", 3)
+    monkeypatch.setattr(config, "JOB_CALLBACK_BACKOFF", 5)
+    job_id = finished_job(store, "http://example.test/hook")
+    for delay in (5, 10):
+        assert store.claim_callback(job_id) is True
+        store.callback_result(job_id, delivered=False)
+        clock[0] += delay - 1
+        assert store.pending_callbacks() == []
+        clock[0] += 1
+        assert store.pending_callbacks() == [(job_id, "http://example.test/hook")]
+    assert store.claim_callback(job_id) is True
+    store.callback_result(job_id, delivered=False)
+    clock[0] += 10 ** 6
+    assert store.pending_callbacks() == []
+
+
+def test_prune_deletes_old_finished_jobs(store, clock):
+    old = finished_job(store)
+    clock[0] += 100
+    recent = finished_job(store)
+    running = store.submit(["c.png"], [b"c"])
+    clock[0] += 50
+    assert store.prune(max_age=120) == 1
+    assert store.status(old) is None
+    assert store.status(recent)["status"] == "done"
+    assert store.status(running)["status"] == "queued"
+    assert store.prune(max_age=120) == 0
+
+
+def test_prune_default_retention(store, clock, monkeypatch):
+    monkeypatch.setattr(config, "JOB_RETENTION_SECONDS", 60)
+    job_id = finished_job(store)
+    clock[0] += 61
+    assert store.prune() == 1
+    assert store.status(job_id) is None
+
+
+def test_old_schema_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, priority INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL, "
+        "callback_url TEXT, callback_sent INTEGER NOT NULL DEFAULT 0, created REAL NOT NULL, finished REAL)"
+    )
+    db.commit()
+    db.close()
+    store = JobStore(path=path)
+    job_id = finished_job(store, "http://example.test/hook")
+    assert store.claim_callback(job_id) is True
+    store.close()
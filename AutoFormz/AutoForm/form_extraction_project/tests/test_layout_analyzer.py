@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import render_page
+from src import config
+from src.layout_analyzer import LayoutAnalyzer, split_line_bands, uses_layout
+
+
+def page(lines, height=200, width=300):
+    """
+    White page with a black bar for every (top, bottom) text line.
+    """
+    binary = np.full((height, width), 255, dtype=np.uint8)
+    for top, bottom in lines:
+        binary[top:bottom, 20:280] = 0
+    return binary
+
+
+LINES = [(10, 20), (40, 50), (70, 80), (100, 110)]
+
+
+@pytest.mark.parametrize("lines, bands, expected", [
+    # Cuts go through the middle of the gap between lines
+    (LINES, 2, [(0, 60), (60, 200)]),
+    (LINES, 4, [(0, 30), (30, 60), (60, 90), (90, 200)]),
+    # Never more bands than lines
+    (LINES, 10, [(0, 30), (30, 60), (60, 90), (90, 200)]),
+    # Nothing to split
+    (LINES, 1, [(0, 200)]),
+    ([(10, 20)], 4, [(0, 200)]),
+    ([], 4, [(0, 200)]),
+    # Gaps under the minimum don't separate lines
+    ([(10, 20), (22, 30), (60, 70)], 3, [(0, 45), (45, 200)]),
+])
+def test_split_line_bands(lines, bands, expected):
+    assert split_line_bands(page(lines), bands, min_gap=4) == expected
+
+
+def test_noise_rows_are_not_text():
+    binary = page(LINES)
+    binary[60, 5] = 0  # a speck of dust in the gap
+    assert split_line_bands(binary, 4, min_gap=4) == [(0, 30), (30, 60), (60, 90), (90, 200)]
+
+
+def test_bands_cover_the_page():
+    spans = split_line_bands(page([(i, i + 8) for i in range(5, 190, 15)]), 3, min_gap=4)
+    assert spans[0][0] == 0 and spans[-1][1] == 200
+    assert all(bottom == top for (_, bottom), (top, _) in zip(spans, spans[1:]))
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    analyzer = LayoutAnalyzer(max_workers=2)
+    yield analyzer
+    analyzer.shutdown()
+
+
+def test_analyze_finds_lines_and_words(analyzer):
+    binary = np.full((100, 300), 255, dtype=np.uint8)
+    binary[10:22, 10:40] = 0  # "Name:"
+    binary[10:22, 60:100] = 0  # "John"
+    binary[10:22, 102:110] = 0  # a letter close by belongs to the same word
+    binary[50:62, 10:60] = 0  # "Major:"
+    binary[80:82, 10:290] = 0  # a thin rule is not a line
+    lines = analyzer.analyze(binary)
+    assert [(line["top"], line["bottom"]) for line in lines] == [(10, 22), (50, 62)]
+    assert lines[0]["words"] == [(10, 40), (60, 110)]
+    assert lines[1]["words"] == [(10, 60)]
+
+
+def test_analyze_blank_page(analyzer):
+    assert analyzer.analyze(np.full((50, 50), 255, dtype=np.uint8)) == []
+
+
+@pytest.mark.parametrize("label, expected", [
+    ("Name:", True),
+    ("GPA", True),
+    ("Narne", True),
+    ("Maj0r:", True),
+    ("Skewed", False),
+    ("of", False),
+    ("", False),
+])
+def test_is_anchor(analyzer, label, expected):
+    assert analyzer._is_anchor(label) is expected
+
+
+@pytest.mark.parametrize("setting, backend, expected", [
+    ("auto", "tesserocr", True),
+    ("auto", "pytesseract", False),
+    (True, "pytesseract", True),
+    (False, "tesserocr", False),
+])
+def test_uses_layout(monkeypatch, setting, backend, expected):
+    monkeypatch.setattr(config, "ENABLE_LAYOUT_ANALYSIS", setting)
+    assert uses_layout(backend) is expected
+
+
+class NoLabels:
+    def extract_text_with_confidence(self, image, psm=None):
+        return "lorem", 90.0
+
+
+def test_page_without_anchors_falls_back(analyzer):
+    binary = page([(10, 20), (40, 50)])
+    assert analyzer.extract_field_lines(binary, NoLabels()) is None
+    assert analyzer.extract_field_text(binary, NoLabels()) is None
+
+
+def test_reads_the_labelled_lines(analyzer):
+    pytest.importorskip("tesserocr")
+    from src.ocr_handler import OCRExtractor
+    rendered = render_page(["Name: John Smith", "Major: Biology", "GPA: 3.5"], width=900, height=400)
+    binary = cv2.threshold(cv2.cvtColor(rendered, cv2.COLOR_BGR2GRAY), 128, 255, cv2.THRESH_BINARY)[1]
+    ocr = OCRExtractor("tesserocr")
+    try:
+        lines = analyzer.extract_field_lines(binary, ocr)
+    finally:
+        ocr.shutdown()
+    assert [text for text, _ in lines] == ["Name: John Smith", "Major: Biology", "GPA: 3.5"]
+    assert all(confidence > 50 for _, confidence in lines)
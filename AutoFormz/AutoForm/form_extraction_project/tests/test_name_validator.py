@@ -0,0 +1,107 @@
+import pytest
+
+from src import config
+from src.name_validator import LexiconNameValidator, NameLexicon, build_lexicon
+from src.ner_model import FormNERModel
+
+
+@pytest.fixture(scope="module")
+def lexicon(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("lexicon")
+    given = directory / "given.txt"
+    given.write_text("Jenny\nJohn\nJordan\nmaría\n", encoding="utf-8")
+    surnames = directory / "surnames.csv"
+    # SSA-style CSV: the name is the first column
+    surnames.write_text("LOPEZ,100\nSMITH,200\nJordan,5\nO'Brien,3\n", encoding="utf-8")
+    path = directory / "lexicon.tsv"
+    build_lexicon([str(given)], [str(surnames)], str(path))
+    return NameLexicon(str(path))
+
+
+@pytest.mark.parametrize("word, flags", [
+    ("jenny", "G"),
+    ("JOHN", "G"),
+    ("María", "G"),
+    ("Lopez", "S"),
+    ("o'brien", "S"),
+    ("Jordan", "GS"),
+    # Not names
+    ("biology", ""),
+    ("smit", ""),
+    ("", ""),
+])
+def test_lexicon_lookup(lexicon, word, flags):
+    assert lexicon.lookup(word) == flags
+
+
+def test_empty_lexicon(tmp_path):
+    path = tmp_path / "empty.tsv"
+    path.write_bytes(b"")
+    assert NameLexicon(str(path)).lookup("john") == ""
+
+
+@pytest.fixture(scope="module")
+def validator(lexicon):
+    return LexiconNameValidator(lexicon=lexicon, fallback=False)
+
+
+@pytest.mark.parametrize("name, verdict", [
+    ("Jenny Lopez", True),
+    ("jenny lopez", True),
+    ("John O'Brien", True),
+    ("John", True),
+    # Unknown but written like a name: only the fallback could say
+    ("Zorblax Quint", None),
+    ("zorblax quint", False),
+    # Digits, form vocabulary and caption words are never names
+    ("J0hn Smith", False),
+    ("Student Name", False),
+    ("Skewed Image", False),
+    ("A B C D E", False),
+])
+def test_classify(validator, name, verdict):
+    assert validator.classify(name) is verdict
+
+
+def test_ambiguous_names_accepted_without_fallback(validator):
+    assert validator.is_valid("Zorblax Quint") is True
+    assert validator.is_valid_many(["Zorblax Quint", "Student Name"]) == {"Zorblax Quint": True, "Student Name": False}
+
+
+class FakeSpacyValidator:
+    loads = 0
+
+    def __init__(self):
+        FakeSpacyValidator.loads += 1
+
+    def is_valid(self, name):
+        return False
+
+    def is_valid_many(self, names, batch_size=None, n_process=None):
+        return dict.fromkeys(names, False)
+
+
+@pytest.fixture
+def fake_spacy(monkeypatch):
+    monkeypatch.setattr("src.name_validator.SpacyNameValidator", FakeSpacyValidator)
+    FakeSpacyValidator.loads = 0
+    return FakeSpacyValidator
+
+
+def test_fallback_loads_on_the_first_ambiguous_name(lexicon, fake_spacy):
+    validator = LexiconNameValidator(lexicon=lexicon, fallback=True)
+    assert validator.is_valid("Jenny Lopez") is True
+    assert validator.is_valid_many(["John Smith", "Student Name"]) == {"John Smith": True, "Student Name": False}
+    assert fake_spacy.loads == 0
+    assert validator.is_valid("Zorblax Quint") is False
+    assert validator.is_valid_many(["Zorblax Quint", "Quint Zorblax"]) == {"Zorblax Quint": False, "Quint Zorblax": False}
+    assert fake_spacy.loads == 1
+
+
+@pytest.mark.parametrize("preload, loads", [(False, 0), (True, 1)])
+def test_preload_follows_config(lexicon, fake_spacy, monkeypatch, preload, loads):
+    monkeypatch.setattr(config, "VALIDATOR_FALLBACK_PRELOAD", preload)
+    model = FormNERModel.__new__(FormNERModel)
+    model.name_validator = LexiconNameValidator(lexicon=lexicon, fallback=True)
+    model.preload_validator()
+    assert fake_spacy.loads == loads
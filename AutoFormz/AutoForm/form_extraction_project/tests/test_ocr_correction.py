@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from src.ocr_correction import OCRCorrector, SymSpellIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def corrector():
+    return OCRCorrector(
+        majors_path=os.path.join(ROOT, "models", "catalog", "majors.txt"),
+        names_path=os.path.join(ROOT, "models", "name_lexicon.tsv"),
+    )
+
+
+@pytest.mark.parametrize("name", [
+    "John", "Jana", "Janna", "Mariam", "Jude", "Brayden", "Jaxon", "Ahmad", "Leia", "Jo", "JANA",
+])
+def test_real_names_are_kept(corrector, name):
+    assert corrector.correct_given_name(name) == name
+
+
+@pytest.mark.parametrize("misread, expected", [
+    ("jonn", "John"),
+    ("Jonn", "John"),
+    ("jyonn", "John"),
+    ("jhn", "John"),
+    ("Jiohn", "John"),
+    ("JHN", "JOHN"),
+    ("J0hn", "John"),
+    ("J0nn", "John"),
+    ("Jarnes", "James"),
+    ("Wi1liam", "William"),
+])
+def test_misreads_are_fixed(corrector, misread, expected):
+    assert corrector.correct_given_name(misread) == expected
+
+
+@pytest.mark.parametrize("major, expected", [
+    ("Biology", "Biology"),
+    ("biology", "Biology"),
+    # A dropped letter
+    ("Biolgy", "Biology"),
+    ("Computer Scince", "Computer Science"),
+    ("Mechanical Engineerng", "Mechanical Engineering"),
+    # OCR character confusions
+    ("Chernistry", "Chemistry"),
+    ("Econornics", "Economics"),
+    ("Bio1ogy", "Biology"),
+    # Digits or symbols: can't be a real word, so the full edit budget applies
+    ("B1olgy", "Biology"),
+    ("Computer Sc1ence", "Computer Science"),
+    # Short or unknown majors stay as written
+    ("Bio", "Bio"),
+    ("Underwater Basketry", "Underwater Basketry"),
+    ("", ""),
+])
+def test_correct_major(corrector, major, expected):
+    assert corrector.correct_major(major) == expected
+
+
+@pytest.mark.parametrize("major", [
+    "Theology", "Virology", "Oncology", "Mycology", "Topology", "Ergonomics", "Plastics", "Apiculture",
+])
+def test_real_majors_missing_from_the_catalog_are_kept(corrector, major):
+    assert corrector.correct_major(major) == major
+
+
+def test_unknown_major_dropped_when_strict(corrector, monkeypatch):
+    monkeypatch.setattr("src.ocr_correction.config.MAJOR_CATALOG_STRICT", True)
+    assert corrector.correct_major("Underwater Basketry") == ""
+    assert corrector.correct_major("Biolgy") == "Biology"
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SymSpellIndex(["Biology", "Chemistry", "Computer Science", "Physics", "Physic"], max_distance=2, prefix_length=7)
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Exact matches ignore case and spacing
+    ("Biology", ("Biology", 0)),
+    ("  BIOLOGY ", ("Biology", 0)),
+    ("computer science", ("Computer Science", 0)),
+    # Within the edit budget, transpositions count once
+    ("Bilogy", ("Biology", 1)),
+    ("Boilogy", ("Biology", 1)),
+    ("Chemestry", ("Chemistry", 1)),
+    ("Computr Scince", ("Computer Science", 2)),
+    # Too far from every entry
+    ("History", (None, None)),
+    ("", (None, None)),
+    # One edit from two entries is a tie
+    ("Physice", (None, None)),
+])
+def test_symspell_lookup(index, text, expected):
+    assert index.lookup(text) == expected
+
+
+def test_symspell_lookup_max_distance(index):
+    assert index.lookup("Chmestry", max_distance=1) == (None, None)
+    assert index.lookup("Chmestry", max_distance=2) == ("Chemistry", 2)
+    # Never more than the index was built for
+    assert index.lookup("Chmstri", max_distance=5) == (None, None)
+    assert index.lookup("Biology", max_distance=0) == ("Biology", 0)
+
+
+def test_symspell_ignores_duplicates():
+    index = SymSpellIndex(["Biology", "biology", "Physics"])
+    assert len(index) == 2
+    assert "BIOLOGY" in index
+    assert "Geology" not in index
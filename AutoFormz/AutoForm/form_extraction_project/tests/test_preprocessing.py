@@ -0,0 +1,126 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from src import config
+from src.preprocessing import ImagePreprocessor, ImageTooLarge, decode_reduction, max_page_scale, probe_size
+
+
+@pytest.fixture(scope="module")
+def preprocessor():
+    return ImagePreprocessor()
+
+
+def png(width, height):
+    return cv2.imencode(".png", np.full((height, width), 255, dtype=np.uint8))[1].tobytes()
+
+
+@pytest.mark.parametrize("size, factor", [
+    ((1240, 1754), 1),
+    ((4000, 3000), 1),
+    ((5000, 4000), 2),
+    ((7000, 7000), 4),
+])
+def test_decode_reduction(size, factor):
+    assert decode_reduction(size) == factor
+
+
+def test_decode_reduction_eighth(monkeypatch):
+    monkeypatch.setattr(config, "DECODE_PIXEL_BUDGET", 100_000)
+    assert decode_reduction((4000, 4000)) == 8
+
+
+def test_decode_reduction_rejects_over_the_ceiling():
+    with pytest.raises(ImageTooLarge):
+        decode_reduction((8000, 8000))
+
+
+def test_probe_size_reads_the_header():
+    assert probe_size(png(300, 200)) == (300, 200)
+    assert probe_size(b"not an image") is None
+
+
+@pytest.mark.parametrize("source", ["bytes", "path", "file"])
+def test_load_image_reduces_large_images(preprocessor, tmp_path, source):
+    data = png(6000, 4000)
+    path = tmp_path / "large.png"
+    path.write_bytes(data)
+    image = {"bytes": data, "path": str(path), "file": io.BytesIO(data)}[source]
+    img = preprocessor.load_image(image)
+    assert img.shape == (2000, 3000, 3)
+
+
+def test_load_image_keeps_small_images(preprocessor):
+    assert preprocessor.load_image(png(300, 200)).shape == (200, 300, 3)
+    assert preprocessor.load_image(np.zeros((20, 30), dtype=np.uint8)).shape == (20, 30, 3)
+
+
+@pytest.mark.parametrize("data", [b"", b"not an image"])
+def test_load_image_unreadable(preprocessor, data):
+    assert preprocessor.load_image(data) is None
+
+
+def test_load_image_rejects_over_the_ceiling(preprocessor, monkeypatch):
+    monkeypatch.setattr(config, "MAX_IMAGE_PIXELS", 1_000_000)
+    with pytest.raises(ImageTooLarge):
+        preprocessor.load_image(png(2000, 1000))
+
+
+@pytest.mark.parametrize("size, border", [((1240, 1754), 50), ((3400, 3400), 50), ((10000, 300), 0), ((10000, 8000), 50)])
+def test_max_page_scale_fits_the_budget(size, border):
+    budget = 40_000_000
+    scale = max_page_scale(size, border, budget)
+    width, height = size
+    assert (round(width * scale) + 2 * border) * (round(height * scale) + 2 * border) <= budget
+    assert (round(width * scale * 1.01) + 2 * border) * (round(height * scale * 1.01) + 2 * border) > budget
+
+
+@pytest.mark.parametrize("mode", ["preprocess", "preprocess_fast"])
+def test_scaled_page_stays_within_the_budget(preprocessor, monkeypatch, mode):
+    # No text to measure, so the fixed fallback scale applies
+    monkeypatch.setattr(config, "PREPROCESS_SCALE", 4.0)
+    monkeypatch.setattr(config, "PREPROCESS_MAX_PAGE_PIXELS", 4_000_000)
+    page = getattr(preprocessor, mode)(png(1500, 1500))
+    assert page.size <= 4_000_000
+    assert page.shape[0] > 1500
+
+
+def ruled(draw):
+    page = np.full((1754, 1240, 3), 255, dtype=np.uint8)
+    draw(page)
+    return page
+
+
+def speckle(page):
+    rng = np.random.default_rng(0)
+    page[rng.integers(0, 1754, 300), rng.integers(0, 1240, 300)] = (0, 0, 255)
+
+
+@pytest.mark.parametrize("draw, expected", [
+    (lambda page: None, False),
+    (lambda page: cv2.line(page, (100, 500), (400, 500), (0, 0, 255), 2), True),
+    (lambda page: cv2.line(page, (600, 100), (600, 300), (255, 0, 0), 2), True),
+    (lambda page: cv2.rectangle(page, (100, 500), (300, 560), (255, 0, 0), 2), True),
+    (speckle, False),
+])
+def test_has_colored_lines(preprocessor, draw, expected):
+    assert preprocessor.has_colored_lines(ruled(draw)) is expected
+
+
+def test_single_underline_is_removed(preprocessor):
+    text = [("Name: John Smith", 300), ("Major: Biology", 420)]
+
+    def form(underline):
+        page = np.full((800, 1000, 3), 255, dtype=np.uint8)
+        for line, y in text:
+            cv2.putText(page, line, (80, y), cv2.FONT_HERSHEY_SIMPLEX, 1.1, (0, 0, 0), 2)
+        if underline:
+            cv2.line(page, (80, 310), (420, 310), (0, 0, 255), 2)
+        return page
+
+    clean = preprocessor.preprocess(form(False))
+    underlined = preprocessor.preprocess(form(True))
+    assert clean.shape == underlined.shape
+    assert np.count_nonzero(underlined < 128) < np.count_nonzero(clean < 128) * 1.05
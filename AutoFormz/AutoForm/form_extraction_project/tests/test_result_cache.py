@@ -0,0 +1,111 @@
+import pytest
+
+from src import config
+from src.ocr_handler import backend_signature
+from src.result_cache import ResultCache, pipeline_fingerprint
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", {"GPA": "3.5"})
+    cache.put("b", {"GPA": "3.6"})
+    assert cache.get("a") == {"GPA": "3.5"}  # "b" is now the oldest
+    cache.put("c", {"GPA": "3.7"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"GPA": "3.5"}
+    assert cache.get("c") == {"GPA": "3.7"}
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["memory_entries"]) == (3, 1, 2)
+
+
+def test_results_are_copies():
+    cache = ResultCache(max_entries=2)
+    result = {"GPA": "3.5"}
+    cache.put("a", result)
+    result["GPA"] = "0.0"
+    cache.get("a")["GPA"] = "0.0"
+    assert cache.get("a") == {"GPA": "3.5"}
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put("aa11", {"FULL_NAME": "John Smith"})
+    cache.put("bb22", {"FULL_NAME": "Jenny Lopez"})
+
+    restarted = ResultCache(max_entries=1, disk_dir=str(tmp_path))
+    assert restarted.stats()["disk_entries"] == 2
+    assert restarted.get("aa11") == {"FULL_NAME": "John Smith"}
+    assert restarted.get("aa11") == {"FULL_NAME": "John Smith"}
+    assert (restarted.disk_hits, restarted.memory_hits) == (1, 1)
+
+
+def test_disk_tier_is_size_capped(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path), disk_max_bytes=100)
+    for i in range(10):
+        cache.put(f"k{i:03d}", {"FULL_NAME": f"Student {i}"})
+    stats = cache.stats()
+    assert 0 < stats["disk_bytes"] <= 100
+    assert stats["disk_entries"] < 10
+    assert len(list(tmp_path.rglob("*.json"))) == stats["disk_entries"]
+    assert cache.get("k009") == {"FULL_NAME": "Student 9"}
+
+
+def test_missing_disk_file_is_a_miss(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put("aa11", {"GPA": "3.5"})
+    cache.put("bb22", {"GPA": "3.6"})
+    for path in tmp_path.rglob("aa11.json"):
+        path.unlink()
+    assert cache.get("aa11") is None
+    assert cache.stats()["disk_entries"] == 1
+
+
+def test_key_depends_on_image_and_fingerprint():
+    cache = ResultCache()
+    assert cache.key_for(b"image") == cache.key_for(b"image")
+    assert cache.key_for(b"image") != cache.key_for(b"other")
+    other = ResultCache()
+    other.fingerprint = "0" * 16
+    assert other.key_for(b"image") != cache.key_for(b"image")
+
+
+@pytest.mark.parametrize("setting", ["NAME_LEXICON_PATH", "MAJOR_CATALOG_PATH"])
+def test_fingerprint_follows_data_file_contents(tmp_path, monkeypatch, setting):
+    path = tmp_path / "data.txt"
+    path.write_text("biology\n", encoding="utf-8")
+    monkeypatch.setattr(config, setting, str(path))
+    before = pipeline_fingerprint()
+    assert pipeline_fingerprint() == before
+    path.write_text("biology\nchemistry\n", encoding="utf-8")
+    assert pipeline_fingerprint() != before
+
+
+def test_fingerprint_follows_settings(monkeypatch):
+    before = pipeline_fingerprint()
+    monkeypatch.setattr(config, "PIPELINE_VERSION", config.PIPELINE_VERSION + 1)
+    assert pipeline_fingerprint() != before
+
+
+def test_fingerprint_follows_model_weights(tmp_path, monkeypatch):
+    model = tmp_path / "model"
+    (model / "ner").mkdir(parents=True)
+    (model / "meta.json").write_text('{"name": "form_model"}', encoding="utf-8")
+    weights = model / "ner" / "model"
+    weights.write_bytes(b"\x00" * 64)
+    monkeypatch.setattr(config, "CUSTOM_MODEL_DIR", str(model))
+    before = pipeline_fingerprint()
+    # Retrained: same meta.json, new weights
+    weights.write_bytes(b"\x01" * 80)
+    assert pipeline_fingerprint() != before
+
+
+def test_fingerprint_follows_ocr_backend(monkeypatch):
+    before = pipeline_fingerprint()
+    monkeypatch.setattr("src.result_cache.backend_signature", lambda: "pytesseract 4.1.1")
+    assert pipeline_fingerprint() != before
+
+
+@pytest.mark.parametrize("backend, prefix", [("auto", "tesserocr "), ("tesserocr", "tesserocr "), ("pytesseract", "pytesseract ")])
+def test_backend_signature(backend, prefix):
+    pytest.importorskip("tesserocr")
+    assert backend_signature(backend).startswith(prefix)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from src.upload_limits import UploadLimitMiddleware
+
+
+async def echo_app(scope, receive, send):
+    """
+    Reads the whole body like a form parser would, then answers 200 with its size.
+    """
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("client disconnected")
+        size += len(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(size).encode()})
+
+
+def request(path, chunks, content_length=None, limits=None, default=100):
+    """
+    Sends the body in `chunks` through the middleware and returns (status, body, chunks read).
+    """
+    headers = [(b"content-type", b"application/octet-stream")]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope = {"type": "http", "path": path, "headers": headers}
+    pending = list(chunks)
+    read = []
+    sent = []
+
+    async def receive():
+        if not pending:
+            return {"type": "http.disconnect"}
+        chunk = pending.pop(0)
+        read.append(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": bool(pending)}
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = UploadLimitMiddleware(echo_app, limits=limits, default=default)
+    asyncio.run(middleware(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, body, len(read)
+
+
+def test_under_the_limit_passes():
+    status, body, _ = request("/extract-form/", [b"x" * 40, b"x" * 40], content_length=80)
+    assert (status, body) == (200, b"80")
+
+
+def test_content_length_over_the_limit_is_rejected_unread():
+    status, body, read = request("/extract-form/", [b"x" * 200], content_length=200)
+    assert status == 413
+    assert b"limit" in body
+    assert read == 0
+
+
+@pytest.mark.parametrize("content_length", [None, 50])
+def test_streamed_body_over_the_limit_is_cut_off(content_length):
+    # Chunked upload (no Content-Length) or one that lies about its size
+    chunks = [b"x" * 40] * 10
+    status, _, read = request("/extract-form/", chunks, content_length=content_length)
+    assert status == 413
+    assert read == 3
+
+
+@pytest.mark.parametrize("path, size, expected", [
+    ("/extract-batch/", 150, 200),
+    ("/extract-batch/", 250, 413),
+    ("/extract-form/", 150, 413),
+])
+def test_limit_per_path_prefix(path, size, expected):
+    status, _, _ = request(path, [b"x" * size], limits={"/extract-batch": 200})
+    assert status == expected
+
+
+def test_no_limit_for_path():
+    status, body, _ = request("/health", [b"x" * 500], default=None)
+    assert (status, body) == (200, b"500")
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import config
+from src import workers
+from src.workers import BoundedExecutor, ExecutorBusy, ExtractionPool
+
+
+class FakeWorkers:
+    """
+    Stands in for the worker processes: records how many batches run at once.
+    """
+
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def extract_batch(self, images):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.seconds)
+            if "bad" in images:
+                raise ValueError("unreadable image")
+            return [{"image": image} for image in images]
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeWorkers()
+    monkeypatch.setattr(workers, "extract_batch_in_worker", fake.extract_batch)
+    return fake
+
+
+@pytest.fixture
+def pool(fake, monkeypatch):
+    pool = ExtractionPool(max_workers=8)
+    # Threads instead of processes, so the fake worker is visible to them
+    threads = ThreadPoolExecutor(max_workers=16)
+    monkeypatch.setattr(pool, "_get_executor", lambda: threads)
+    yield pool
+    threads.shutdown()
+
+
+def test_batch_uses_every_worker(pool, fake):
+    executor = BoundedExecutor("thread", max_workers=2)
+    results = asyncio.run(pool.extract_many([str(i) for i in range(64)], executor))
+    assert results == [{"image": str(i)} for i in range(64)]
+    assert fake.peak == 8
+    # Single-form capacity is untouched while a batch runs
+    assert executor.in_flight == 0
+
+
+def test_timeout_starts_when_the_chunk_does(pool, fake, monkeypatch):
+    # 64 one-image chunks over 8 workers take 8 rounds, far longer than one chunk's timeout
+    monkeypatch.setattr(config, "EXTRACT_TIMEOUT", fake.seconds * 4)
+    results = asyncio.run(pool.extract_many([str(i) for i in range(64)], BoundedExecutor(), chunk_size=1))
+    assert not any(isinstance(result, Exception) for result in results)
+    assert fake.peak == 8
+
+
+def test_failed_chunk_fails_only_its_files(pool):
+    # A worker that dies takes its whole chunk down, and nothing else
+    pool.max_workers = 2
+    images = ["a", "bad", "c", "d"]
+    results = asyncio.run(pool.extract_many(images, BoundedExecutor(), chunk_size=2))
+    assert [isinstance(result, ValueError) for result in results] == [True, True, False, False]
+    assert results[2:] == [{"image": "c"}, {"image": "d"}]
+
+
+def test_blocking_batch_waits_for_an_idle_worker(pool, fake, monkeypatch):
+    monkeypatch.setattr(config, "BATCH_BUSY_WAIT", 0.01)
+    pool.max_workers = 1
+    with ThreadPoolExecutor(max_workers=4) as callers:
+        results = list(callers.map(pool.extract_batch, [["a"], ["b"], ["c"], ["d"]]))
+    assert results == [[{"image": image}] for image in "abcd"]
+    assert fake.peak == 1
+
+
+def test_bounded_executor_rejects_when_full():
+    executor = BoundedExecutor("thread", max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(release.wait))
+        second = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.01)
+        assert executor.is_full()
+        with pytest.raises(ExecutorBusy):
+            await executor.run(release.wait)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(main()) == [True, True]
+    assert executor.in_flight == 0
+    executor.shutdown()
+
+
+def test_bounded_executor_without_queue_needs_an_idle_worker():
+    executor = BoundedExecutor("thread", max_workers=1, max_pending=4)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ExecutorBusy):
+            await executor.run(release.wait, queue=False)
+        release.set()
+        await first
+        return await executor.run(sum, [1, 2], queue=False)
+
+    assert asyncio.run(main()) == 3
+    executor.shutdown()
@@ -0,0 +1,226 @@
+"""
+Builds NER training data from a folder of form images.
+
+    python -m training.annotate_data FOLDER [--output training/data/annotated]
+                                            [--workers 4] [--docbin]
+
+Every image (and every page of a PDF/TIFF) goes through the current
+preprocessing, OCR and extraction in a process pool. The extracted name,
+major and GPA are located in the OCR text and written as character spans:
+
+    annotations.jsonl  confident examples, ready for training.train_model --data
+    review.jsonl       examples with review flags (low OCR confidence, a field
+                       missing or not found in the text, NER and regex
+                       disagreeing, errors) to be checked by hand
+    annotations.spacy  DocBin of annotations.jsonl, with --docbin
+
+Results are appended as each chunk of files finishes. A rerun skips every
+file already in either JSONL file, so an interrupted run picks up where it
+stopped.
+"""
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from src import config
+from src.workers import init_worker, worker_extractor
+
+ANNOTATIONS_FILE = "annotations.jsonl"
+REVIEW_FILE = "review.jsonl"
+DOCBIN_FILE = "annotations.spacy"
+
+
+def annotate_files(paths):
+    """
+    Worker entry point: returns one list of records per path. The workers
+    are set up by src.workers.init_worker, like the API's batch pool.
+    """
+    extractor = worker_extractor()
+    return [_annotate_file(extractor, path) for path in paths]
+
+
+def _annotate_file(extractor, path):
+    from src.document_loader import iter_pages
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        return [_annotate_page(extractor, path, number, page) for number, page in enumerate(iter_pages(data))]
+    except Exception as e:
+        return [{"source": path, "page": 0, "text": "", "entities": [], "review": [f"error: {e}"]}]
+
+
+def _annotate_page(extractor, path, number, page):
+    record = {"source": path, "page": number, "text": "", "entities": [], "review": []}
+    img = extractor.preprocessor.load_image(page)
+    if img is None:
+        record["review"].append("error: could not decode image")
+        return record
+
+    binary = extractor.preprocessor.preprocess(img)
+    lines = None
+    if extractor.use_layout:
+        lines = extractor.layout_analyzer.extract_field_lines(binary, extractor.ocr_extractor)
+    if not lines:
+        lines = [extractor.ocr_extractor.extract_page_text_with_confidence(binary)]
+    text = "\n".join(line_text for line_text, _ in lines)
+    confidence = sum(line_confidence for _, line_confidence in lines) / len(lines)
+
+    result = extractor.extract_from_text(text)
+    regex_result = extractor.extract_from_text(text, ai_data={})
+    name = _full_name(result)
+    regex_name = _full_name(regex_result)
+
+    record["text"] = text
+    record["ocr_confidence"] = round(confidence, 1)
+    record["fields"] = {"STUDENT_NAME": name, "MAJOR": result["MAJOR"], "GPA": result["GPA"]}
+    if confidence < config.ANNOTATE_MIN_OCR_CONFIDENCE:
+        record["review"].append("low_ocr_confidence")
+    if regex_name and regex_name.lower() != name.lower():
+        record["review"].append("ner_regex_disagree:STUDENT_NAME")
+
+    spans = []
+    for label, value in record["fields"].items():
+        if not value:
+            record["review"].append(f"missing:{label}")
+            continue
+        span = find_gpa(text, value) if label == "GPA" else find_span(text, value)
+        if span is None:
+            record["review"].append(f"not_in_text:{label}")
+        elif any(span[0] < end and start < span[1] for start, end, _ in spans):
+            record["review"].append(f"overlap:{label}")
+        else:
+            spans.append((span[0], span[1], label))
+    record["entities"] = sorted(spans)
+    return record
+
+
+def _full_name(result):
+    return f"{result['STUDENT_FIRST_NAME']} {result['STUDENT_LAST_NAME']}".strip()
+
+
+def find_span(text, value):
+    """
+    (start, end) of value in text as whole words, ignoring case and the
+    width of the whitespace between words. None when it does not occur.
+    """
+    words = value.split()
+    pattern = r"(?<!\w)" + r"\s+".join(re.escape(word) for word in words) + r"(?!\w)"
+    match = re.search(pattern, text, re.IGNORECASE)
+    return match.span() if match else None
+
+
+def find_gpa(text, value):
+    # The extractor normalises the GPA ("3.80" -> "3.8", "25" -> "2.5"), so compare numbers
+    target = float(value)
+    for match in re.finditer(r"(?<![\d.])\d+(?:\.\d+)?(?![\d.])", text):
+        number = float(match.group())
+        if abs(number - target) < 1e-6 or ("." not in match.group() and abs(number / 10.0 - target) < 1e-6):
+            return match.span()
+    return None
+
+
+def find_images(folder):
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.lower().endswith(config.BATCH_IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def _open_for_append(path):
+    """
+    Opens a JSONL output for appending, dropping a half-written last line
+    left by an interrupted run. Returns (file, sources already recorded).
+    """
+    done = set()
+    if os.path.exists(path):
+        with open(path, "rb+") as f:
+            content = f.read()
+            complete = content[:content.rfind(b"\n") + 1]
+            if len(complete) < len(content):
+                f.truncate(len(complete))
+        for line in complete.decode("utf-8").splitlines():
+            if line.strip():
+                done.add(json.loads(line)["source"])
+    return open(path, "a", encoding="utf-8"), done
+
+
+def annotate_folder(folder, output_dir, workers=None, chunk_size=None):
+    workers = workers or config.ANNOTATE_WORKERS or os.cpu_count() or 1
+    chunk_size = chunk_size or config.ANNOTATE_CHUNK_SIZE
+    os.makedirs(output_dir, exist_ok=True)
+    accepted, accepted_done = _open_for_append(os.path.join(output_dir, ANNOTATIONS_FILE))
+    review, review_done = _open_for_append(os.path.join(output_dir, REVIEW_FILE))
+
+    paths = [path for path in find_images(folder) if path not in accepted_done | review_done]
+    print(f"{len(paths)} files to annotate ({len(accepted_done | review_done)} already done)")
+    chunks = iter([paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)])
+
+    counts = {"files": 0, "accepted": 0, "review": 0}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        # A couple of chunks per worker in flight keeps them busy without
+        # queueing the whole folder in memory
+        pending = set()
+        try:
+            while True:
+                while len(pending) < workers * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    pending.add(pool.submit(annotate_files, chunk))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    for records in future.result():
+                        # All pages of a file are written together so a rerun never sees half a file
+                        flagged = any(record["review"] for record in records)
+                        out = review if flagged else accepted
+                        out.write("".join(json.dumps(record) + "\n" for record in records))
+                        out.flush()
+                        counts["files"] += 1
+                        counts["review" if flagged else "accepted"] += 1
+                rate = counts["files"] / (time.perf_counter() - start)
+                print(f"{counts['files']}/{len(paths)} files, {counts['review']} flagged, {rate:.1f} files/s")
+        finally:
+            for future in pending:
+                future.cancel()
+            accepted.close()
+            review.close()
+    return counts
+
+
+def write_docbin(output_dir):
+    import spacy
+    from spacy.tokens import DocBin
+    from training.train_model import read_examples, to_docs
+
+    examples = read_examples(os.path.join(output_dir, ANNOTATIONS_FILE))
+    docs = to_docs(spacy.blank("en"), examples)
+    path = os.path.join(output_dir, DOCBIN_FILE)
+    DocBin(docs=docs).to_disk(path)
+    print(f"Wrote {len(docs)} documents to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of form images, searched recursively")
+    parser.add_argument("--output", default=config.ANNOTATE_OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--docbin", action="store_true", help=f"Also write {DOCBIN_FILE} from the accepted examples")
+    args = parser.parse_args()
+
+    counts = annotate_folder(args.folder, args.output, args.workers, args.chunk_size)
+    print(f"Done: {counts['accepted']} accepted, {counts['review']} flagged for review in {args.output}")
+    if args.docbin:
+        write_docbin(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,35 @@
-import spacy
-from spacy.training.example import Example
-import random
+"""
+Trains the custom NER model that FormNERModel loads (config.CUSTOM_MODEL_DIR).
+
+    python -m training.train_model [--data training/data/training_data.json]
+                                   [--output models/trained_form_model] [--epochs 100]
+
+Examples are the built-in TRAIN_DATA plus any in --data, which may be a JSON
+list of [text, {"entities": [[start, end, label], ...]}] pairs, a JSONL file
+of {"text": ..., "entities": [...]} records, or a ready DocBin (.spacy).
+They are converted once into train/dev DocBin files under
+config.TRAINING_CORPUS_DIR and reused until the data, seed or split change.
+
+Training uses compounding minibatches. With a dev set of at least
+config.TRAIN_MIN_DEV_SIZE examples, training stops once the dev F-score
+stops improving and the best epoch's weights are the ones saved, so the
+reported dev F-score is that of the written model; smaller corpora are
+trained on everything for --epochs.
+The model is written to --output, never over the one the API serves unless
+asked to; point CUSTOM_MODEL_DIR at it once it checks out.
+"""
+import argparse
+import json
 import os
+import random
+import time
+
+import spacy
+from spacy.tokens import DocBin
+from spacy.training import Example
+from spacy.util import compounding, minibatch
+
+from src import config
 
 # EXPANDED TRAINING DATA
 TRAIN_DATA = [
@@ -46,46 +74,173 @@ TRAIN_DATA = [
      {"entities": [(0, 12, "STUDENT_NAME"), (14, 26, "MAJOR"), (28, 31, "GPA")]})
 ]
 
-def train_model():
-    print("Starting AI Training with Expanded Dataset...")
-    
-    # Load a blank English model
+
+def read_examples(path):
+    """
+    Returns (text, {"entities": [...]}) pairs from a JSON or JSONL file.
+    Missing or empty files give no examples.
+    """
+    if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+        return []
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = json.load(f)
+    examples = []
+    for record in records:
+        if isinstance(record, dict):
+            examples.append((record["text"], {"entities": record.get("entities", [])}))
+        else:
+            text, annotations = record
+            examples.append((text, annotations))
+    return examples
+
+
+def to_docs(nlp, examples):
+    docs = []
+    for text, annotations in examples:
+        doc = nlp.make_doc(text)
+        spans = []
+        for start, end, label in annotations.get("entities", []):
+            span = doc.char_span(start, end, label=label, alignment_mode="contract")
+            if span is None:
+                print(f"Skipping entity {text[start:end]!r} ({label}): does not align with tokens")
+            else:
+                spans.append(span)
+        try:
+            doc.ents = spans
+        except ValueError:
+            print(f"Skipping example with overlapping entities: {text[:60]!r}")
+            continue
+        docs.append(doc)
+    return docs
+
+
+def build_corpus(nlp, data_path, corpus_dir, dev_split, seed, min_dev_size=config.TRAIN_MIN_DEV_SIZE):
+    """
+    Writes train.spacy and dev.spacy, unless they were built from the same
+    data, seed and split and are newer than data_path already. The dev set
+    is left empty when it would hold fewer than min_dev_size examples.
+    Returns the two paths.
+    """
+    train_path = os.path.join(corpus_dir, "train.spacy")
+    dev_path = os.path.join(corpus_dir, "dev.spacy")
+    key_path = os.path.join(corpus_dir, "corpus.json")
+    key = {"data": data_path, "seed": seed, "dev_split": dev_split, "min_dev_size": min_dev_size}
+    sources = [__file__] + ([data_path] if data_path and os.path.exists(data_path) else [])
+    if all(os.path.exists(path) for path in (train_path, dev_path, key_path)):
+        built = min(os.path.getmtime(train_path), os.path.getmtime(dev_path))
+        with open(key_path, encoding="utf-8") as f:
+            same_key = json.load(f) == key
+        if same_key and all(os.path.getmtime(source) <= built for source in sources):
+            return train_path, dev_path
+
+    if data_path and data_path.endswith(".spacy"):
+        docs = to_docs(nlp, TRAIN_DATA) + list(DocBin().from_disk(data_path).get_docs(nlp.vocab))
+    else:
+        docs = to_docs(nlp, TRAIN_DATA + read_examples(data_path))
+    random.Random(seed).shuffle(docs)
+    dev_size = int(len(docs) * dev_split)
+    if dev_size < min_dev_size:
+        print(f"Corpus: {len(docs)} examples give a dev set under {min_dev_size}; training on all of them")
+        dev_size = 0
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    DocBin(docs=docs[dev_size:]).to_disk(train_path)
+    DocBin(docs=docs[:dev_size]).to_disk(dev_path)
+    with open(key_path, "w", encoding="utf-8") as f:
+        json.dump(key, f)
+    print(f"Corpus: {len(docs) - dev_size} train / {dev_size} dev examples in {corpus_dir}")
+    return train_path, dev_path
+
+
+def load_examples(nlp, path):
+    return [Example(nlp.make_doc(doc.text), doc) for doc in DocBin().from_disk(path).get_docs(nlp.vocab)]
+
+
+def fit(examples, epochs, seed, dev_examples=(), patience=None):
+    """
+    Trains a fresh NER pipeline on examples. With dev_examples, stops once
+    the dev F-score has not improved for patience epochs and restores the
+    weights of the best epoch. Returns the pipeline, the best epoch and its
+    dev F-score (the last epoch and None without dev examples).
+    """
+    random.seed(seed)
+    spacy.util.fix_random_seed(seed)
     nlp = spacy.blank("en")
-    
-    # Add the NER (Named Entity Recognition) pipeline
-    if "ner" not in nlp.pipe_names:
-        ner = nlp.add_pipe("ner", last=True)
-    
-    # Add labels from our data
-    for _, annotations in TRAIN_DATA:
-        for ent in annotations.get("entities"):
-            ner.add_label(ent[2])
-
-    # Start training
-    optimizer = nlp.begin_training()
-    
-    # Loop 40 times
-    for itn in range(40):
-        random.shuffle(TRAIN_DATA)
+    nlp.add_pipe("ner", last=True)
+    examples = [Example(nlp.make_doc(example.reference.text), example.reference) for example in examples]
+    # Labels are read from the examples
+    optimizer = nlp.initialize(lambda: examples)
+
+    best_f, best_epoch, best_weights = None, epochs, None
+    for epoch in range(1, epochs + 1):
+        random.shuffle(examples)
         losses = {}
-        
-        # Process batches
-        for text, annotations in TRAIN_DATA:
-            doc = nlp.make_doc(text)
-            example = Example.from_dict(doc, annotations)
-            nlp.update([example], drop=0.3, losses=losses)
-            
-        if (itn + 1) % 5 == 0:
-            print(f"Iteration {itn+1} - Loss: {losses}")
-
-    # Save the trained model
-    output_dir = "models/custom_form_model"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        
+        batches = minibatch(
+            examples,
+            size=compounding(config.TRAIN_BATCH_START, config.TRAIN_BATCH_STOP, config.TRAIN_BATCH_COMPOUND),
+        )
+        start = time.perf_counter()
+        for batch in batches:
+            nlp.update(batch, drop=config.TRAIN_DROPOUT, sgd=optimizer, losses=losses)
+        speed = len(examples) / (time.perf_counter() - start)
+
+        if not dev_examples:
+            print(f"Epoch {epoch:>3}  loss {losses.get('ner', 0.0):>9.2f}  {speed:>8.0f} examples/s")
+            continue
+        f_score = nlp.evaluate(dev_examples)["ents_f"] or 0.0
+        print(f"Epoch {epoch:>3}  loss {losses.get('ner', 0.0):>9.2f}  dev F {f_score:.3f}  {speed:>8.0f} examples/s")
+        if best_f is None or f_score > best_f:
+            best_f, best_epoch, best_weights = f_score, epoch, nlp.to_bytes()
+        elif epoch - best_epoch >= patience:
+            print(f"No improvement for {patience} epochs, stopping")
+            break
+    if best_weights is not None:
+        nlp.from_bytes(best_weights)
+    return nlp, best_epoch, best_f
+
+
+def train_model(data_path=config.TRAINING_DATA_PATH, output_dir=config.TRAIN_OUTPUT_DIR,
+                max_epochs=config.TRAIN_MAX_EPOCHS, patience=config.TRAIN_PATIENCE, seed=config.TRAIN_SEED,
+                overwrite=False):
+    if os.path.abspath(output_dir) == os.path.abspath(config.CUSTOM_MODEL_DIR) and not overwrite:
+        raise SystemExit(f"'{output_dir}' is the model the API serves; pass --overwrite to replace it.")
+
+    nlp = spacy.blank("en")
+    train_path, dev_path = build_corpus(nlp, data_path, config.TRAINING_CORPUS_DIR, config.TRAIN_DEV_SPLIT, seed)
+    train_examples = load_examples(nlp, train_path)
+    dev_examples = load_examples(nlp, dev_path)
+    if not train_examples:
+        raise SystemExit("No training examples.")
+
+    if dev_examples:
+        nlp, epoch, _ = fit(train_examples, max_epochs, seed, dev_examples, patience)
+        # Scored again after the restore so the figure printed is the saved model's
+        f_score = nlp.evaluate(dev_examples)["ents_f"] or 0.0
+        written = f"epoch {epoch} checkpoint, trained on {len(train_examples)} examples, dev F {f_score:.3f}"
+    else:
+        print(f"No dev set: training for {max_epochs} epochs")
+        nlp, epoch, _ = fit(train_examples, max_epochs, seed)
+        written = f"epoch {epoch} model, trained on all {len(train_examples)} examples, not evaluated"
+
+    os.makedirs(output_dir, exist_ok=True)
     nlp.to_disk(output_dir)
-    print(f"Model saved to '{output_dir}'")
-    print("Training complete. The AI now understands multiple form layouts.")
+    print(f"Model saved to '{output_dir}': {written}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=config.TRAINING_DATA_PATH, help="Extra examples (.json, .jsonl or .spacy)")
+    parser.add_argument("--output", default=config.TRAIN_OUTPUT_DIR)
+    parser.add_argument("--epochs", type=int, default=config.TRAIN_MAX_EPOCHS)
+    parser.add_argument("--patience", type=int, default=config.TRAIN_PATIENCE)
+    parser.add_argument("--seed", type=int, default=config.TRAIN_SEED)
+    parser.add_argument("--overwrite", action="store_true", help="Allow --output to be the model the API serves")
+    args = parser.parse_args()
+    train_model(args.data, args.output, args.epochs, args.patience, args.seed, args.overwrite)
+
 
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    main()